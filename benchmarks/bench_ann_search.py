@@ -0,0 +1,79 @@
+"""
+Benchmark: approximate IVF search vs exact search.
+
+Builds both backends over a synthetic clustered corpus (code embeddings
+are strongly clustered by file and topic, unlike uniform noise) and
+reports build time, mean query latency, and recall@k against exact
+search for a sweep of n_probe values.
+
+Run:
+    python benchmarks/bench_ann_search.py [n_chunks]
+"""
+
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from services.vector_store import VectorStore
+from services.ann_index import ExactIndex, IVFIndex
+
+DIMENSIONS = 1536
+TOP_K = 3
+N_QUERIES = 200
+N_PROBES = [1, 2, 4, 8, 16, 32]
+
+
+def make_corpus(n: int, rng) -> np.ndarray:
+    n_topics = max(1, n // 50)
+    topics = rng.standard_normal((n_topics, DIMENSIONS), dtype=np.float32)
+    labels = rng.integers(0, n_topics, n)
+    matrix = topics[labels] + 0.8 * rng.standard_normal((n, DIMENSIONS), dtype=np.float32)
+    return VectorStore._normalize(matrix)
+
+
+def make_queries(matrix: np.ndarray, rng) -> np.ndarray:
+    picks = matrix[rng.choice(len(matrix), N_QUERIES, replace=False)]
+    noise = 0.05 * rng.standard_normal(picks.shape, dtype=np.float32)
+    return VectorStore._normalize(picks + noise)
+
+
+def run(index, queries: np.ndarray) -> tuple:
+    start = time.perf_counter()
+    results = [[idx for _, idx in index.search(q, TOP_K)] for q in queries]
+    return (time.perf_counter() - start) / len(queries), results
+
+
+def recall(truth: list, found: list) -> float:
+    hits = sum(len(set(t) & set(f)) for t, f in zip(truth, found))
+    return hits / (len(truth) * TOP_K)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    rng = np.random.default_rng(0)
+    matrix = make_corpus(n, rng)
+    queries = make_queries(matrix, rng)
+
+    exact_seconds, truth = run(ExactIndex(matrix), queries)
+
+    start = time.perf_counter()
+    ivf = IVFIndex(matrix)
+    build_seconds = time.perf_counter() - start
+
+    print(f"chunks: {n}  dims: {DIMENSIONS}  lists: {ivf.n_lists}  ivf build: {build_seconds:.2f}s")
+    print(f"{'backend':<16}{'ms/query':>10}{'speed-up':>10}{f'recall@{TOP_K}':>11}")
+    print(f"{'exact':<16}{exact_seconds * 1000:>10.2f}{'1.0x':>10}{1.0:>11.3f}")
+    for n_probe in N_PROBES:
+        ivf.n_probe = n_probe
+        seconds, found = run(ivf, queries)
+        print(
+            f"{f'ivf n_probe={n_probe}':<16}{seconds * 1000:>10.2f}"
+            f"{exact_seconds / seconds:>9.1f}x{recall(truth, found):>11.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
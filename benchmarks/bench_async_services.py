@@ -0,0 +1,154 @@
+"""
+Benchmark: blocking vs async request handling for concurrent questions.
+
+Runs two scenarios against a local fake OpenAI server with simulated
+network latency, each handled two ways:
+
+  * cold question - first question on freshly uploaded code: the chunk
+    embeddings, the query embedding and the chat completion. The sync
+    flow issues them one after another; the async flow embeds batches
+    concurrently and overlaps the query embedding with the index build.
+  * concurrent questions - a batch of questions against an indexed
+    codebase. The sync flow handles them in turn; the async flow runs
+    them as coroutines on the shared event loop.
+
+The async flows use the pooled clients from services.openai_clients;
+connection reuse for them is printed at the end. The sync flows call
+the API directly, so the async flows run under a scheduler with
+effectively unlimited rate limits: the default RATE_LIMITS would
+measure the throttle, not the concurrency.
+
+Run: python benchmarks/bench_async_services.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openai import OpenAI, AsyncOpenAI
+from config import EMBEDDING_MODEL, EMBEDDING_BATCH_SIZE, OPENAI_MODEL
+from services.chunker import chunk_code
+from services import embedding_cache
+from services.embedding_cache import EmbeddingCache
+from services import rate_limiter
+from services.async_runtime import run_sync
+from services.openai_clients import async_openai_client, get_client_pool
+from services.rate_limiter import RequestScheduler
+from services.index_registry import aretrieve_context
+from benchmarks.fake_openai_server import FakeOpenAIServer
+
+N_QUESTIONS = 32
+N_FUNCTIONS = 2000
+LATENCY = 0.05  # simulated network round-trip per request (seconds)
+API_KEY = "sk-benchmark"
+UNLIMITED = {"rpm": 10 ** 9, "tpm": 10 ** 12}
+
+
+def make_code(n_functions: int) -> str:
+    return "\n".join(
+        f"def function_{i}(value):\n    return value * {i} + {i % 7}\n"
+        for i in range(n_functions)
+    )
+
+
+def bench_cold_sync(base_url: str, code: str, question: str) -> float:
+    client = OpenAI(api_key=API_KEY, base_url=base_url)
+    start = time.perf_counter()
+    texts = [chunk.text for chunk in chunk_code(code)[0]]
+    for i in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+        client.embeddings.create(model=EMBEDDING_MODEL, input=texts[i:i + EMBEDDING_BATCH_SIZE])
+    client.embeddings.create(model=EMBEDDING_MODEL, input=question)
+    client.chat.completions.create(
+        model=OPENAI_MODEL,
+        messages=[{"role": "user", "content": question}],
+        temperature=0,
+    )
+    return time.perf_counter() - start
+
+
+def bench_cold_async(code: str, question: str) -> float:
+    start = time.perf_counter()
+    run_sync(answer_all(code, [question]))
+    return time.perf_counter() - start
+
+
+def bench_sync(base_url: str, questions: list) -> float:
+    client = OpenAI(api_key=API_KEY, base_url=base_url)
+    start = time.perf_counter()
+    for question in questions:
+        client.embeddings.create(model=EMBEDDING_MODEL, input=question)
+        client.chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=[{"role": "user", "content": question}],
+            temperature=0,
+        )
+    return time.perf_counter() - start
+
+
+async def answer(client: AsyncOpenAI, code: str, question: str) -> str:
+    result = await aretrieve_context(API_KEY, code, question)
+    response = await client.chat.completions.create(
+        model=OPENAI_MODEL,
+        messages=[{"role": "user", "content": f"CONTEXT:\n{result.text}\n\nQUESTION:\n{question}"}],
+        temperature=0,
+    )
+    return response.choices[0].message.content
+
+
+async def answer_all(code: str, questions: list) -> list:
+    async with async_openai_client(API_KEY) as client:
+        return await asyncio.gather(*(answer(client, code, q) for q in questions))
+
+
+def bench_async(code: str, questions: list) -> float:
+    start = time.perf_counter()
+    run_sync(answer_all(code, questions))
+    return time.perf_counter() - start
+
+
+def main():
+    code = make_code(N_FUNCTIONS)
+    questions = [f"What does function_{i} return?" for i in range(N_QUESTIONS)]
+
+    with tempfile.TemporaryDirectory() as tmp, FakeOpenAIServer(latency=LATENCY) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        # Fresh cache in a temp dir, so the cold build really embeds every chunk
+        embedding_cache._shared_cache = EmbeddingCache(os.path.join(tmp, "cache.sqlite3"))
+        rate_limiter._shared_scheduler = RequestScheduler({"chat": UNLIMITED, "embeddings": UNLIMITED})
+
+        cold_sync = bench_cold_sync(server.base_url, code, questions[0])
+        cold_async = bench_cold_async(code, questions[0])
+
+        # The cold run left the index built, so both paths below measure
+        # per-question work only
+        server.request_count = 0
+        sync_seconds = bench_sync(server.base_url, questions)
+        sync_requests = server.request_count
+
+        server.request_count = 0
+        async_seconds = bench_async(code, questions)
+        async_requests = server.request_count
+
+    print(f"cold question ({N_FUNCTIONS} functions)")
+    print(f"{'sync':<8}{cold_sync:>10.2f} s")
+    print(f"{'async':<8}{cold_async:>10.2f} s")
+    print(f"speed-up: {cold_sync / cold_async:.1f}x")
+    print()
+    print(f"concurrent questions: {N_QUESTIONS}  simulated latency: {LATENCY * 1000:.0f} ms/request")
+    print(f"{'path':<8}{'requests':>10}{'seconds':>10}{'questions/sec':>15}")
+    print(f"{'sync':<8}{sync_requests:>10}{sync_seconds:>10.2f}{N_QUESTIONS / sync_seconds:>15.1f}")
+    print(f"{'async':<8}{async_requests:>10}{async_seconds:>10.2f}{N_QUESTIONS / async_seconds:>15.1f}")
+    print(f"speed-up: {sync_seconds / async_seconds:.1f}x")
+
+    pool = get_client_pool().stats()
+    print()
+    print(f"async connections: {pool['connections_opened']} opened, "
+          f"{pool['connections_reused']} reused ({pool['reuse_rate']:.0%} reuse)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark: saving and resuming large uploads in the chunked code store.
+
+Streams synthetic source code of growing size into a temporary
+CodeStore, then reads it back both as an iterator (iter_code) and fully
+reassembled (get_code). Reports wall time and peak Python memory
+(tracemalloc) per operation; streamed save and iterated resume should
+stay flat as the payload grows.
+
+Run:
+    python benchmarks/bench_code_store.py [max_megabytes]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.code_store import CodeStore
+
+PIECE = "".join(
+    f"def handler_{i}(request):\n    return render(request, 'page_{i}.html', {{'id': {i}}})\n\n"
+    for i in range(200)
+)
+
+
+def pieces(megabytes: int):
+    # Vary the text so chunks do not all compress identically
+    target, sent, n = megabytes * 1024 * 1024, 0, 0
+    while sent < target:
+        piece = f"# File: module_{n}.py\n{PIECE}"
+        sent += len(piece)
+        n += 1
+        yield piece
+
+
+def measure(fn) -> tuple:
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak / (1024 * 1024), result
+
+
+def main():
+    max_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    sizes = [mb for mb in (1, 4, 16, 64, 256) if mb <= max_mb]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = CodeStore(os.path.join(tmp, "code.sqlite3"))
+        print(f"{'payload':>8}{'save s':>9}{'save MB':>9}{'iter s':>9}{'iter MB':>9}{'get s':>8}{'get MB':>8}{'ratio':>7}")
+        for mb in sizes:
+            session = f"session-{mb}"
+            save_s, save_mb, _ = measure(lambda: store.save_code(session, pieces(mb), "upload.zip"))
+            iter_s, iter_mb, _ = measure(lambda: sum(len(text) for text in store.iter_code(session)))
+            get_s, get_mb, _ = measure(lambda: len(store.get_code(session)))
+            stats = store.stats()
+            store.delete_session(session)
+            print(
+                f"{mb:>6}MB{save_s:>9.2f}{save_mb:>9.1f}{iter_s:>9.2f}{iter_mb:>9.1f}"
+                f"{get_s:>8.2f}{get_mb:>8.1f}{stats['raw_bytes'] / stats['stored_bytes']:>6.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
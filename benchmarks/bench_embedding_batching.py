@@ -0,0 +1,75 @@
+"""
+Benchmark: per-chunk vs batched embedding in VectorStore.build.
+
+Runs both paths against a local fake embeddings server and reports
+chunks/sec and the number of HTTP requests each path issued.
+
+Run:
+    python benchmarks/bench_embedding_batching.py
+"""
+
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openai import OpenAI
+from config import EMBEDDING_MODEL
+from services.vector_store import VectorStore
+from services.chunker import chunk_code
+from benchmarks.fake_openai_server import FakeOpenAIServer
+
+N_FUNCTIONS = 400
+LATENCY = 0.02  # simulated network round-trip per request (seconds)
+
+
+def make_code(n_functions: int) -> str:
+    return "\n".join(
+        f"def function_{i}(value):\n    return value * {i} + {i % 7}\n"
+        for i in range(n_functions)
+    )
+
+
+def bench_per_chunk(base_url: str, chunks: list) -> float:
+    # The original path: one blocking request per chunk
+    client = OpenAI(api_key="sk-benchmark", base_url=base_url)
+    start = time.perf_counter()
+    for chunk in chunks:
+        client.embeddings.create(model=EMBEDDING_MODEL, input=chunk)
+    return time.perf_counter() - start
+
+
+def bench_batched(base_url: str, code: str) -> float:
+    # VectorStore builds its own client, which honours OPENAI_BASE_URL;
+    # bypass the persistent cache so every run measures API round-trips
+    os.environ["OPENAI_BASE_URL"] = base_url
+    vs = VectorStore("sk-benchmark", use_cache=False)
+    start = time.perf_counter()
+    vs.build(code)
+    return time.perf_counter() - start
+
+
+def main():
+    code = make_code(N_FUNCTIONS)
+
+    with FakeOpenAIServer(latency=LATENCY) as server:
+        chunks = [chunk.text for chunk in chunk_code(code)[0]]
+
+        server.request_count = 0
+        old_seconds = bench_per_chunk(server.base_url, chunks)
+        old_requests = server.request_count
+
+        server.request_count = 0
+        new_seconds = bench_batched(server.base_url, code)
+        new_requests = server.request_count
+
+    print(f"chunks: {len(chunks)}  simulated latency: {LATENCY * 1000:.0f} ms/request")
+    print(f"{'path':<12}{'requests':>10}{'seconds':>10}{'chunks/sec':>12}")
+    print(f"{'per-chunk':<12}{old_requests:>10}{old_seconds:>10.2f}{len(chunks) / old_seconds:>12.1f}")
+    print(f"{'batched':<12}{new_requests:>10}{new_seconds:>10.2f}{len(chunks) / new_seconds:>12.1f}")
+    print(f"speed-up: {old_seconds / new_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
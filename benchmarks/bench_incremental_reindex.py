@@ -0,0 +1,65 @@
+"""
+Benchmark: full rebuild vs incremental re-index after a small edit.
+
+Indexes a generated codebase, edits one function body, then compares
+building a fresh VectorStore for the edited code with
+VectorStore.reindex, which embeds only added or changed chunks. The
+persistent embedding cache is bypassed so both paths pay for every
+embedding they request.
+
+Run: python benchmarks/bench_incremental_reindex.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.vector_store import VectorStore
+from benchmarks.fake_openai_server import FakeOpenAIServer
+
+N_FUNCTIONS = 3000
+LATENCY = 0.05  # simulated network round-trip per request (seconds)
+
+
+def make_code(n_functions: int, edited: int = -1) -> str:
+    return "\n".join(
+        f"def function_{i}(value):\n"
+        f"    total = value * {i} + {i % 7}\n"
+        f"    return total{' - 1' if i == edited else ''}\n"
+        for i in range(n_functions)
+    )
+
+
+def main():
+    code = make_code(N_FUNCTIONS)
+    edited = make_code(N_FUNCTIONS, edited=N_FUNCTIONS // 2)
+
+    with FakeOpenAIServer(latency=LATENCY) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        store = VectorStore("sk-benchmark", use_cache=False)
+        store.build(code)
+
+        server.request_count = 0
+        start = time.perf_counter()
+        VectorStore("sk-benchmark", use_cache=False).build(edited)
+        full_seconds = time.perf_counter() - start
+        full_requests = server.request_count
+
+        server.request_count = 0
+        start = time.perf_counter()
+        updated = store.reindex(edited)
+        incremental_seconds = time.perf_counter() - start
+        incremental_requests = server.request_count
+
+    stats = updated.reindex_stats
+    print(f"chunks: {stats['chunks']}  simulated latency: {LATENCY * 1000:.0f} ms/request")
+    print(f"{'path':<14}{'embedded':>10}{'requests':>10}{'seconds':>10}")
+    print(f"{'full rebuild':<14}{stats['chunks']:>10}{full_requests:>10}{full_seconds:>10.2f}")
+    print(f"{'incremental':<14}{stats['reembedded']:>10}{incremental_requests:>10}{incremental_seconds:>10.2f}")
+    print(f"unchanged: {stats['unchanged']}  removed: {stats['removed']}  tombstones: {stats['tombstones']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Benchmark: quantized exact scans (int8 / float16 + rescoring) vs float32.
+
+Uses the same clustered synthetic corpus as bench_ann_search and reports
+resident bytes per chunk, queries per second, and recall@k against the
+float32 exact scan for each precision and rescore factor.
+
+Run:
+    python benchmarks/bench_quantization.py [n_chunks]
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_ann_search import TOP_K, make_corpus, make_queries, run, recall
+
+import numpy as np
+from services.ann_index import ExactIndex, QuantizedIndex
+
+PRECISIONS = ["int8", "float16"]
+RESCORE_FACTORS = [1, 2, 4, 8]
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    rng = np.random.default_rng(0)
+    matrix = make_corpus(n, rng)
+    queries = make_queries(matrix, rng)
+
+    exact_seconds, truth = run(ExactIndex(matrix), queries)
+
+    print(f"chunks: {n}  dims: {matrix.shape[1]}")
+    print(f"{'index':<22}{'bytes/chunk':>12}{'QPS':>9}{f'recall@{TOP_K}':>11}")
+    print(f"{'float32':<22}{matrix.nbytes // n:>12}{1 / exact_seconds:>9.1f}{1.0:>11.3f}")
+    for precision in PRECISIONS:
+        index = QuantizedIndex(matrix, precision)
+        for factor in RESCORE_FACTORS:
+            index.rescore_factor = factor
+            seconds, found = run(index, queries)
+            print(
+                f"{f'{precision} rescore={factor}':<22}{index.memory_bytes // n:>12}"
+                f"{1 / seconds:>9.1f}{recall(truth, found):>11.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
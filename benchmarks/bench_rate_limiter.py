@@ -0,0 +1,81 @@
+"""
+Benchmark: interactive latency during a bulk job under a shared rate limit.
+
+A burst of bulk chat requests (documentation / diagram jobs) is started
+on one API key, and interactive chat requests arrive shortly after. The
+request scheduler holds everything to a low requests-per-minute limit;
+the run is repeated with the interactive requests sent at bulk priority
+(plain FIFO queueing) to show what prioritisation buys. Prints mean and
+max latency per class and the scheduler's queue metrics.
+
+Run: python benchmarks/bench_rate_limiter.py
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import OPENAI_MODEL
+from services import rate_limiter
+from services.async_runtime import run_sync
+from services.openai_clients import async_openai_client
+from services.rate_limiter import BULK, INTERACTIVE, RequestScheduler, request_priority
+from benchmarks.fake_openai_server import FakeOpenAIServer
+
+N_BULK = 80
+N_INTERACTIVE = 8
+CHAT_RPM = 600        # 10 requests/second
+BURST_SECONDS = 1.0
+LATENCY = 0.05
+
+
+async def ask(api_key: str, priority: int, delay: float) -> float:
+    await asyncio.sleep(delay)
+    start = time.perf_counter()
+    with request_priority(priority):
+        async with async_openai_client(api_key) as client:
+            await client.chat.completions.create(
+                model=OPENAI_MODEL,
+                messages=[{"role": "user", "content": "Summarize this module."}],
+                temperature=0,
+            )
+    return time.perf_counter() - start
+
+
+async def scenario(api_key: str, interactive_priority: int) -> tuple:
+    bulk = [ask(api_key, BULK, 0.0) for _ in range(N_BULK)]
+    # Users ask questions while the bulk job is already queued
+    interactive = [ask(api_key, interactive_priority, 0.5 + 0.1 * i) for i in range(N_INTERACTIVE)]
+    results = await asyncio.gather(*bulk, *interactive)
+    return results[:N_BULK], results[N_BULK:]
+
+
+def main():
+    with FakeOpenAIServer(latency=LATENCY) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+
+        print(f"bulk: {N_BULK}  interactive: {N_INTERACTIVE}  limit: {CHAT_RPM} rpm")
+        print(f"{'queueing':<12}{'class':<13}{'mean ms':>9}{'max ms':>9}")
+        for label, priority in (("fifo", BULK), ("priority", INTERACTIVE)):
+            # A fresh scheduler and API key, so each run starts with full buckets
+            scheduler = RequestScheduler(
+                {"chat": {"rpm": CHAT_RPM, "tpm": 10 ** 9}, "embeddings": {"rpm": 10 ** 6, "tpm": 10 ** 9}},
+                burst_seconds=BURST_SECONDS,
+            )
+            rate_limiter._shared_scheduler = scheduler
+            bulk, interactive = run_sync(scenario(f"sk-bench-{label}", priority))
+            for name, latencies in (("interactive", interactive), ("bulk", bulk)):
+                print(
+                    f"{label:<12}{name:<13}{1000 * sum(latencies) / len(latencies):>9.0f}"
+                    f"{1000 * max(latencies):>9.0f}"
+                )
+            stats = scheduler.stats()
+            print(f"{'':<12}scheduler: {stats['delayed']} of {stats['requests']} delayed, "
+                  f"mean wait {stats['mean_wait_ms']:.0f} ms, max {stats['max_wait_ms']:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark: cold start and per-message ingest cost of the session search
+embedding backends.
+
+For each backend, cold start is the time from a fresh process-wide
+function to the first embedded message (model load included), and
+ingest is the per-message cost of embedding chat messages one turn
+(two messages) at a time, as the message writer saves them. The OpenAI
+backend runs against the local fake server with a temporary embedding
+cache and is measured again once the cache is warm. Peak RSS growth is
+reported per backend; backends run from lightest to heaviest so each
+figure is attributable. "local" needs chromadb and is skipped without it.
+
+Run:
+    python benchmarks/bench_session_embeddings.py [n_messages]
+"""
+
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import services.session_embeddings as session_embeddings
+from services.embedding_cache import EmbeddingCache
+from benchmarks.fake_openai_server import FakeOpenAIServer
+
+LATENCY = 0.05  # simulated embeddings round-trip (seconds)
+
+TOPICS = ["VectorStore.search", "save_code_content", "the chunker", "rate limits", "mermaid diagrams"]
+
+
+def make_messages(n: int) -> list:
+    return [
+        f"Question {i}: how does {TOPICS[i % len(TOPICS)]} handle a file with {i * 7} lines? "
+        f"Answer: it splits the input, embeds each part and caches vectors keyed by content hash."
+        for i in range(n)
+    ]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def bench(label: str, make_function, messages: list):
+    session_embeddings._shared_functions.clear()
+    rss = peak_rss_mb()
+
+    start = time.perf_counter()
+    function = make_function()
+    function(messages[:1])
+    cold = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(1, len(messages), 2):
+        function(messages[i:i + 2])
+    per_message = (time.perf_counter() - start) / max(1, len(messages) - 1)
+
+    print(f"{label:<16}{cold * 1000:>12.1f}{per_message * 1000:>14.3f}{peak_rss_mb() - rss:>12.1f}")
+    return function
+
+
+def main():
+    n_messages = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    messages = make_messages(n_messages)
+    print(f"{n_messages} messages, simulated OpenAI latency {LATENCY * 1000:.0f} ms")
+    print(f"{'backend':<16}{'cold ms':>12}{'ms/message':>14}{'+RSS MB':>12}")
+
+    bench("hashing", lambda: session_embeddings.get_session_embedding_function("hashing"), messages)
+
+    with tempfile.TemporaryDirectory() as tmp, FakeOpenAIServer(latency=LATENCY) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        cache = EmbeddingCache(os.path.join(tmp, "cache.sqlite3"))
+
+        def openai_function():
+            function = session_embeddings.get_session_embedding_function("openai", "sk-benchmark")
+            function._embedder.cache = cache
+            return function
+
+        bench("openai", openai_function, messages)
+        bench("openai (cached)", openai_function, messages)
+
+    try:
+        import chromadb  # noqa: F401
+    except ImportError:
+        print(f"{'local':<16}  skipped: chromadb is not installed")
+        return
+    bench("local", lambda: session_embeddings.get_session_embedding_function("local"), messages)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark: similarity search in VectorStore at 1k / 10k / 100k chunks.
+
+Compares the original pure-Python path (generator-sum cosine per chunk
++ full sort) with the vectorized path (one float32 mat-vec product over
+the pre-normalized matrix + argpartition top-k).
+
+The pure-Python path needs ~50 bytes per boxed float, so it is only run
+up to 10k chunks by default; pass --full to include 100k.
+
+Run:
+    python benchmarks/bench_similarity_search.py
+"""
+
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from services.vector_store import VectorStore
+from services.ann_index import select_top_k
+
+DIMENSIONS = 1536
+TOP_K = 3
+SIZES = [1_000, 10_000, 100_000]
+PYTHON_PATH_LIMIT = 10_000
+
+
+def python_cosine(vec1: list, vec2: list) -> float:
+    dot_product = sum(a * b for a, b in zip(vec1, vec2))
+    magnitude1 = (sum(a ** 2 for a in vec1)) ** 0.5
+    magnitude2 = (sum(b ** 2 for b in vec2)) ** 0.5
+    if magnitude1 == 0 or magnitude2 == 0:
+        return 0.0
+    return dot_product / (magnitude1 * magnitude2)
+
+
+def python_search(embeddings: list, query: list) -> list:
+    similarities = [(python_cosine(query, emb), i) for i, emb in enumerate(embeddings)]
+    similarities.sort(reverse=True)
+    return [idx for _, idx in similarities[:TOP_K]]
+
+
+def numpy_search(matrix: np.ndarray, query: np.ndarray) -> list:
+    query = VectorStore._normalize(query[np.newaxis, :])[0]
+    return [idx for _, idx in select_top_k(matrix @ query, TOP_K)]
+
+
+def timed(fn, repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = fn()
+    return (time.perf_counter() - start) / repeats, result
+
+
+def main():
+    full = "--full" in sys.argv
+    rng = np.random.default_rng(0)
+
+    print(f"{'chunks':>8}{'python ms':>12}{'numpy ms':>12}{'speed-up':>10}{'same top-k':>12}")
+    for n in SIZES:
+        raw = rng.standard_normal((n, DIMENSIONS), dtype=np.float32)
+        query = rng.standard_normal(DIMENSIONS, dtype=np.float32)
+        matrix = VectorStore._normalize(raw)
+
+        numpy_seconds, numpy_top = timed(lambda: numpy_search(matrix, query), repeats=20)
+
+        if n <= PYTHON_PATH_LIMIT or full:
+            embeddings = raw.tolist()
+            query_list = query.tolist()
+            python_seconds, python_top = timed(lambda: python_search(embeddings, query_list), repeats=1)
+            del embeddings
+            print(
+                f"{n:>8}{python_seconds * 1000:>12.1f}{numpy_seconds * 1000:>12.2f}"
+                f"{python_seconds / numpy_seconds:>9.0f}x{str(python_top == numpy_top):>12}"
+            )
+        else:
+            print(f"{n:>8}{'skipped':>12}{numpy_seconds * 1000:>12.2f}{'-':>10}{'-':>12}")
+
+
+if __name__ == "__main__":
+    main()
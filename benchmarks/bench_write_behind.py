@@ -0,0 +1,116 @@
+"""
+Benchmark: chat turn latency with synchronous vs write-behind saving.
+
+A fake SessionStore sleeps for the cost of embedding and upserting a
+turn (--store-ms, plus --store-ms-per-turn for each turn in a batched
+save). Each simulated chat turn spends --llm-ms on the answer and then
+saves it either synchronously, as mcp_bridges used to, or through
+MessageWriter. Reports per-turn latency after the answer is ready and
+end to end, the number of store calls, and checks that turns left
+unsaved by an abandoned writer are replayed from the journal.
+
+Run:
+    python benchmarks/bench_write_behind.py [--turns 40] [--store-ms 150]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.message_writer import MessageWriter
+
+
+class SlowStore:
+    """
+    Stands in for SessionStore: every save pays a fixed embedding/upsert
+    cost, batched saves pay it once plus a smaller per-turn cost.
+    """
+
+    def __init__(self, store_ms: float, per_turn_ms: float, gate: threading.Event = None):
+        self.store_s = store_ms / 1000
+        self.per_turn_s = per_turn_ms / 1000
+        self.gate = gate
+        self.calls = 0
+        self.turns = []
+        self._lock = threading.Lock()
+
+    def save_conversation_turn(self, session_id, question, answer):
+        self.save_conversation_turns([(session_id, question, answer)])
+
+    def save_conversation_turns(self, turns):
+        if self.gate is not None:
+            self.gate.wait()
+        time.sleep(self.store_s + self.per_turn_s * len(turns))
+        with self._lock:
+            self.calls += 1
+            self.turns.extend(turns)
+
+
+def run_chat(turns: int, llm_ms: float, save) -> list:
+    """
+    Per-turn (save seconds, end-to-end seconds).
+    """
+    timings = []
+    for i in range(turns):
+        start = time.perf_counter()
+        time.sleep(llm_ms / 1000)
+        answered = time.perf_counter()
+        save("bench-session", f"question {i}", f"answer {i}")
+        done = time.perf_counter()
+        timings.append((done - answered, done - start))
+    return timings
+
+
+def summarize(label: str, timings: list, store: SlowStore):
+    save_ms = sorted(1000 * s for s, _ in timings)
+    total_ms = [1000 * t for _, t in timings]
+    p95 = save_ms[int(0.95 * (len(save_ms) - 1))]
+    print(
+        f"{label:<14}{statistics.median(save_ms):>10.1f}{p95:>10.1f}"
+        f"{statistics.mean(total_ms):>12.1f}{store.calls:>8}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--llm-ms", type=float, default=50)
+    parser.add_argument("--store-ms", type=float, default=150)
+    parser.add_argument("--store-ms-per-turn", type=float, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'mode':<14}{'save p50':>10}{'save p95':>10}{'turn mean':>12}{'calls':>8}  (ms)")
+
+        store = SlowStore(args.store_ms, args.store_ms_per_turn)
+        summarize("synchronous", run_chat(args.turns, args.llm_ms, store.save_conversation_turn), store)
+
+        store = SlowStore(args.store_ms, args.store_ms_per_turn)
+        writer = MessageWriter(lambda: store, os.path.join(tmp, "journal.jsonl"))
+        timings = run_chat(args.turns, args.llm_ms, writer.submit)
+        writer.close(timeout=30)
+        summarize("write-behind", timings, store)
+        assert len(store.turns) == args.turns
+
+        # Crash: the store never answers and the writer is abandoned
+        journal = os.path.join(tmp, "crash.jsonl")
+        stuck = SlowStore(args.store_ms, args.store_ms_per_turn, gate=threading.Event())
+        abandoned = MessageWriter(lambda: stuck, journal)
+        for i in range(5):
+            abandoned.submit("crash-session", f"question {i}", f"answer {i}")
+
+        recovered = SlowStore(args.store_ms, args.store_ms_per_turn)
+        writer = MessageWriter(lambda: recovered, journal)
+        writer.flush(timeout=30)
+        print(f"\nreplayed after crash: {writer.replayed} turns, saved {len(recovered.turns)}")
+        writer.close(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Local fake OpenAI API for benchmarks.
+
+Serves `POST /v1/embeddings` with deterministic pseudo-random vectors and
+`POST /v1/chat/completions` (plain or streamed) with a canned answer,
+plus a configurable per-request latency that stands in for the network
+round-trip to api.openai.com. A fraction of requests can be refused with
+429 + Retry-After to exercise rate-limit handling. Point an OpenAI client
+at it with `base_url=server.base_url`.
+"""
+
+import base64
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+
+class _Server(ThreadingHTTPServer):
+    # The default listen backlog of 5 drops bursts of concurrent
+    # connections, which then stall for a SYN retransmit
+    request_queue_size = 128
+
+
+def fake_embedding(text: str, dimensions: int = 1536) -> np.ndarray:
+    """
+    Deterministic unit-length float32 vector derived from the text.
+    Generated with NumPy so the server, which shares the benchmark's
+    process and GIL, stays cheap next to the simulated latency.
+    """
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+    vec = np.random.default_rng(seed).random(dimensions, dtype=np.float32) - 0.5
+    return vec / np.linalg.norm(vec)
+
+
+class FakeOpenAIServer:
+    """
+    Threaded HTTP server emulating the OpenAI endpoints used by AureliaScript.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        dimensions: int = 1536,
+        answer: str = "This code defines a helper.",
+        rate_limit_rate: float = 0.0,
+        retry_after: float = 0.05,
+    ):
+        self.latency = latency
+        self.dimensions = dimensions
+        self.answer = answer
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.request_count = 0
+        self.rate_limited_count = 0
+        self._random = random.Random(0)
+        self._lock = threading.Lock()
+        self._httpd = _Server(("127.0.0.1", 0), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ── Endpoint handlers ──────────────────────────────────────
+
+    def handle_embeddings(self, body: dict) -> dict:
+        inputs = body.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        # The SDK requests base64 float32 payloads when numpy is available
+        as_base64 = body.get("encoding_format") == "base64"
+        data = []
+        for i, text in enumerate(inputs):
+            vec = fake_embedding(text, self.dimensions)
+            if as_base64:
+                vec = base64.b64encode(vec.tobytes()).decode("ascii")
+            else:
+                vec = [round(v, 6) for v in vec.tolist()]
+            data.append({"object": "embedding", "index": i, "embedding": vec})
+        tokens = sum(len(text) // 4 for text in inputs)
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "text-embedding-3-small"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    def handle_chat(self, body: dict) -> dict:
+        return {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o-mini"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": self.answer},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+    def stream_chat_events(self, body: dict):
+        """
+        Server-sent events for a streamed completion, one word per chunk.
+        """
+        words = self.answer.split(" ")
+        for i, word in enumerate(words):
+            token = word if i == 0 else " " + word
+            yield {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "gpt-4o-mini"),
+                "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+            }
+        yield {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o-mini"),
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+        }
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+
+                with server._lock:
+                    server.request_count += 1
+                    refuse = server._random.random() < server.rate_limit_rate
+                    server.rate_limited_count += refuse
+                time.sleep(server.latency)
+
+                if refuse:
+                    self._send_rate_limited()
+                    return
+
+                if self.path.endswith("/chat/completions") and body.get("stream"):
+                    self._send_stream(server.stream_chat_events(body))
+                    return
+                if self.path.endswith("/embeddings"):
+                    payload = server.handle_embeddings(body)
+                elif self.path.endswith("/chat/completions"):
+                    payload = server.handle_chat(body)
+                else:
+                    self.send_error(404)
+                    return
+
+                raw = json.dumps(payload).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def _send_rate_limited(self):
+                raw = json.dumps({"error": {"message": "Rate limit reached", "type": "requests"}}).encode("utf-8")
+                self.send_response(429)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.send_header("retry-after-ms", str(int(server.retry_after * 1000)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def _send_stream(self, events):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                for event in events:
+                    self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
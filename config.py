@@ -1,6 +1,98 @@
 # config.py
 OPENAI_MODEL = "gpt-4o-mini"
 
+# ── Embeddings ──
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIMENSIONS = 1536
+EMBEDDING_BATCH_SIZE = 256          # max inputs per embeddings.create call
+EMBEDDING_BATCH_MAX_TOKENS = 100000  # max estimated tokens per call
+EMBEDDING_MAX_INPUT_TOKENS = 8000    # per-input limit (model max is 8191)
+EMBEDDING_MAX_RETRIES = 2            # retries per batch on rate limits / transient errors
+EMBEDDING_BACKOFF_BASE = 0.5         # seconds; doubled per retry, with full jitter
+EMBEDDING_BACKOFF_MAX = 20.0         # cap on one backoff wait (also caps Retry-After)
+EMBEDDING_RETRY_FAILED_SECONDS = 60  # min gap between re-embedding an index's failed chunks
+EMBEDDING_CONCURRENCY = 4            # batches embedded in parallel
+
+# ── Persistence ──
+SESSION_DATA_DIR = "./session_data"
+EMBEDDING_CACHE_PATH = f"{SESSION_DATA_DIR}/embedding_cache.sqlite3"
+EMBEDDING_CACHE_MAX_BYTES = 256 * 1024 * 1024  # LRU-evicted beyond this size
+COMPLETION_CACHE_PATH = f"{SESSION_DATA_DIR}/completion_cache.sqlite3"
+COMPLETION_CACHE_MAX_BYTES = 64 * 1024 * 1024  # LRU-evicted beyond this size
+COMPLETION_CACHE_TTL_SECONDS = 7 * 24 * 3600   # temperature-0 answers reused for this long
+SESSION_CATALOG_PATH = f"{SESSION_DATA_DIR}/session_catalog.sqlite3"  # per-session counts for the sidebar
+CODE_STORE_PATH = f"{SESSION_DATA_DIR}/code_store.sqlite3"  # uploaded code, deduplicated by content
+CODE_STORE_CHUNK_BYTES = 1024 * 1024                        # code stored and read back in chunks of this size
+CODE_STORE_COMPRESSION_LEVEL = 6                            # zlib level for stored code
+MESSAGE_JOURNAL_PATH = f"{SESSION_DATA_DIR}/message_journal.jsonl"  # chat turns not yet saved to Chroma
+MESSAGE_JOURNAL_FSYNC = True        # fsync each journaled turn (survives power loss, not just crashes)
+MESSAGE_WRITE_BATCH_SIZE = 32       # chat turns saved to Chroma per batch
+MESSAGE_WRITE_MAX_DELAY = 0.5       # seconds a turn may wait for its batch to fill
+INDEX_STORE_DIR = f"{SESSION_DATA_DIR}/indexes"   # memory-mapped built indexes
+INDEX_STORE_DTYPE = "float32"                     # "float32" (zero-copy) or "float16" (half the disk)
+INDEX_STORE_MAX_BYTES = 2 * 1024 * 1024 * 1024    # least-recently-loaded indexes pruned beyond this
+
+# ── Session search embeddings ──
+SESSION_HASHING_DIMENSIONS = 1024  # vector size for the "hashing" session embedding backend
+
+# ── Upload ingestion ──
+INGEST_MAX_FILE_BYTES = 1024 * 1024         # larger archive members are skipped
+INGEST_MAX_TOTAL_BYTES = 20 * 1024 * 1024   # text read from one upload, in total
+INGEST_MAX_FILES = 5000                     # archive members read from one upload
+INGEST_SNIFF_BYTES = 8192                   # leading bytes checked for binary content
+
+# ── Session index registry ──
+INDEX_REGISTRY_MAX_INDEXES = 32     # VectorStores kept in memory at once
+INDEX_REGISTRY_MAX_CHUNKS = 50000   # total chunks across all cached indexes
+INDEX_REGISTRY_IDLE_SECONDS = 1800  # evict indexes unused for this long
+REINDEX_COMPACT_RATIO = 0.25        # compact a re-indexed store past this share of tombstones
+
+# ── Code chunking ──
+CHUNK_MAX_TOKENS = 512    # chunks larger than this are split further
+CHUNK_MIN_TOKENS = 48     # adjacent smaller units are merged
+CHUNK_OVERLAP_LINES = 3   # lines repeated between windows of an oversized unit
+
+# ── Prompt context assembly ──
+CONTEXT_TOKEN_BUDGETS = {       # retrieved-code budget per chat model
+    "gpt-4o-mini": 3000,
+    "gpt-4o": 3000,
+}
+DEFAULT_CONTEXT_TOKEN_BUDGET = 2000
+CONTEXT_CANDIDATES = 12         # top-scoring chunks considered for packing
+
+# ── Similarity search backend ──
+VECTOR_INDEX_BACKEND = "ivf"  # "exact" or "ivf" (approximate, for large uploads)
+ANN_MIN_CHUNKS = 5000         # below this, exact search is always used
+IVF_N_LISTS = 0               # k-means clusters; 0 = auto (~sqrt(n))
+IVF_N_PROBE = 8               # clusters scanned per query: higher = better recall, slower
+VECTOR_QUANTIZATION = "none"  # exact scans over "int8" or "float16" codes; "none" = float32
+QUANTIZED_RESCORE_FACTOR = 4  # shortlist of factor * top_k rescored at full precision
+HYBRID_SEARCH = True          # fuse BM25 (exact identifiers) with cosine results
+BM25_K1 = 1.2                 # term-frequency saturation
+BM25_B = 0.75                 # document-length normalization
+HYBRID_RRF_K = 60             # reciprocal rank fusion damping
+RRF_CANDIDATE_FACTOR = 4      # each ranking fused this many times deeper than top_k
+
+# ── OpenAI client pool ──
+OPENAI_CLIENT_POOL_SIZE = 16          # pooled clients (per API key and sync/async)
+OPENAI_CLIENT_IDLE_SECONDS = 900      # close clients unused for this long
+OPENAI_MAX_CONNECTIONS = 32           # HTTP connections per client
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = 16 # idle connections kept open for reuse
+OPENAI_KEEPALIVE_EXPIRY = 60          # seconds an idle connection stays open
+
+# ── OpenAI request scheduler ──
+RATE_LIMITS = {                       # per API key; match the account's usage tier
+    "chat": {"rpm": 500, "tpm": 200000},
+    "embeddings": {"rpm": 3000, "tpm": 1000000},
+}
+RATE_LIMIT_BURST_SECONDS = 10         # bucket size, in seconds of the per-minute budget
+RATE_LIMIT_COMPLETION_TOKENS = 1000   # tokens reserved per chat request for the answer
+
+# ── Documentation map-reduce ──
+DOC_MAP_UNIT_TOKENS = 6000      # code per map-stage summary request
+DOC_REDUCE_MAX_TOKENS = 12000   # summaries merged per reduce request
+DOC_CONCURRENCY = 4             # summary requests in flight at once
+
 DOC_STRUCTURE_RULES = """
 You are a Professional Technical Writer. Generate a Markdown document based on the provided source code.
 The code may be in ANY programming language (Python, Java, JavaScript, C++, Go, Rust, etc.).
@@ -37,6 +129,22 @@ Footer (optional): links, credits, etc.
 - Keep lines under 80-100 characters when possible.
 """
 
+DOC_MAP_PROMPT = """
+You are a senior engineer preparing notes for a technical writer.
+Summarize the source code below, which is one part of a larger codebase.
+Cover its purpose, the public classes and functions (with signatures),
+important data structures, configuration, and how it interacts with
+other modules. Be factual and concise; use Markdown bullet lists.
+Do not write an introduction or conclusion.
+"""
+
+DOC_REDUCE_PROMPT = """
+You are a senior engineer preparing notes for a technical writer.
+Merge the module summaries below into one consolidated summary.
+Keep every public class, function and configuration item, group
+related modules together, and drop repetition. Use Markdown bullet lists.
+"""
+
 DIAGRAM_RULES = {
     "CLASS_DIAGRAM": """
 Generate a strictly valid Mermaid Class Diagram based on the provided code.
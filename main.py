@@ -3,11 +3,22 @@ import os
 import streamlit as st
 import streamlit.components.v1 as components
 import uuid
-import zipfile
 import io  # Moved to top
 
 from services.session_store import SessionStore
 from services.questions import get_answer
+from services.embedding_cache import get_embedding_cache
+from services.openai_clients import get_client_pool
+from services.embedding_client import get_embedding_metrics
+from services.rate_limiter import get_request_scheduler
+from services.completion_cache import get_completion_cache
+from services.message_writer import FLUSH_TIMEOUT_SECONDS, get_message_writer
+from services.session_catalog import SessionCatalog, get_session_catalog
+from services.code_store import IncompleteCodeError, get_code_store
+from services.ingest import StreamedUpload
+from services.index_registry import IndexRegistry
+from services.chunker import chunk_code
+import services.index_registry
 
 # Import modules
 import config
@@ -35,6 +46,11 @@ def get_language_from_filename(filename):
     }
     return mapping.get(ext, "text")
 
+@st.cache_data(show_spinner=False)
+def get_chunk_stats(code_content, filename):
+    """Per-file chunk and token counts for the RAG index (no API calls)."""
+    return chunk_code(code_content, filename or None)[1]
+
 # ==========================
 # PAGE SETUP
 # ==========================
@@ -50,6 +66,20 @@ st.set_page_config(
 def get_session_store():
     return SessionStore()
 
+@st.cache_resource
+def get_catalog() -> SessionCatalog:
+    catalog = get_session_catalog()
+    catalog.seed_from(get_session_store())
+    return catalog
+
+# ==========================
+# SHARED RAG INDEX REGISTRY
+# ==========================
+@st.cache_resource
+def get_index_registry() -> IndexRegistry:
+    # Same process-wide instance the services draw from
+    return services.index_registry.get_index_registry()
+
 # ==========================
 # SIDEBAR
 # ==========================
@@ -85,6 +115,11 @@ with st.sidebar:
     else:
         api_key = ""
 
+    bypass_cache = st.checkbox(
+        "Bypass response cache",
+        help="Regenerate documentation, diagrams and answers even if unchanged code was already answered.",
+    )
+
     st.markdown("---")
 
     # ── Session History Panel ───────────────────────────────
@@ -113,10 +148,16 @@ with st.sidebar:
                 st.session_state.doc_content = None
                 st.session_state.mermaid_code = None
                 st.session_state.mermaid_analysis = None
+                st.session_state.diagram_batch = None
                 st.rerun()
         with col_new2:
             if st.button("🗑️", help="Delete current session"):
+                # Queued turns would otherwise be saved after the delete
+                get_message_writer().flush(current_sid, timeout=FLUSH_TIMEOUT_SECONDS)
                 store.delete_session(current_sid)
+                get_catalog().delete(current_sid)
+                get_code_store().delete_session(current_sid)
+                get_index_registry().invalidate(current_sid)
                 st.session_state.session_id = store.create_session()
                 st.session_state.messages = []
                 st.session_state.code_content = ""
@@ -124,12 +165,14 @@ with st.sidebar:
                 st.session_state.doc_content = None
                 st.session_state.mermaid_code = None
                 st.session_state.mermaid_analysis = None
+                st.session_state.diagram_batch = None
                 st.rerun()
 
         st.markdown("---")
 
         # ── Past sessions ──
-        sessions = store.list_sessions()
+        # Read from the catalogue: no scan of the session_logs collection
+        sessions = get_catalog().list_sessions(limit=9)
         past_sessions = [s for s in sessions if s["session_id"] != current_sid]
 
         if past_sessions:
@@ -148,22 +191,40 @@ with st.sidebar:
                     with col_resume:
                         if st.button("▶️ Resume", key=f"resume_{s['session_id']}", use_container_width=True):
                             st.session_state.session_id = s["session_id"]
+                            get_message_writer().flush(s["session_id"], timeout=FLUSH_TIMEOUT_SECONDS)
                             history = store.get_session(s["session_id"])
                             st.session_state.messages = [
                                 {"role": m["role"], "content": m["content"]}
                                 for m in history if m["role"] not in ["system_code", "system_filename"]
                             ]
-                            loaded_code = store.get_code_content(s["session_id"])
+                            # Sessions from before the code store kept their code in Chroma
+                            code_store = get_code_store()
+                            try:
+                                loaded_code = code_store.get_code(s["session_id"]) or store.get_code_content(s["session_id"])
+                            except IncompleteCodeError:
+                                # Re-uploaded or deleted elsewhere while being read
+                                loaded_code = ""
+                                st.session_state.resume_warning = (
+                                    "⚠️ This session's code could not be loaded completely. Please upload it again."
+                                )
                             st.session_state.code_content = loaded_code
-                            loaded_fname = store.get_metadata(s["session_id"], "system_filename")
+                            loaded_fname = (
+                                code_store.get_filename(s["session_id"])
+                                or store.get_metadata(s["session_id"], "system_filename")
+                            )
                             st.session_state.uploaded_filename = loaded_fname or "source_code.txt"
                             st.session_state.doc_content = None
                             st.session_state.mermaid_code = None
                             st.session_state.mermaid_analysis = None
+                            st.session_state.diagram_batch = None
                             st.rerun()
                     with col_delete:
                         if st.button("🗑️", key=f"del_{s['session_id']}"):
+                            get_message_writer().flush(s["session_id"], timeout=FLUSH_TIMEOUT_SECONDS)
                             store.delete_session(s["session_id"])
+                            get_catalog().delete(s["session_id"])
+                            get_code_store().delete_session(s["session_id"])
+                            get_index_registry().invalidate(s["session_id"])
                             st.rerun()
         else:
             st.caption("No past sessions yet.")
@@ -195,12 +256,57 @@ with st.sidebar:
 
         st.markdown("---")
 
-        stats = store.get_stats()
+        stats = get_catalog().get_stats()
         st.caption(
             f"📊 {stats['total_messages']} messages "
             f"in {stats['total_sessions']} sessions"
         )
 
+        cache_stats = get_embedding_cache().stats()
+        st.caption(
+            f"🧠 Embedding cache: {cache_stats['hits']} hits / "
+            f"{cache_stats['misses']} misses "
+            f"({cache_stats['entries']} vectors)"
+        )
+
+        completion_stats = get_completion_cache().stats()
+        st.caption(
+            f"💾 Response cache: {completion_stats['hits']} hits / "
+            f"{completion_stats['misses']} misses "
+            f"({completion_stats['hit_rate']:.0%} hit rate, {completion_stats['bypassed']} bypassed)"
+        )
+
+        pool_stats = get_client_pool().stats()
+        st.caption(
+            f"🔌 OpenAI connections: {pool_stats['connections_reused']} reused / "
+            f"{pool_stats['connections_opened']} opened"
+        )
+
+        scheduler_stats = get_request_scheduler().stats()
+        if scheduler_stats["delayed"] or scheduler_stats["queued"]:
+            st.caption(
+                f"⏳ OpenAI queue: {scheduler_stats['queued']} waiting "
+                f"({scheduler_stats['queued_bulk']} bulk), "
+                f"{scheduler_stats['delayed']} delayed, "
+                f"avg wait {scheduler_stats['mean_wait_ms']:.0f} ms"
+            )
+
+        writer_stats = get_message_writer().stats()
+        if writer_stats["queued"] or writer_stats["failures"]:
+            st.caption(
+                f"📝 Chat log: {writer_stats['queued']} turns waiting to be saved, "
+                f"{writer_stats['failures']} failed attempts"
+            )
+
+        embedding_stats = get_embedding_metrics().snapshot()
+        if embedding_stats["retries"] or embedding_stats["failed_inputs"]:
+            st.caption(
+                f"🩹 Embeddings: {embedding_stats['retries']} retries "
+                f"({embedding_stats['rate_limited']} rate-limited), "
+                f"{embedding_stats['failed_inputs']} failed / "
+                f"{embedding_stats['recovered_inputs']} recovered"
+            )
+
 if not api_key:
     if use_own_key and use_env_key:
         pass  # Warning already shown in sidebar
@@ -234,12 +340,18 @@ if "mermaid_analysis" not in st.session_state:
     st.session_state.mermaid_analysis = None
 if "current_diagram_type" not in st.session_state:
     st.session_state.current_diagram_type = "Class Diagram"
+if "diagram_batch" not in st.session_state:
+    st.session_state.diagram_batch = None
 
 # ==========================
 # FILE UPLOAD (MULTI-LANGUAGE + ZIP SUPPORT)
 # ==========================
 st.header("📄 Upload Source Code")
 
+# Set by a resume in the sidebar, which reruns the script straight away
+if st.session_state.get("resume_warning"):
+    st.warning(st.session_state.pop("resume_warning"))
+
 SUPPORTED_EXTENSIONS = {
     "py", "js", "ts", "jsx", "tsx", "java", "c", "cpp", "h", "hpp",
     "cs", "go", "rs", "rb", "php", "swift", "kt", "html", "css",
@@ -257,17 +369,43 @@ if uploaded_file:
     if ext not in SUPPORTED_EXTENSIONS:
         st.warning(f"⚠️ `.{ext}` is not a common source code file. Attempting to read anyway...")
 
-    try:
-        code_content = uploaded_file.read().decode("utf-8")
-        st.session_state.code_content = code_content
-        st.session_state.uploaded_filename = uploaded_file.name
-        if "session_id" in st.session_state:
-            store = get_session_store()
-            store.save_code_content(st.session_state.session_id, code_content)
-            store.save_metadata(st.session_state.session_id, "system_filename", uploaded_file.name)
-    except UnicodeDecodeError:
-        st.error("❌ Cannot read this file. It appears to be a binary file. Please upload a text-based source code file.")
-        code_content = ""
+    # Read each upload once per session (the widget keeps it across reruns)
+    upload_id = (st.session_state.session_id, getattr(uploaded_file, "file_id", uploaded_file.name), uploaded_file.size)
+    if st.session_state.get("ingested_upload") != upload_id:
+        # ZIP members are streamed one by one, each chunked and embedded as
+        # it is read; binaries and oversized files are skipped
+        upload = StreamedUpload(uploaded_file.name, uploaded_file)
+        with st.spinner("Reading and indexing upload..."):
+            get_index_registry().build_upload(api_key, upload, st.session_state.session_id)
+        st.session_state.ingested_upload = upload_id
+        st.session_state.ingest_report = upload.report
+        if upload.code_content:
+            st.session_state.code_content = upload.code_content
+            st.session_state.uploaded_filename = uploaded_file.name
+            get_code_store().save_code(st.session_state.session_id, upload.code_content, uploaded_file.name)
+            get_catalog().set_filename(st.session_state.session_id, uploaded_file.name)
+        else:
+            st.session_state.code_content = ""
+
+    code_content = st.session_state.code_content
+    ingest_report = st.session_state.ingest_report
+    if not code_content:
+        if ext == "zip":
+            st.error("❌ No readable source files found in this archive.")
+        elif ingest_report.skipped:
+            reason = ingest_report.skipped[0][1]
+            st.error(f"❌ Cannot read this file ({reason}). Please upload a text-based source code file.")
+        else:
+            st.error("❌ This file is empty. Please upload a file with source code in it.")
+
+    if ext == "zip" and code_content:
+        st.caption(f"🗜️ Read {ingest_report.files} files ({ingest_report.bytes // 1024} KB) from the archive.")
+    if ingest_report.skipped and ext == "zip":
+        with st.expander(f"⚠️ Skipped {len(ingest_report.skipped)} archive members"):
+            for path, reason in ingest_report.skipped:
+                st.markdown(f"- `{path}`: {reason}")
+    if ingest_report.truncated:
+        st.warning("⚠️ Upload size limit reached; remaining archive members were not read.")
 
 elif st.session_state.code_content:
     code_content = st.session_state.code_content
@@ -279,6 +417,17 @@ if code_content:
     display_lang = "text" if lang == "zip" else lang
     with st.expander(f"📂 View Uploaded Code ({len(code_content)} characters)"):
         st.code(code_content, language=display_lang, height=400)
+    with st.expander("🧩 Index Statistics"):
+        st.dataframe(
+            get_chunk_stats(code_content, st.session_state.get("uploaded_filename", "")),
+            use_container_width=True,
+        )
+        reindex = get_index_registry().last_reindex.get(st.session_state.session_id)
+        if reindex:
+            st.caption(
+                f"♻️ Last re-upload: {reindex['reembedded']} of {reindex['chunks']} chunks "
+                f"re-embedded ({reindex['unchanged']} unchanged, {reindex['removed']} removed)"
+            )
 
 # ==========================
 # TABS
@@ -336,16 +485,19 @@ with tab1:
             with st.chat_message("user"):
                 st.markdown(prompt)
 
-            with st.spinner("Thinking..."):
-                answer = services.questions.get_answer(
-                    code_content=code_content,
-                    question=prompt,
-                    api_key=api_key,
-                    session_id=st.session_state.session_id,
-                )
-
+            # Render tokens as they arrive; the session turn is logged
+            # by the service once the stream completes
             with st.chat_message("assistant"):
-                st.markdown(answer)
+                answer = st.write_stream(
+                    services.questions.stream_answer(
+                        code_content=code_content,
+                        question=prompt,
+                        api_key=api_key,
+                        session_id=st.session_state.session_id,
+                        use_cache=not bypass_cache,
+                        filename=st.session_state.uploaded_filename or None,
+                    )
+                )
 
             st.session_state.messages.append({"role": "assistant", "content": answer})
             
@@ -362,11 +514,28 @@ with tab2:
         if not code_content:
             st.error("Please upload a source code file.")
         else:
-            with st.spinner("Generating documentation..."):
-                markdown_output = services.doc_generator.generate_documentation(
-                    code_content, api_key
+            progress_bar = st.progress(0.0, text="Preparing documentation...")
+            stage_labels = {
+                "map": "Summarizing files",
+                "reduce": "Merging summaries",
+                "final": "Writing documentation",
+            }
+
+            def show_progress(stage, done, total):
+                progress_bar.progress(
+                    done / total if total else 0.0,
+                    text=f"{stage_labels[stage]} ({done}/{total})",
                 )
-                st.session_state.doc_content = markdown_output
+
+            markdown_output = services.doc_generator.generate_documentation(
+                code_content, api_key,
+                session_id=st.session_state.session_id,
+                progress=show_progress,
+                use_cache=not bypass_cache,
+                filename=st.session_state.uploaded_filename or None,
+            )
+            progress_bar.empty()
+            st.session_state.doc_content = markdown_output
 
     if st.session_state.doc_content:
         st.markdown("### 📘 Preview")
@@ -385,13 +554,7 @@ with tab2:
 with tab3:
     st.header("Generate Diagrams")
 
-    DIAGRAM_OPTIONS = [
-        "Class Diagram",
-        "ERD Diagram",
-        "Use Case Diagram",
-        "Sequence Diagram",
-        "Activity Diagram",
-    ]
+    DIAGRAM_OPTIONS = services.diagram_generator.DiagramFactory.DIAGRAM_TYPES
 
     if not code_content:
         st.info("Upload a source code file to generate diagrams.")
@@ -409,16 +572,54 @@ with tab3:
             st.write("")
             st.write("")
             generate = st.button("🎨 Generate", type="primary", use_container_width=True)
+            generate_all = st.button("🗂️ Generate all", use_container_width=True)
 
         if generate:
             st.session_state.current_diagram_type = diagram_selection
             with st.spinner("Generating diagram..."):
                 analysis, clean_mermaid = services.diagram_generator.generate_diagram(
-                    code_content, diagram_selection, api_key
+                    code_content, diagram_selection, api_key,
+                    session_id=st.session_state.session_id,
+                    use_cache=not bypass_cache,
+                    filename=st.session_state.uploaded_filename or None,
                 )
                 st.session_state.mermaid_analysis = analysis
                 st.session_state.mermaid_code = clean_mermaid
 
+        if generate_all:
+            with st.spinner(f"Generating all {len(DIAGRAM_OPTIONS)} diagrams..."):
+                results, total_seconds = services.diagram_generator.generate_all_diagrams(
+                    code_content, api_key,
+                    session_id=st.session_state.session_id,
+                    use_cache=not bypass_cache,
+                    filename=st.session_state.uploaded_filename or None,
+                )
+            st.session_state.diagram_batch = {
+                "code_hash": services.index_registry.code_hash(code_content),
+                "results": results,
+                "seconds": total_seconds,
+            }
+            # Force the selected type to load from the batch below
+            st.session_state.current_diagram_type = None
+
+        # Switching the selector shows the matching "Generate all" result
+        batch = st.session_state.diagram_batch
+        if batch and batch["code_hash"] == services.index_registry.code_hash(code_content):
+            result = batch["results"].get(diagram_selection)
+            if result and result.mermaid and diagram_selection != st.session_state.current_diagram_type:
+                st.session_state.current_diagram_type = diagram_selection
+                st.session_state.mermaid_analysis = result.analysis
+                st.session_state.mermaid_code = result.mermaid
+
+            timings = " · ".join(
+                f"{r.selection.replace(' Diagram', '')}: {'failed' if r.error else f'{r.seconds:.1f}s'}"
+                for r in batch["results"].values()
+            )
+            st.caption(f"⏱️ Generate all: {batch['seconds']:.1f}s total ({timings})")
+            for r in batch["results"].values():
+                if r.error:
+                    st.warning(f"{r.selection} failed: {r.error}")
+
         # FIX: This entire block is now safely indented INSIDE `with tab3:`
         if st.session_state.mermaid_code:
             with st.container():
@@ -16,9 +16,13 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from mcp.server.fastmcp import FastMCP
 from services.session_store import SessionStore
+from services.session_catalog import get_session_catalog
+from services.code_store import get_code_store
 
 mcp = FastMCP("AureliaScript-SessionLogs", version="1.0.0")
 store = SessionStore()
+catalog = get_session_catalog()
+catalog.seed_from(store)
 
 
 @mcp.tool()
@@ -55,7 +59,7 @@ def get_session_history(session_id: str) -> str:
 @mcp.tool()
 def list_all_sessions() -> str:
     """List all past conversation sessions."""
-    sessions = store.list_sessions()
+    sessions = catalog.list_sessions()
     if not sessions:
         return "No past sessions found."
     output = []
@@ -72,13 +76,16 @@ def list_all_sessions() -> str:
 def delete_session_log(session_id: str) -> str:
     """Delete a session and all its messages."""
     deleted = store.delete_session(session_id)
+    # Keep the Streamlit sidebar's listing in step, and drop the session's code
+    catalog.delete(session_id)
+    deleted = get_code_store().delete_session(session_id) or deleted
     return f"Session '{session_id}' deleted." if deleted else f"Session '{session_id}' not found."
 
 
 @mcp.tool()
 def get_session_stats() -> str:
     """Get statistics about stored session logs."""
-    stats = store.get_stats()
+    stats = catalog.get_stats()
     return (
         f"Session Log Statistics:\n"
         f"- Total Messages: {stats['total_messages']}\n"
@@ -0,0 +1,206 @@
+"""
+Similarity-search backends for VectorStore.
+
+Every backend is built over the store's L2-normalized float32 matrix and
+answers `search(query_vector, top_k)` with [(score, chunk_index), ...],
+best first. Exact brute force is used for small indexes; very large
+uploads can opt into an approximate inverted-file (IVF) index whose
+recall/latency trade-off is set by how many clusters each query probes.
+Exact scans can optionally run over int8 or float16 codes and rescore a
+shortlist at full precision (QuantizedIndex).
+"""
+
+import numpy as np
+
+from config import (
+    VECTOR_INDEX_BACKEND,
+    ANN_MIN_CHUNKS,
+    IVF_N_LISTS,
+    IVF_N_PROBE,
+    VECTOR_QUANTIZATION,
+    QUANTIZED_RESCORE_FACTOR,
+)
+
+
+def select_top_k(scores: np.ndarray, top_k: int, ids: np.ndarray = None) -> list:
+    """
+    Selects the top-k scores in O(n) with argpartition, then sorts only
+    those k. Ties are broken by lower chunk index. `ids` maps positions
+    in `scores` back to chunk indexes when scoring a subset.
+    """
+    k = min(top_k, len(scores))
+    if k <= 0:
+        return []
+    if k < len(scores):
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    chunk_ids = candidates if ids is None else ids[candidates]
+    order = np.lexsort((chunk_ids, -scores[candidates]))
+    return [(float(scores[candidates[i]]), int(chunk_ids[i])) for i in order]
+
+
+class ExactIndex:
+    """
+    Brute-force cosine search: one mat-vec product over every chunk.
+    """
+
+    def __init__(self, matrix: np.ndarray):
+        self.matrix = matrix
+
+    def search(self, query_vector: np.ndarray, top_k: int) -> list:
+        return select_top_k(self.matrix @ query_vector, top_k)
+
+
+class QuantizedIndex:
+    """
+    Brute-force search over compressed vectors, with exact rescoring.
+
+    Vectors are held as int8 codes with one scale per row (4x smaller
+    than float32) or as float16 (2x smaller). A query scores every chunk
+    on the codes, a block of rows at a time so only a small float32
+    buffer is ever materialized, then rescores the best
+    `rescore_factor * top_k` candidates against the full-precision
+    matrix, which may stay memory-mapped on disk.
+    """
+
+    BLOCK_ROWS = 256  # keeps the dequantized block cache-resident
+
+    def __init__(self, matrix: np.ndarray, precision: str = VECTOR_QUANTIZATION, rescore_factor: int = QUANTIZED_RESCORE_FACTOR):
+        if precision not in ("int8", "float16"):
+            raise ValueError(f"Unknown vector quantization: {precision}")
+        self.matrix = matrix
+        self.precision = precision
+        self.rescore_factor = rescore_factor
+
+        n, dims = matrix.shape
+        self.codes = np.empty((n, dims), dtype=np.int8 if precision == "int8" else np.float16)
+        self.scales = np.ones(n, dtype=np.float32)
+        for start in range(0, n, 4096):
+            block = np.asarray(matrix[start:start + 4096], dtype=np.float32)
+            if precision == "int8":
+                scales = np.abs(block).max(axis=1) / 127.0
+                scales[scales == 0] = 1.0
+                self.codes[start:start + len(block)] = np.round(block / scales[:, np.newaxis])
+                self.scales[start:start + len(block)] = scales
+            else:
+                self.codes[start:start + len(block)] = block
+
+    @property
+    def memory_bytes(self) -> int:
+        return self.codes.nbytes + (self.scales.nbytes if self.precision == "int8" else 0)
+
+    def approximate_scores(self, query_vector: np.ndarray) -> np.ndarray:
+        scores = np.empty(len(self.codes), dtype=np.float32)
+        buffer = np.empty((self.BLOCK_ROWS, self.codes.shape[1]), dtype=np.float32)
+        for start in range(0, len(self.codes), self.BLOCK_ROWS):
+            block = self.codes[start:start + self.BLOCK_ROWS]
+            rows = buffer[:len(block)]
+            np.copyto(rows, block, casting="unsafe")
+            np.dot(rows, query_vector, out=scores[start:start + len(block)])
+        if self.precision == "int8":
+            scores *= self.scales
+        return scores
+
+    def search(self, query_vector: np.ndarray, top_k: int) -> list:
+        shortlist = select_top_k(self.approximate_scores(query_vector), top_k * self.rescore_factor)
+        # Ascending ids keep rescoring reads sequential on a memory-mapped matrix
+        ids = np.sort(np.array([idx for _, idx in shortlist], dtype=np.int64))
+        return select_top_k(self.matrix[ids] @ query_vector, top_k, ids)
+
+
+class IVFIndex:
+    """
+    Inverted-file index over normalized vectors.
+
+    A spherical k-means quantizer partitions chunks into `n_lists`
+    clusters. A query scores the centroids, then scans only the chunks
+    in its `n_probe` closest clusters. Raising `n_probe` trades latency
+    for recall; `n_probe >= n_lists` is equivalent to exact search.
+    """
+
+    def __init__(
+        self,
+        matrix: np.ndarray,
+        n_lists: int = IVF_N_LISTS,
+        n_probe: int = IVF_N_PROBE,
+        iterations: int = 10,
+        seed: int = 0,
+    ):
+        self.matrix = matrix
+        self.n_lists = n_lists or max(1, int(np.sqrt(len(matrix))))
+        self.n_lists = min(self.n_lists, len(matrix))
+        self.n_probe = n_probe
+
+        self.centroids = self._train(matrix, iterations, seed)
+        assignments = self._assign(matrix)
+
+        # Chunk ids grouped by cluster: lists[c] = order[offsets[c]:offsets[c + 1]]
+        self.order = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=self.n_lists)
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    def _train(self, matrix: np.ndarray, iterations: int, seed: int) -> np.ndarray:
+        rng = np.random.default_rng(seed)
+
+        # Training on a sample keeps build time bounded for huge uploads
+        sample_size = min(len(matrix), self.n_lists * 32)
+        sample = matrix[rng.choice(len(matrix), sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, self.n_lists, replace=False)].copy()
+
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            one_hot = np.zeros((sample_size, self.n_lists), dtype=np.float32)
+            one_hot[np.arange(sample_size), labels] = 1.0
+            sums = one_hot.T @ sample
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            empty = norms[:, 0] == 0
+            # Re-seed empty clusters with random sample points
+            sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+            norms[empty] = 1.0
+            centroids = (sums / norms).astype(np.float32)
+
+        return centroids
+
+    def _assign(self, matrix: np.ndarray, block: int = 8192) -> np.ndarray:
+        labels = np.empty(len(matrix), dtype=np.int64)
+        for start in range(0, len(matrix), block):
+            labels[start:start + block] = np.argmax(matrix[start:start + block] @ self.centroids.T, axis=1)
+        return labels
+
+    def search(self, query_vector: np.ndarray, top_k: int) -> list:
+        n_probe = min(self.n_probe, self.n_lists)
+        centroid_scores = self.centroids @ query_vector
+        probed = np.argpartition(-centroid_scores, n_probe - 1)[:n_probe]
+
+        ids = np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in probed])
+        if len(ids) < top_k:
+            # Sparse clusters: fall back rather than return too few results
+            return select_top_k(self.matrix @ query_vector, top_k)
+        return select_top_k(self.matrix[ids] @ query_vector, top_k, ids)
+
+
+INDEX_BACKENDS = {
+    "exact": ExactIndex,
+    "ivf": IVFIndex,
+}
+
+
+def build_index(
+    matrix: np.ndarray,
+    backend: str = VECTOR_INDEX_BACKEND,
+    min_chunks: int = ANN_MIN_CHUNKS,
+    quantization: str = VECTOR_QUANTIZATION,
+):
+    """
+    Builds the configured backend, using exact search below min_chunks
+    where brute force is already fast and exact. Exact scans run over
+    quantized codes unless quantization is "none".
+    """
+    if backend == "exact" or len(matrix) < min_chunks:
+        if quantization != "none":
+            return QuantizedIndex(matrix, quantization)
+        return ExactIndex(matrix)
+    if backend not in INDEX_BACKENDS:
+        raise ValueError(f"Unknown vector index backend: {backend}")
+    return INDEX_BACKENDS[backend](matrix)
@@ -0,0 +1,48 @@
+"""
+Shared asyncio runtime for the service layer.
+
+Streamlit runs each script on its own thread without an event loop, and
+async HTTP clients are bound to the loop they were first used on. All
+async service work therefore runs on one long-lived background loop;
+sync callers submit coroutines to it with run_sync().
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+
+_loop = None
+_thread = None
+_lock = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """
+    Returns the background event loop, starting it on first use.
+    """
+    global _loop, _thread
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _thread = threading.Thread(target=_loop.run_forever, name="aurelia-async", daemon=True)
+            _thread.start()
+        return _loop
+
+
+def submit(coro) -> concurrent.futures.Future:
+    """
+    Schedules a coroutine on the background loop without waiting for it.
+    """
+    loop = get_loop()
+    if threading.current_thread() is _thread:
+        coro.close()
+        raise RuntimeError("called from the async runtime thread; await the coroutine instead")
+    return asyncio.run_coroutine_threadsafe(coro, loop)
+
+
+def run_sync(coro):
+    """
+    Runs a coroutine on the background loop and blocks for its result.
+    Must not be called from the loop itself (use `await` there instead).
+    """
+    return submit(coro).result()
@@ -0,0 +1,472 @@
+"""
+Language-aware code chunking for the RAG index.
+
+Uploaded code is first split into files (ZIP uploads are concatenated
+with FILE_HEADER lines), then each file is cut into units along its
+language's natural boundaries:
+
+- Python: top-level statements from `ast`, descending into classes
+- C-family (Java, Go, Rust, JS/TS, C/C++, C#, ...): brace-depth scanner
+  that ignores braces inside strings and comments
+- Ruby, Lua, shell, R: column-0 definition keywords
+- Markdown: headings; SQL: statement terminators; anything else: paragraphs
+
+Tiny adjacent units are merged and oversized ones are split (first along
+nested boundaries, then into overlapping line windows), so every chunk
+stays within CHUNK_MAX_TOKENS. Merged runs also break at content-defined
+anchor units, so an edit only changes the chunks around it and
+re-indexing can reuse the rest.
+"""
+
+import ast
+import math
+import re
+import zlib
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from config import CHUNK_MAX_TOKENS, CHUNK_MIN_TOKENS, CHUNK_OVERLAP_LINES
+from services.tokens import CHARS_PER_TOKEN, estimate_tokens
+
+# Roughly one unit in this many (chosen by content hash) starts a new merged run
+MERGE_ANCHOR_PERIOD = 4
+
+FILE_HEADER = "# ==== File: {path} ===="
+FILE_HEADER_PATTERN = re.compile(r"^# ==== File: (.+?) ====\r?$", re.MULTILINE)
+
+EXTENSION_LANGUAGES = {
+    "py": "python", "pyw": "python",
+    "c": "c", "h": "c", "cpp": "cpp", "cc": "cpp", "hpp": "cpp",
+    "cs": "csharp", "java": "java", "kt": "kotlin", "scala": "scala",
+    "go": "go", "rs": "rust", "swift": "swift", "dart": "dart",
+    "js": "javascript", "jsx": "javascript", "ts": "typescript", "tsx": "typescript",
+    "vue": "javascript", "svelte": "javascript", "php": "php", "css": "css",
+    "rb": "ruby", "lua": "lua", "sh": "shell", "bat": "shell", "ps1": "shell", "r": "r",
+    "md": "markdown", "sql": "sql",
+}
+
+BRACE_LANGUAGES = {
+    "c", "cpp", "csharp", "java", "kotlin", "scala", "go", "rust",
+    "swift", "dart", "javascript", "typescript", "php", "css",
+}
+
+PREPROCESSOR = re.compile(r"#\s*(include|define|undef|if|ifdef|ifndef|else|elif|endif|pragma|region|endregion)\b")
+
+KEYWORD_BOUNDARIES = {
+    "ruby": re.compile(r"^(def|class|module)\b"),
+    "lua": re.compile(r"^(local\s+)?function\b"),
+    "shell": re.compile(r"^(function\s+\w+|\w+\s*\(\)\s*\{?)"),
+    "r": re.compile(r"^[\w.]+\s*(<-|=)\s*function\b"),
+}
+
+
+@dataclass
+class Chunk:
+    """
+    A contiguous span of one file. Line numbers are 1-based, inclusive.
+    """
+    text: str
+    path: str
+    language: str
+    start_line: int
+    end_line: int
+
+
+# ==========================================================
+# FILES & LANGUAGE DETECTION
+# ==========================================================
+
+def split_files(code_content: str, default_path: str = "source") -> List[Tuple[str, str]]:
+    """
+    Splits concatenated uploads on FILE_HEADER lines.
+    Returns [(path, text), ...]; plain uploads yield a single file.
+    """
+    headers = list(FILE_HEADER_PATTERN.finditer(code_content))
+    if not headers:
+        return [(default_path, code_content)]
+
+    files = []
+    preamble = code_content[:headers[0].start()]
+    if preamble.strip():
+        files.append((default_path, preamble))
+    for i, match in enumerate(headers):
+        end = headers[i + 1].start() if i + 1 < len(headers) else len(code_content)
+        files.append((match.group(1).strip(), code_content[match.end():end].lstrip("\r\n")))
+    return files
+
+
+def detect_language(path: Optional[str], text: str) -> str:
+    """
+    Language from the file extension, or sniffed from the content when
+    the name is unknown (e.g. a pasted or renamed upload).
+    """
+    if path and "." in path:
+        language = EXTENSION_LANGUAGES.get(path.rsplit(".", 1)[-1].lower())
+        if language:
+            return language
+
+    if re.search(r"^\s*(def|class|import|from)\s", text, re.MULTILINE):
+        try:
+            ast.parse(text)
+            return "python"
+        except (SyntaxError, ValueError):
+            pass
+    if text.count("{") >= 2 and text.count("{") >= text.count("\n") // 40:
+        return "c-family"
+    return "text"
+
+
+# ==========================================================
+# BOUNDARY RULES (each returns [(start, end), ...] 0-based, end exclusive)
+# ==========================================================
+
+def _python_units(lines: List[str], start: int, end: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    Top-level statements from the AST. Comments and blank lines before a
+    statement (and its decorators) belong to that statement.
+    """
+    try:
+        body = ast.parse("\n".join(lines[start:end])).body
+    except (SyntaxError, ValueError):
+        return None
+
+    units = []
+    cursor = start
+    for node in body:
+        node_end = start + node.end_lineno
+        units.append((cursor, node_end))
+        cursor = node_end
+    if cursor < end:
+        if units:
+            units[-1] = (units[-1][0], end)
+        else:
+            units.append((cursor, end))
+    return units
+
+
+def _python_nested(lines: List[str], start: int, end: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    Splits an oversized class (or function) along its body statements.
+    """
+    text = "\n".join(lines[start:end])
+    try:
+        tree = ast.parse(_dedent_block(text))
+    except (SyntaxError, ValueError):
+        return None
+    if len(tree.body) != 1 or not hasattr(tree.body[0], "body"):
+        return None
+
+    node = tree.body[0]
+    body = node.body
+    if len(body) < 2:
+        return None
+
+    # Keep the signature (and docstring, if any) with the first member
+    units = []
+    cursor = start
+    for child in body[1:]:
+        first = min([child.lineno] + [d.lineno for d in getattr(child, "decorator_list", [])])
+        boundary = start + first - 1
+        units.append((cursor, boundary))
+        cursor = boundary
+    units.append((cursor, end))
+    return units
+
+
+def _dedent_block(text: str) -> str:
+    lines = text.split("\n")
+    indents = [len(l) - len(l.lstrip()) for l in lines if l.strip()]
+    width = min(indents) if indents else 0
+    return "\n".join(l[width:] for l in lines)
+
+
+def _is_brace_language(language: str) -> bool:
+    return language in BRACE_LANGUAGES or language == "c-family"
+
+
+def _brace_depths(lines: List[str], language: str) -> List[int]:
+    """
+    Brace depth at the end of each line, skipping braces inside string
+    literals and comments.
+    """
+    depths = []
+    depth = 0
+    in_block_comment = False
+    quote = None
+
+    for line in lines:
+        i = 0
+        while i < len(line):
+            ch = line[i]
+            pair = line[i:i + 2]
+            if in_block_comment:
+                if pair == "*/":
+                    in_block_comment = False
+                    i += 1
+            elif quote:
+                if ch == "\\":
+                    i += 1
+                elif ch == quote:
+                    quote = None
+            elif pair == "//" or ch == "#" and not line[:i].strip() and PREPROCESSOR.match(line, i):
+                # Line comment or preprocessor directive
+                break
+            elif pair == "/*":
+                in_block_comment = True
+                i += 1
+            elif ch == "'" and language == "rust":
+                # Char literal ('a', '\n') — but not a lifetime like 'a
+                closing = line.find("'", i + 1)
+                if closing != -1 and closing - i <= 3:
+                    i = closing
+            elif ch in "\"'`":
+                quote = ch
+            elif ch == "{":
+                depth += 1
+            elif ch == "}":
+                depth = max(0, depth - 1)
+            i += 1
+        if quote != "`":
+            quote = None  # Only template literals span lines
+        depths.append(depth)
+
+    return depths
+
+
+def _brace_units(lines: List[str], start: int, end: int, depths: List[int], level: int = 0) -> List[Tuple[int, int]]:
+    """
+    Units end where brace depth returns to `level` on a line that either
+    closes a block or finishes a statement with `;`.
+    """
+    units = []
+    cursor = start
+    for i in range(start, end):
+        stripped = lines[i].rstrip()
+        if not stripped or depths[i] != level:
+            continue
+        closes_block = i > 0 and depths[i - 1] > level
+        if closes_block or stripped.endswith(";"):
+            units.append((cursor, i + 1))
+            cursor = i + 1
+    if cursor < end:
+        if units and not "".join(lines[cursor:end]).strip():
+            units[-1] = (units[-1][0], end)
+        else:
+            units.append((cursor, end))
+    return units
+
+
+def _keyword_units(lines: List[str], start: int, end: int, pattern) -> List[Tuple[int, int]]:
+    return _units_from_starts(start, end, [i for i in range(start, end) if pattern.match(lines[i])])
+
+
+def _markdown_units(lines: List[str], start: int, end: int) -> List[Tuple[int, int]]:
+    return _units_from_starts(start, end, [i for i in range(start, end) if lines[i].startswith("#")])
+
+
+def _sql_units(lines: List[str], start: int, end: int) -> List[Tuple[int, int]]:
+    units = []
+    cursor = start
+    for i in range(start, end):
+        if lines[i].rstrip().endswith(";"):
+            units.append((cursor, i + 1))
+            cursor = i + 1
+    if cursor < end:
+        units.append((cursor, end))
+    return units
+
+
+def _paragraph_units(lines: List[str], start: int, end: int) -> List[Tuple[int, int]]:
+    starts = [i for i in range(start, end) if lines[i].strip() and (i == start or not lines[i - 1].strip())]
+    return _units_from_starts(start, end, starts)
+
+
+def _units_from_starts(start: int, end: int, starts: List[int]) -> List[Tuple[int, int]]:
+    boundaries = sorted(set([start] + [s for s in starts if start < s < end]))
+    return [(a, b) for a, b in zip(boundaries, boundaries[1:] + [end]) if a < b]
+
+
+# ==========================================================
+# SIZE BOUNDING
+# ==========================================================
+
+def _line_offsets(lines: List[str]) -> List[int]:
+    """
+    Prefix sums of line lengths (plus newline) for O(1) span sizing.
+    """
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line) + 1)
+    return offsets
+
+
+def _span_tokens(offsets: List[int], start: int, end: int) -> int:
+    # Same estimate as estimate_tokens("\n".join(lines[start:end]))
+    return math.ceil(max(0, offsets[end] - offsets[start] - 1) / CHARS_PER_TOKEN)
+
+
+def _is_anchor(lines: List[str], unit: Tuple[int, int]) -> bool:
+    text = "\n".join(lines[unit[0]:unit[1]]).strip()
+    return zlib.crc32(text.encode("utf-8")) % MERGE_ANCHOR_PERIOD == 0
+
+
+def _merge_small(lines: List[str], offsets: List[int], units: List[Tuple[int, int]], min_tokens: int, max_tokens: int) -> List[Tuple[int, int]]:
+    """
+    Merges runs of adjacent units while the run is below min_tokens,
+    so imports, decorators and one-liners do not become lone chunks.
+    A run never absorbs an anchor unit: anchors depend only on their own
+    content, so run boundaries re-align shortly after an edit instead of
+    shifting for the rest of the file.
+    """
+    runs = []
+    for unit in units:
+        if runs and not _is_anchor(lines, unit):
+            prev = runs[-1]
+            prev_tokens = _span_tokens(offsets, *prev)
+            if prev_tokens < min_tokens and _span_tokens(offsets, prev[0], unit[1]) <= max_tokens:
+                runs[-1] = (prev[0], unit[1])
+                continue
+        runs.append(unit)
+
+    # A run cut short by an anchor joins the next run, and a short tail
+    # (e.g. a class's closing brace) joins the one before it
+    merged = []
+    for run in runs:
+        if merged:
+            prev = merged[-1]
+            if _span_tokens(offsets, *prev) < min_tokens and _span_tokens(offsets, prev[0], run[1]) <= max_tokens:
+                merged[-1] = (prev[0], run[1])
+                continue
+        merged.append(run)
+    if len(merged) > 1:
+        prev, last = merged[-2], merged[-1]
+        if _span_tokens(offsets, *last) < min_tokens and _span_tokens(offsets, prev[0], last[1]) <= max_tokens:
+            merged[-2:] = [(prev[0], last[1])]
+    return merged
+
+
+def _windows(offsets: List[int], start: int, end: int, max_tokens: int, overlap: int) -> List[Tuple[int, int]]:
+    """
+    Splits a span into line windows of at most max_tokens, each starting
+    `overlap` lines before the previous one ended. Single lines longer
+    than the budget are kept whole (the embedder truncates them).
+    """
+    windows = []
+    cursor = start
+    while cursor < end:
+        stop = cursor + 1
+        while stop < end and _span_tokens(offsets, cursor, stop + 1) <= max_tokens:
+            stop += 1
+        windows.append((cursor, stop))
+        if stop >= end:
+            break
+        cursor = max(stop - overlap, cursor + 1)
+    return windows
+
+
+# ==========================================================
+# PUBLIC API
+# ==========================================================
+
+def _units_for(language: str, lines: List[str], start: int, end: int, depths=None) -> List[Tuple[int, int]]:
+    if language == "python":
+        units = _python_units(lines, start, end)
+        if units is not None:
+            return units
+        return _keyword_units(lines, start, end, re.compile(r"^(async\s+def|def|class)\b"))
+    if _is_brace_language(language):
+        return _brace_units(lines, start, end, depths)
+    if language in KEYWORD_BOUNDARIES:
+        return _keyword_units(lines, start, end, KEYWORD_BOUNDARIES[language])
+    if language == "markdown":
+        return _markdown_units(lines, start, end)
+    if language == "sql":
+        return _sql_units(lines, start, end)
+    return _paragraph_units(lines, start, end)
+
+
+def _bound(language: str, lines: List[str], offsets: List[int], unit: Tuple[int, int], depths, max_tokens: int, min_tokens: int, overlap: int, level: int = 0):
+    """
+    Yields spans within max_tokens, splitting an oversized unit along
+    nested boundaries first and falling back to overlapping windows.
+    """
+    start, end = unit
+    if _span_tokens(offsets, start, end) <= max_tokens or end - start <= 1:
+        yield unit
+        return
+
+    nested = None
+    if language == "python":
+        nested = _python_nested(lines, start, end)
+    elif _is_brace_language(language) and level < 3:
+        nested = _brace_units(lines, start, end, depths, level + 1)
+
+    if nested and len(nested) > 1:
+        # Nested units get the same small-unit merging as top-level ones
+        for sub in _merge_small(lines, offsets, nested, min_tokens, max_tokens):
+            yield from _bound(language, lines, offsets, sub, depths, max_tokens, min_tokens, overlap, level + 1)
+    else:
+        yield from _windows(offsets, start, end, max_tokens, overlap)
+
+
+def chunk_file(
+    path: str,
+    text: str,
+    language: Optional[str] = None,
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    min_tokens: int = CHUNK_MIN_TOKENS,
+    overlap: int = CHUNK_OVERLAP_LINES,
+) -> List[Chunk]:
+    """
+    Chunks a single file along its language's boundaries. An empty or
+    whitespace-only file has no chunks.
+    """
+    if not text.strip():
+        return []
+    language = language or detect_language(path, text)
+    lines = text.split("\n")
+    offsets = _line_offsets(lines)
+    depths = _brace_depths(lines, language) if _is_brace_language(language) else None
+
+    units = _units_for(language, lines, 0, len(lines), depths)
+    units = _merge_small(lines, offsets, units, min_tokens, max_tokens)
+
+    chunks = []
+    for unit in units:
+        for start, end in _bound(language, lines, offsets, unit, depths, max_tokens, min_tokens, overlap):
+            # Trim blank edges so line numbers point at real code
+            while start < end and not lines[start].strip():
+                start += 1
+            while end > start and not lines[end - 1].strip():
+                end -= 1
+            if start < end:
+                chunk_text = "\n".join(lines[start:end])
+                chunks.append(Chunk(chunk_text, path, language, start + 1, end))
+
+    if not chunks:
+        chunks.append(Chunk(text, path, language, 1, max(1, len(lines))))
+    return chunks
+
+
+def chunk_code(code_content: str, filename: Optional[str] = None) -> Tuple[List[Chunk], List[Dict]]:
+    """
+    Chunks an upload (single file or FILE_HEADER-concatenated archive).
+    Returns (chunks, per-file stats) where each stats entry reports the
+    path, language, chunk count and estimated token count.
+    """
+    chunks = []
+    stats = []
+    for path, text in split_files(code_content, filename or "source"):
+        file_chunks = chunk_file(path, text)
+        chunks.extend(file_chunks)
+        stats.append(file_stats(path, file_chunks))
+    return chunks, stats
+
+
+def file_stats(path: str, file_chunks: List[Chunk]) -> Dict:
+    return {
+        "path": path,
+        "language": file_chunks[0].language if file_chunks else detect_language(path, ""),
+        "chunks": len(file_chunks),
+        "tokens": sum(estimate_tokens(c.text) for c in file_chunks),
+    }
@@ -0,0 +1,280 @@
+"""
+Content-addressed storage for uploaded source code.
+
+Uploaded code and its filename are kept out of the Chroma session_logs
+collection, where every save was embedded and every semantic search had
+to filter the system_code rows back out. Code is stored once per
+distinct content in SQLite, keyed by its sha256, and sessions reference
+it by digest, so the same upload in many sessions costs one copy. A blob
+is dropped when its last session is deleted.
+
+Blobs are split into zlib-compressed chunks of CODE_STORE_CHUNK_BYTES,
+written as the code streams in and read back one chunk at a time, so
+there is no size limit and saving or resuming a large upload needs
+memory for one chunk rather than the whole payload (see iter_code).
+"""
+
+import codecs
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Optional, Union
+
+from config import CODE_STORE_PATH, CODE_STORE_CHUNK_BYTES, CODE_STORE_COMPRESSION_LEVEL
+
+# Chunks of a save older than this that never completed were left by a crash
+PENDING_MAX_AGE_SECONDS = 3600
+
+
+class IncompleteCodeError(RuntimeError):
+    """
+    The blob being read was replaced or deleted part-way through, so
+    the code read so far is incomplete.
+    """
+
+
+class CodeStore:
+    """
+    SQLite-backed blob store for session code.
+    Safe to share between Streamlit script threads.
+    """
+
+    def __init__(self, path: str = CODE_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS blobs (
+                digest TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                chunks INTEGER NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS blob_chunks (
+                digest TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                PRIMARY KEY (digest, seq)
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS session_code (
+                session_id TEXT PRIMARY KEY,
+                digest TEXT NOT NULL,
+                filename TEXT,
+                saved TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_session_code_digest ON session_code(digest)"
+        )
+        self._collect_pending()
+        self._conn.commit()
+
+    def save_code(self, session_id: str, code: Union[str, Iterable[str]], filename: Optional[str] = None) -> str:
+        """
+        Stores the session's code (replacing any earlier upload) and
+        returns its digest. `code` may be a string or an iterable of text
+        pieces, which is consumed incrementally. Identical code is stored
+        only once.
+        """
+        pieces = [code] if isinstance(code, str) else code
+        # Chunks are written under a pending id until the digest is known
+        pending = f"pending-{int(time.time())}-{uuid.uuid4().hex}"
+        digest, size, chunks = hashlib.sha256(), 0, 0
+        buffer = bytearray()
+        try:
+            for piece in pieces:
+                data = piece.encode("utf-8")
+                digest.update(data)
+                size += len(data)
+                buffer += data
+                while len(buffer) >= CODE_STORE_CHUNK_BYTES:
+                    self._write_chunk(pending, chunks, bytes(buffer[:CODE_STORE_CHUNK_BYTES]))
+                    del buffer[:CODE_STORE_CHUNK_BYTES]
+                    chunks += 1
+            if buffer or not chunks:
+                self._write_chunk(pending, chunks, bytes(buffer))
+                chunks += 1
+        except BaseException:
+            with self._lock:
+                self._conn.execute("DELETE FROM blob_chunks WHERE digest = ?", (pending,))
+                self._conn.commit()
+            raise
+
+        digest = digest.hexdigest()
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM blobs WHERE digest = ?", (digest,)).fetchone():
+                self._conn.execute("DELETE FROM blob_chunks WHERE digest = ?", (pending,))
+            else:
+                self._conn.execute("UPDATE blob_chunks SET digest = ? WHERE digest = ?", (digest, pending))
+                self._conn.execute(
+                    "INSERT INTO blobs (digest, size, chunks) VALUES (?, ?, ?)", (digest, size, chunks)
+                )
+            previous = self._digest_for(session_id)
+            self._conn.execute(
+                """
+                INSERT INTO session_code (session_id, digest, filename, saved) VALUES (?, ?, ?, ?)
+                ON CONFLICT(session_id) DO UPDATE SET
+                    digest = excluded.digest,
+                    filename = COALESCE(excluded.filename, filename),
+                    saved = excluded.saved
+                """,
+                (session_id, digest, filename, datetime.now().isoformat()),
+            )
+            if previous and previous != digest:
+                self._collect(previous)
+            self._conn.commit()
+        return digest
+
+    def _write_chunk(self, digest: str, seq: int, data: bytes):
+        compressed = zlib.compress(data, CODE_STORE_COMPRESSION_LEVEL)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO blob_chunks (digest, seq, data) VALUES (?, ?, ?)", (digest, seq, compressed)
+            )
+            self._conn.commit()
+
+    def iter_code(self, session_id: str) -> Iterator[str]:
+        """
+        Yields the session's code chunk by chunk (nothing if it never
+        uploaded any), holding one decompressed chunk at a time. Raises
+        IncompleteCodeError if the blob disappears mid-read (the session
+        re-uploaded or was deleted).
+        """
+        with self._lock:
+            row = self._conn.execute(
+                """
+                SELECT blobs.digest, blobs.chunks FROM session_code
+                JOIN blobs ON blobs.digest = session_code.digest
+                WHERE session_code.session_id = ?
+                """,
+                (session_id,),
+            ).fetchone()
+        if row is None:
+            return
+
+        digest, chunks = row
+        # Chunk boundaries may split a multi-byte character
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        for seq in range(chunks):
+            with self._lock:
+                chunk = self._conn.execute(
+                    "SELECT data FROM blob_chunks WHERE digest = ? AND seq = ?", (digest, seq)
+                ).fetchone()
+            if chunk is None:
+                raise IncompleteCodeError(
+                    f"code for session {session_id} changed while being read (chunk {seq + 1} of {chunks})"
+                )
+            text = decoder.decode(zlib.decompress(chunk[0]), final=seq == chunks - 1)
+            if text:
+                yield text
+
+    def get_code(self, session_id: str) -> str:
+        """
+        The session's code reassembled, or "" if it never uploaded any.
+        """
+        return "".join(self.iter_code(session_id))
+
+    def get_filename(self, session_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT filename FROM session_code WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def delete_session(self, session_id: str) -> bool:
+        """
+        Drops the session's reference, and its blob if no other session
+        uses the same code.
+        """
+        with self._lock:
+            digest = self._digest_for(session_id)
+            if digest is None:
+                return False
+            self._conn.execute("DELETE FROM session_code WHERE session_id = ?", (session_id,))
+            self._collect(digest)
+            self._conn.commit()
+        return True
+
+    def _digest_for(self, session_id: str) -> Optional[str]:
+        row = self._conn.execute(
+            "SELECT digest FROM session_code WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _collect(self, digest: str):
+        """
+        Deletes a blob no session references any more. Caller must hold
+        the lock.
+        """
+        in_use = self._conn.execute(
+            "SELECT 1 FROM session_code WHERE digest = ? LIMIT 1", (digest,)
+        ).fetchone()
+        if not in_use:
+            self._conn.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+            self._conn.execute("DELETE FROM blob_chunks WHERE digest = ?", (digest,))
+
+    def _collect_pending(self):
+        """
+        Deletes chunk rows no blob owns: saves that crashed before being
+        committed (pending ids older than PENDING_MAX_AGE_SECONDS; newer
+        ones may belong to a save still running in another process).
+        """
+        cutoff = time.time() - PENDING_MAX_AGE_SECONDS
+        stale = []
+        for (digest,) in self._conn.execute(
+            "SELECT DISTINCT digest FROM blob_chunks WHERE digest NOT IN (SELECT digest FROM blobs)"
+        ):
+            try:
+                started = int(digest.split("-")[1])
+            except (IndexError, ValueError):
+                started = 0  # not a pending id (or an old one without a time)
+            if started < cutoff:
+                stale.append((digest,))
+        self._conn.executemany("DELETE FROM blob_chunks WHERE digest = ?", stale)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            sessions = self._conn.execute("SELECT COUNT(*) FROM session_code").fetchone()[0]
+            blobs, raw = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs"
+            ).fetchone()
+            stored = self._conn.execute(
+                "SELECT COALESCE(SUM(LENGTH(data)), 0) FROM blob_chunks"
+            ).fetchone()[0]
+        return {"sessions": sessions, "blobs": blobs, "raw_bytes": raw, "stored_bytes": stored}
+
+
+_shared_store = None
+_shared_lock = threading.Lock()
+
+
+def get_code_store() -> CodeStore:
+    """
+    Process-wide shared code store.
+    """
+    global _shared_store
+    with _shared_lock:
+        if _shared_store is None:
+            _shared_store = CodeStore()
+        return _shared_store
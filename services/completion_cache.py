@@ -0,0 +1,149 @@
+"""
+Persistent cache of deterministic (temperature 0) chat completions.
+
+Documentation, diagram and plain question prompts are fully determined
+by the model, the system prompt and the user content (which embeds the
+retrieved context), so regenerating for unchanged code can reuse the
+previous answer instead of paying for the completion again. Answers are
+stored in SQLite under SESSION_DATA_DIR keyed by a hash of those inputs,
+expire after COMPLETION_CACHE_TTL_SECONDS, and are evicted
+least-recently-used once the cache exceeds its byte budget.
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+from typing import Dict, List, Optional
+
+from config import (
+    OPENAI_MODEL,
+    COMPLETION_CACHE_PATH,
+    COMPLETION_CACHE_MAX_BYTES,
+    COMPLETION_CACHE_TTL_SECONDS,
+)
+from services.sqlite_lru import SQLiteLRUCache
+
+
+class CompletionCache(SQLiteLRUCache):
+    """
+    SQLite-backed LRU cache of completion texts with a TTL.
+    Safe to share between Streamlit script threads.
+    """
+
+    table = "completions"
+    value_column = "content"
+    value_type = "TEXT"
+    extra_columns = (("created", "REAL NOT NULL"),)
+
+    def __init__(
+        self,
+        path: str = COMPLETION_CACHE_PATH,
+        max_bytes: int = COMPLETION_CACHE_MAX_BYTES,
+        ttl_seconds: float = COMPLETION_CACHE_TTL_SECONDS,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.bypassed = 0
+        super().__init__(path, max_bytes)
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict]) -> str:
+        """
+        sha256 over the model and every message's role and content.
+        """
+        digest = hashlib.sha256()
+        digest.update(model.encode("utf-8"))
+        for message in messages:
+            digest.update(b"\0")
+            digest.update(message["role"].encode("utf-8"))
+            digest.update(b"\0")
+            digest.update(message["content"].encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        The cached completion, or None if absent or expired.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._select([key], ("content", "created")).get(key)
+            if row is not None and now - row[1] > self.ttl_seconds:
+                self._delete(key)
+                self._conn.commit()
+                row = None
+
+            if row is None:
+                self.misses += 1
+                return None
+            self._touch([key])
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, content: str):
+        """
+        Stores a completion, then evicts expired and LRU entries if the
+        cache has grown past max_bytes.
+        """
+        with self._lock:
+            self._insert([(key, content, len(content.encode("utf-8")), time.time())])
+            self._conn.commit()
+
+    def record_bypass(self):
+        with self._lock:
+            self.bypassed += 1
+
+    def _expire(self):
+        self._conn.execute(f"DELETE FROM {self.table} WHERE created < ?", (time.time() - self.ttl_seconds,))
+        self._total_bytes = self._stored_bytes()
+
+    def stats(self) -> Dict:
+        """
+        Hit/miss/bypass counters for this process plus current cache size.
+        """
+        stats = super().stats()
+        with self._lock:
+            stats["bypassed"] = self.bypassed
+        return stats
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_completion_cache() -> CompletionCache:
+    """
+    Process-wide shared cache instance.
+    """
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = CompletionCache()
+        return _shared_cache
+
+
+async def acached_completion(client, messages: List[Dict], use_cache: bool = True, model: str = OPENAI_MODEL) -> str:
+    """
+    chat.completions.create at temperature 0, answered from the cache
+    when the same model and messages were completed before. With
+    use_cache=False the cached answer is ignored and replaced by the
+    fresh one.
+    """
+    cache = get_completion_cache()
+    key = CompletionCache.make_key(model, messages)
+    if not use_cache:
+        cache.record_bypass()
+    else:
+        cached = await asyncio.to_thread(cache.get, key)
+        if cached is not None:
+            return cached
+
+    response = await client.chat.completions.create(
+        model=model,
+        messages=messages,
+        temperature=0
+    )
+    content = response.choices[0].message.content
+    if content:
+        await asyncio.to_thread(cache.put, key, content)
+    return content
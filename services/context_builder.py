@@ -0,0 +1,140 @@
+"""
+Token-budgeted context assembly for prompts.
+
+Takes scored chunks from VectorStore.search and packs the best ones into
+a prompt context until the model's token budget is reached. Overlapping
+chunks (e.g. neighbouring windows of one long function) are trimmed to
+their new lines, exact duplicates are dropped, and a chunk that does not
+fit whole is cut at the last syntactic boundary that does.
+"""
+
+import hashlib
+import logging
+from dataclasses import dataclass
+from typing import List, Tuple
+
+from config import OPENAI_MODEL, CONTEXT_TOKEN_BUDGETS, DEFAULT_CONTEXT_TOKEN_BUDGET
+from services.chunker import Chunk
+from services.tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+MIN_TRUNCATED_TOKENS = 64  # don't bother with fragments smaller than this
+TRUNCATION_MARKER = "    ... (truncated)"
+
+
+@dataclass
+class ContextResult:
+    text: str
+    tokens: int            # estimated tokens of the assembled context
+    baseline_tokens: int   # tokens a plain fixed top-3 join would use
+    chunks: int            # chunks (or partial chunks) included
+
+
+def context_budget(model: str = OPENAI_MODEL) -> int:
+    return CONTEXT_TOKEN_BUDGETS.get(model, DEFAULT_CONTEXT_TOKEN_BUDGET)
+
+
+def _header(chunk: Chunk, start: int, end: int) -> str:
+    return f"# {chunk.path} (lines {start}-{end})"
+
+
+def _is_boundary(lines: List[str], i: int, body_indent: int) -> bool:
+    """
+    True if the chunk can be cut after line i without splitting a
+    statement: the next line is blank, dedents to the body level, or
+    line i closes a block or statement.
+    """
+    stripped = lines[i].rstrip()
+    if stripped.endswith(("}", ";", "};")):
+        return True
+    if i + 1 >= len(lines):
+        return True
+    following = lines[i + 1]
+    if not following.strip():
+        return True
+    return len(following) - len(following.lstrip()) <= body_indent
+
+
+def _truncate(lines: List[str], budget: int) -> int:
+    """
+    Returns how many leading lines fit in `budget` tokens, cut at the
+    last syntactic boundary. 0 if no boundary fits.
+    """
+    indents = [len(l) - len(l.lstrip()) for l in lines[1:] if l.strip()]
+    body_indent = min(indents) if indents else 0
+
+    used = 0
+    best = 0
+    for i, line in enumerate(lines):
+        used += estimate_tokens(line + "\n")
+        if used > budget:
+            break
+        if _is_boundary(lines, i, body_indent):
+            best = i + 1
+    return best
+
+
+def build_context(scored_chunks: List[Tuple[float, Chunk]], budget_tokens: int) -> ContextResult:
+    """
+    Packs chunks (best first) into at most `budget_tokens` tokens.
+    """
+    covered = {}      # path -> [(start, end), ...] already included
+    seen_text = set()
+    parts = []
+    used = 0
+
+    for _, chunk in scored_chunks:
+        digest = hashlib.sha1(chunk.text.encode("utf-8")).hexdigest()
+        if digest in seen_text:
+            continue
+        seen_text.add(digest)
+
+        # Drop lines already included via an overlapping chunk
+        lines = chunk.text.split("\n")
+        start, end = chunk.start_line, chunk.end_line
+        for a, b in covered.get(chunk.path, []):
+            if a <= start <= b:
+                start = b + 1
+            if a <= end <= b:
+                end = a - 1
+        if start > end:
+            continue
+        lines = lines[start - chunk.start_line:end - chunk.start_line + 1]
+
+        header = _header(chunk, start, end)
+        body = "\n".join(lines)
+        cost = estimate_tokens(header + "\n" + body + "\n\n")
+
+        if used + cost > budget_tokens:
+            remaining = budget_tokens - used - estimate_tokens(header + TRUNCATION_MARKER + "\n\n")
+            if remaining < MIN_TRUNCATED_TOKENS:
+                continue
+            keep = _truncate(lines, remaining)
+            if keep == 0:
+                continue
+            end = start + keep - 1
+            header = _header(chunk, start, end)
+            body = "\n".join(lines[:keep]) + "\n" + TRUNCATION_MARKER
+            cost = estimate_tokens(header + "\n" + body + "\n\n")
+
+        parts.append(header + "\n" + body)
+        covered.setdefault(chunk.path, []).append((start, end))
+        used += cost
+        if budget_tokens - used < MIN_TRUNCATED_TOKENS:
+            break
+
+    text = "\n\n".join(parts)
+    baseline = estimate_tokens("\n\n".join(chunk.text for _, chunk in scored_chunks[:3]))
+    return ContextResult(text, estimate_tokens(text), baseline, len(parts))
+
+
+def log_context_usage(label: str, result: ContextResult):
+    """
+    Records per-request prompt-context size against a plain top-3 join.
+    """
+    saved = result.baseline_tokens - result.tokens
+    logger.info(
+        "%s context: %d tokens in %d chunks (top-3 join: %d tokens, delta %+d)",
+        label, result.tokens, result.chunks, result.baseline_tokens, -saved,
+    )
@@ -1,9 +1,17 @@
 # diagram_generator.py
 from abc import ABC, abstractmethod
+import asyncio
 import re
-from openai import OpenAI
-from config import OPENAI_MODEL, DIAGRAM_RULES
-from services.vector_store import VectorStore
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from config import DIAGRAM_RULES
+from services.index_registry import aretrieve_context, get_index_registry
+from services.async_runtime import run_sync
+from services.openai_clients import async_openai_client
+from services.rate_limiter import BULK, request_priority
+from services.completion_cache import acached_completion
+from services.context_builder import log_context_usage
 
 
 # ==========================================================
@@ -112,6 +120,19 @@ Generate the diagram now.
 # ==========================================================
 
 class DiagramFactory:
+    # Every diagram type, in UI order
+    DIAGRAM_TYPES = [
+        "Class Diagram",
+        "ERD Diagram",
+        "Use Case Diagram",
+        "Sequence Diagram",
+        "Activity Diagram",
+    ]
+
+    @staticmethod
+    def create_all() -> Dict[str, DiagramStrategy]:
+        return {selection: DiagramFactory.create(selection) for selection in DiagramFactory.DIAGRAM_TYPES}
+
     @staticmethod
     def create(selection: str) -> DiagramStrategy:
 
@@ -190,34 +211,82 @@ def ensure_header(code: str, header: str) -> str:
 # MAIN GENERATOR (RAG ENABLED)
 # ===============================
 
-def generate_diagram(code_content: str, selection: str, api_key: str):
-    client = OpenAI(api_key=api_key)
+def generate_diagram(code_content: str, selection: str, api_key: str, session_id: str = None, use_cache: bool = True, filename: str = None):
+    return run_sync(agenerate_diagram(code_content, selection, api_key, session_id, use_cache, filename))
+
+
+async def agenerate_diagram(code_content: str, selection: str, api_key: str, session_id: str = None, use_cache: bool = True, filename: str = None):
     strategy = DiagramFactory.create(selection)
 
-    # ---- RAG VECTOR STORE ----
-    vs = VectorStore(api_key)
-    vs.build(code_content)
-    context = vs.retrieve(f"{selection} diagram entities, relationships, structure")
-
-    # ---- GPT CALL ----
-    response = client.chat.completions.create(
-        model=OPENAI_MODEL,
-        messages=[
-            {
-                "role": "system",
-                "content": DIAGRAM_RULES["SYSTEM_PROMPT"]
-            },
-            {
-                "role": "user",
-                "content": strategy.get_prompt(context)
-            }
-        ],
-        temperature=0  # Keep temperature at 0 for maximum determinism
+    # ---- RAG VECTOR STORE (shared per-session index) ----
+    result = await aretrieve_context(
+        api_key, code_content, f"{selection} diagram entities, relationships, structure", session_id, filename
     )
+    log_context_usage("diagram", result)
+    context = result.text
+
+    # ---- GPT CALL (bulk priority: yields to interactive chat) ----
+    with request_priority(BULK):
+        async with async_openai_client(api_key) as client:
+            # Temperature 0 (maximum determinism), so unchanged context can reuse a cached answer
+            raw = await acached_completion(
+                client,
+                [
+                    {
+                        "role": "system",
+                        "content": DIAGRAM_RULES["SYSTEM_PROMPT"]
+                    },
+                    {
+                        "role": "user",
+                        "content": strategy.get_prompt(context)
+                    }
+                ],
+                use_cache,
+            )
 
-    raw = response.choices[0].message.content
     mermaid = extract_mermaid(raw)
     mermaid = clean_mermaid_output(mermaid)
     mermaid = ensure_header(mermaid, strategy.diagram_header())
 
-    return raw, mermaid
\ No newline at end of file
+    return raw, mermaid
+
+
+# ===============================
+# BATCH GENERATOR (ALL TYPES)
+# ===============================
+
+@dataclass
+class DiagramResult:
+    selection: str
+    analysis: Optional[str]
+    mermaid: Optional[str]
+    seconds: float
+    error: Optional[str] = None
+
+
+def generate_all_diagrams(code_content: str, api_key: str, session_id: str = None, selections: List[str] = None, use_cache: bool = True, filename: str = None):
+    """
+    Generates several diagram types in one pass (default: all of them).
+    Returns ({selection: DiagramResult}, total_seconds).
+    """
+    return run_sync(agenerate_all_diagrams(code_content, api_key, session_id, selections, use_cache, filename))
+
+
+async def agenerate_all_diagrams(code_content: str, api_key: str, session_id: str = None, selections: List[str] = None, use_cache: bool = True, filename: str = None):
+    selections = selections or DiagramFactory.DIAGRAM_TYPES
+    start = time.perf_counter()
+
+    # Build (or fetch) the shared index once; every diagram retrieves from it
+    await get_index_registry().aget_or_build(api_key, code_content, session_id, filename)
+
+    async def run(selection: str) -> DiagramResult:
+        started = time.perf_counter()
+        try:
+            raw, mermaid = await agenerate_diagram(code_content, selection, api_key, session_id, use_cache, filename)
+            return DiagramResult(selection, raw, mermaid, time.perf_counter() - started)
+        except Exception as e:
+            # One failed type must not discard the others
+            return DiagramResult(selection, None, None, time.perf_counter() - started, error=str(e))
+
+    results = await asyncio.gather(*(run(selection) for selection in selections))
+    return {result.selection: result for result in results}, time.perf_counter() - start
\ No newline at end of file
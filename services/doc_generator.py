@@ -1,29 +1,162 @@
-from openai import OpenAI
-from config import OPENAI_MODEL, DOC_STRUCTURE_RULES
-from services.vector_store import VectorStore
+import asyncio
+import queue
+from itertools import groupby
+from typing import Callable, List, Optional, Tuple
 
-def generate_documentation(code_content: str, api_key: str):
-    client = OpenAI(api_key=api_key)
+from config import (
+    DOC_STRUCTURE_RULES,
+    DOC_MAP_PROMPT,
+    DOC_REDUCE_PROMPT,
+    DOC_MAP_UNIT_TOKENS,
+    DOC_REDUCE_MAX_TOKENS,
+    DOC_CONCURRENCY,
+)
+from services.chunker import chunk_code
+from services.tokens import estimate_tokens, truncate_to_tokens
+from services.async_runtime import run_sync, submit
+from services.openai_clients import async_openai_client
+from services.rate_limiter import BULK, request_priority
+from services.completion_cache import acached_completion
 
-    vs = VectorStore(api_key)
-    vs.build(code_content)
+# progress(stage, done, total), stage being "map", "reduce" or "final"
+ProgressCallback = Callable[[str, int, int], None]
 
-    context = vs.retrieve("overall structure, functions, classes")
 
-    response = client.chat.completions.create(
-        model=OPENAI_MODEL,
-        messages=[
-            {"role": "system", "content": DOC_STRUCTURE_RULES},
-            {
-                "role": "user",
-                "content": f"""
+def generate_documentation(code_content: str, api_key: str, session_id: str = None, progress: Optional[ProgressCallback] = None, use_cache: bool = True, filename: str = None):
+    """
+    Sync wrapper around agenerate_documentation. Progress callbacks are
+    delivered on the calling thread, so they may update Streamlit elements.
+    """
+    if progress is None:
+        return run_sync(agenerate_documentation(code_content, api_key, session_id, use_cache=use_cache, filename=filename))
+
+    events = queue.SimpleQueue()
+    future = submit(agenerate_documentation(code_content, api_key, session_id, lambda *event: events.put(event), use_cache, filename))
+    while not future.done() or not events.empty():
+        try:
+            progress(*events.get(timeout=0.1))
+        except queue.Empty:
+            pass
+    return future.result()
+
+
+async def agenerate_documentation(code_content: str, api_key: str, session_id: str = None, progress: Optional[ProgressCallback] = None, use_cache: bool = True, filename: str = None):
+    """
+    Map-reduce documentation. Each file (or part of a large file) is
+    summarized concurrently, the summaries are merged level by level
+    until they fit one request, and the final document is written from
+    them following DOC_STRUCTURE_RULES. Uploads that fit in a single
+    unit are documented directly from the code. Every request goes
+    through the completion cache unless use_cache is False. session_id
+    is accepted for compatibility; documentation does not use the
+    retrieval index.
+    """
+    report = progress or (lambda stage, done, total: None)
+    units = await asyncio.to_thread(_map_units, code_content, filename)
+    limiter = asyncio.Semaphore(DOC_CONCURRENCY)
+
+    # Bulk job: yields to interactive chat requests on the same key
+    with request_priority(BULK):
+        async with async_openai_client(api_key) as client:
+            if len(units) == 1:
+                context = units[0][1]
+            else:
+                summaries = await _arun_stage(
+                    client, limiter, "map", DOC_MAP_PROMPT,
+                    [f"FILE: {label}\n\n{text}" for label, text in units], report, use_cache,
+                )
+                sections = [f"### {label}\n{summary}" for (label, _), summary in zip(units, summaries)]
+
+                # Every group holds at least two sections, so each level halves the count
+                while len(sections) > 1 and estimate_tokens("\n\n".join(sections)) > DOC_REDUCE_MAX_TOKENS:
+                    groups = _group_sections(sections, DOC_REDUCE_MAX_TOKENS)
+                    sections = await _arun_stage(
+                        client, limiter, "reduce", DOC_REDUCE_PROMPT,
+                        ["\n\n".join(group) for group in groups], report, use_cache,
+                    )
+                context = truncate_to_tokens("\n\n".join(sections), DOC_REDUCE_MAX_TOKENS)
+
+            report("final", 0, 1)
+            document = await _acomplete(client, DOC_STRUCTURE_RULES, f"""
 DOCUMENT THIS CODE BASED ON THE CONTEXT BELOW:
 
 {context}
-"""
-            }
+""", use_cache)
+            report("final", 1, 1)
+
+    return document
+
+
+def _map_units(code_content: str, filename: str = None) -> List[Tuple[str, str]]:
+    """
+    Groups consecutive chunks of each file into units of at most
+    DOC_MAP_UNIT_TOKENS. Returns [(label, text), ...] in upload order.
+    """
+    chunks, _ = chunk_code(code_content, filename)
+    units = []
+    for path, file_chunks in groupby(chunks, key=lambda chunk: chunk.path):
+        parts, current, current_tokens = [], [], 0
+        for chunk in file_chunks:
+            tokens = estimate_tokens(chunk.text)
+            if current and current_tokens + tokens > DOC_MAP_UNIT_TOKENS:
+                parts.append(current)
+                current, current_tokens = [], 0
+            current.append(chunk)
+            current_tokens += tokens
+        if current:
+            parts.append(current)
+
+        for part in parts:
+            label = path if len(parts) == 1 else f"{path} (lines {part[0].start_line}-{part[-1].end_line})"
+            units.append((label, "\n".join(chunk.text for chunk in part)))
+    return units
+
+
+def _group_sections(sections: List[str], max_tokens: int) -> List[List[str]]:
+    """
+    Packs consecutive sections into groups of at most max_tokens,
+    never leaving a section on its own if a neighbour is available.
+    """
+    groups, current, current_tokens = [], [], 0
+    for section in sections:
+        tokens = estimate_tokens(section)
+        if len(current) >= 2 and current_tokens + tokens > max_tokens:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(section)
+        current_tokens += tokens
+    if len(current) == 1 and groups:
+        groups[-1].extend(current)
+    elif current:
+        groups.append(current)
+    return groups
+
+
+async def _arun_stage(client, limiter: asyncio.Semaphore, stage: str, prompt: str, inputs: List[str], report: ProgressCallback, use_cache: bool = True) -> List[str]:
+    """
+    Runs one prompt over every input with bounded concurrency,
+    reporting progress as each request completes. Order is preserved.
+    """
+    done = 0
+    report(stage, 0, len(inputs))
+
+    async def run(text: str) -> str:
+        nonlocal done
+        async with limiter:
+            output = await _acomplete(client, prompt, text, use_cache)
+        done += 1
+        report(stage, done, len(inputs))
+        return output
+
+    return await asyncio.gather(*(run(text) for text in inputs))
+
+
+async def _acomplete(client, system_prompt: str, user_content: str, use_cache: bool = True) -> str:
+    return await acached_completion(
+        client,
+        [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_content},
         ],
-        temperature=0
+        use_cache,
     )
-
-    return response.choices[0].message.content
@@ -0,0 +1,98 @@
+"""
+Persistent, content-addressed embedding cache.
+
+Vectors are stored in SQLite under SESSION_DATA_DIR, keyed by a hash of
+the embedding model and the exact chunk text, so unchanged code is never
+re-embedded — across requests, sessions, and restarts. Entries are
+evicted least-recently-used once the cache exceeds its byte budget.
+"""
+
+import hashlib
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_BYTES
+from services.sqlite_lru import SQLiteLRUCache
+
+
+class EmbeddingCache(SQLiteLRUCache):
+    """
+    SQLite-backed LRU cache of embedding vectors (stored as float32 blobs).
+    Safe to share between Streamlit script threads.
+    """
+
+    table = "embeddings"
+    value_column = "vector"
+    value_type = "BLOB"
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_bytes: int = EMBEDDING_CACHE_MAX_BYTES):
+        super().__init__(path, max_bytes)
+
+    @staticmethod
+    def make_key(text: str, model: str) -> str:
+        """
+        Content address for a chunk: sha256 over model name and text.
+        """
+        digest = hashlib.sha256()
+        digest.update(model.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Returns {key: embedding} for every key present in the cache and
+        refreshes their LRU timestamps. Missing keys are simply absent.
+        """
+        unique = list(dict.fromkeys(keys))
+
+        with self._lock:
+            found = {
+                key: np.frombuffer(blob, dtype=np.float32)
+                for key, (blob,) in self._select(unique, ("vector",)).items()
+            }
+            if found:
+                self._touch(found)
+                self._conn.commit()
+
+            self.hits += len(found)
+            self.misses += len(unique) - len(found)
+
+        return found
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items: Dict[str, list]):
+        """
+        Stores {key: embedding} pairs, then evicts LRU entries if the
+        cache has grown past max_bytes.
+        """
+        if not items:
+            return
+
+        rows = []
+        for key, embedding in items.items():
+            blob = np.asarray(embedding, dtype=np.float32).tobytes()
+            rows.append((key, blob, len(blob)))
+
+        with self._lock:
+            self._insert(rows)
+            self._conn.commit()
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """
+    Process-wide shared cache instance.
+    """
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = EmbeddingCache()
+        return _shared_cache
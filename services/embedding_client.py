@@ -0,0 +1,133 @@
+"""
+Resilient embeddings.create calls.
+
+Transient failures (rate limits, timeouts, 5xx) are retried with
+exponential backoff and full jitter, honouring the server's Retry-After
+hint on 429s. A batch rejected as invalid is bisected so one bad input
+cannot take down its neighbours. Inputs that still fail come back as
+None rather than as a fake vector, so callers can mark them and retry
+later. Counters for requests, retries and failures are kept in
+get_embedding_metrics().
+"""
+
+import asyncio
+import logging
+import random
+import threading
+from typing import Dict, List, Optional
+
+import openai
+from openai import AsyncOpenAI
+
+from config import (
+    EMBEDDING_MODEL,
+    EMBEDDING_MAX_RETRIES,
+    EMBEDDING_BACKOFF_BASE,
+    EMBEDDING_BACKOFF_MAX,
+)
+from services.rate_limiter import retry_after_seconds
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingMetrics:
+    """
+    Process-wide counters for embedding calls.
+    """
+
+    FIELDS = ("requests", "retries", "rate_limited", "failed_inputs", "recovered_inputs")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(self.FIELDS, 0)
+        self.last_error: Optional[str] = None
+
+    def add(self, field: str, amount: int = 1):
+        with self._lock:
+            self._counts[field] += amount
+
+    def record_error(self, error: Exception):
+        self.last_error = f"{type(error).__name__}: {error}"[:200]
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return dict(self._counts, last_error=self.last_error)
+
+
+_metrics = EmbeddingMetrics()
+
+
+def get_embedding_metrics() -> EmbeddingMetrics:
+    return _metrics
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Rate limits, connection problems, timeouts and server-side errors
+    are worth retrying; other client errors are not.
+    """
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in (408, 409) or error.status_code >= 500
+    return False
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    return None if response is None else retry_after_seconds(response.headers)
+
+
+def backoff_delay(attempt: int, error: Exception = None) -> float:
+    """
+    Full-jitter exponential backoff, or the server's Retry-After (plus a
+    little jitter so waiting callers do not retry in lockstep).
+    """
+    hinted = retry_after(error) if error is not None else None
+    if hinted is not None:
+        return min(hinted, EMBEDDING_BACKOFF_MAX) + random.uniform(0, EMBEDDING_BACKOFF_BASE)
+    return random.uniform(0, min(EMBEDDING_BACKOFF_MAX, EMBEDDING_BACKOFF_BASE * 2 ** attempt))
+
+
+async def aembed_batch(client: AsyncOpenAI, batch: List[str], max_retries: int = EMBEDDING_MAX_RETRIES) -> List[Optional[list]]:
+    """
+    Embeds one batch. Returns one embedding per input, in order, with
+    None for inputs that could not be embedded.
+
+    `client` should have the SDK's own retries disabled
+    (client.with_options(max_retries=0)) so backoff happens only here.
+    """
+    error = None
+    for attempt in range(max_retries + 1):
+        if attempt:
+            _metrics.add("retries")
+            await asyncio.sleep(backoff_delay(attempt - 1, error))
+        try:
+            _metrics.add("requests")
+            response = await client.embeddings.create(
+                input=[text if text else " " for text in batch],
+                model=EMBEDDING_MODEL
+            )
+            # The API may return items out of order; restore by index
+            ordered = sorted(response.data, key=lambda item: item.index)
+            return [item.embedding for item in ordered]
+        except Exception as exc:
+            error = exc
+            _metrics.record_error(exc)
+            if isinstance(exc, openai.RateLimitError):
+                _metrics.add("rate_limited")
+            if not is_retryable(exc):
+                break
+
+    if isinstance(error, openai.BadRequestError) and len(batch) > 1:
+        # Find the offending input(s) without failing the rest
+        middle = len(batch) // 2
+        first, second = await asyncio.gather(
+            aembed_batch(client, batch[:middle], max_retries),
+            aembed_batch(client, batch[middle:], max_retries),
+        )
+        return first + second
+
+    logger.warning("embedding %d inputs failed: %s", len(batch), _metrics.last_error)
+    _metrics.add("failed_inputs", len(batch))
+    return [None] * len(batch)
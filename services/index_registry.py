@@ -0,0 +1,329 @@
+"""
+Session-scoped registry of built VectorStore indexes.
+
+Chat, documentation, and diagram requests for the same session and the
+same code share one index instead of re-chunking and re-embedding on
+every call. Entries are keyed by (session_id, code hash), bounded by
+count and total chunks, and evicted after sitting idle. When a
+session's code changes, its latest index is re-indexed incrementally
+(VectorStore.areindex) rather than rebuilt from scratch.
+"""
+
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from config import (
+    INDEX_REGISTRY_MAX_INDEXES,
+    INDEX_REGISTRY_MAX_CHUNKS,
+    INDEX_REGISTRY_IDLE_SECONDS,
+    EMBEDDING_RETRY_FAILED_SECONDS,
+)
+from services.vector_store import VectorStore, aembed_query
+from services.ingest import StreamedUpload
+from services.index_store import index_key, load_index, save_index
+from services.context_builder import ContextResult
+from services.async_runtime import run_sync
+from services.openai_clients import key_fingerprint
+
+logger = logging.getLogger(__name__)
+
+
+def code_hash(code_content: str, filename: str = None) -> str:
+    digest = hashlib.sha256((filename or "").encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(code_content.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class _Entry:
+    __slots__ = ("store", "key_fingerprint", "last_used")
+
+    def __init__(self, store: VectorStore, key_fingerprint: str):
+        self.store = store
+        self.key_fingerprint = key_fingerprint
+        self.last_used = time.monotonic()
+
+
+class IndexRegistry:
+    """
+    Thread-safe LRU of VectorStores with idle-time eviction.
+    Builds run on the shared async runtime; get_or_build is the sync
+    wrapper around aget_or_build.
+    """
+
+    def __init__(
+        self,
+        max_indexes: int = INDEX_REGISTRY_MAX_INDEXES,
+        max_chunks: int = INDEX_REGISTRY_MAX_CHUNKS,
+        idle_seconds: float = INDEX_REGISTRY_IDLE_SECONDS,
+    ):
+        self.max_indexes = max_indexes
+        self.max_chunks = max_chunks
+        self.idle_seconds = idle_seconds
+        self.hits = 0
+        self.misses = 0
+        # session_id -> reindex_stats of the session's latest re-upload
+        self.last_reindex: Dict[str, Dict] = {}
+        self._entries: "OrderedDict[tuple, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._build_locks: Dict[tuple, asyncio.Lock] = {}
+        # Earliest next retry of an index's failed chunks, and running retries
+        self._retry_at: Dict[tuple, float] = {}
+        self._retry_tasks = set()
+
+    def get_or_build(self, api_key: str, code_content: str, session_id: Optional[str] = None, filename: Optional[str] = None) -> VectorStore:
+        """
+        Returns the built index for this session and code, building it
+        on first use. Concurrent callers for the same key wait for a
+        single build rather than embedding the code twice. `filename` is
+        the upload's name, which picks a single file's language.
+        """
+        return run_sync(self.aget_or_build(api_key, code_content, session_id, filename))
+
+    async def aget_or_build(self, api_key: str, code_content: str, session_id: Optional[str] = None, filename: Optional[str] = None) -> VectorStore:
+        key = (session_id or "", code_hash(code_content, filename))
+        fingerprint = key_fingerprint(api_key)
+
+        store = self._lookup(key, fingerprint)
+        if store is not None:
+            self._schedule_retry(key, store, code_content, filename)
+            return store
+
+        # Build locks live on the runtime loop, where every build runs
+        with self._lock:
+            build_lock = self._build_locks.setdefault(key, asyncio.Lock())
+
+        async with build_lock:
+            # Another thread may have finished the build while we waited
+            store = self._lookup(key, fingerprint, count=False)
+            if store is not None:
+                return store
+
+            try:
+                # A re-upload within a session re-indexes incrementally
+                previous = self._session_entry(key[0], fingerprint) if key[0] else None
+                if previous is not None:
+                    store = await previous[1].areindex(code_content, filename)
+                    reindex_stats = store.reindex_stats
+                    logger.info("re-indexed session %s: %s", key[0], reindex_stats)
+                    store = await self._apersist(api_key, store, index_key(code_content, filename))
+                else:
+                    store = await self._aload_or_build(api_key, code_content, filename)
+
+                with self._lock:
+                    self.misses += 1
+                    if previous is not None:
+                        self._drop(previous[0])
+                        self.last_reindex[key[0]] = reindex_stats
+                    self._entries[key] = _Entry(store, fingerprint)
+                    self._entries.move_to_end(key)
+                    self._evict()
+            finally:
+                with self._lock:
+                    self._build_locks.pop(key, None)
+
+        self._schedule_retry(key, store, code_content, filename)
+        return store
+
+    def build_upload(self, api_key: str, upload: StreamedUpload, session_id: Optional[str] = None) -> VectorStore:
+        """
+        Reads an upload and builds its index at the same time; sync
+        wrapper around abuild_upload.
+        """
+        return run_sync(self.abuild_upload(api_key, upload, session_id))
+
+    async def abuild_upload(self, api_key: str, upload: StreamedUpload, session_id: Optional[str] = None) -> VectorStore:
+        """
+        Chunks and embeds each file of an upload as it is read
+        (VectorStore.abuild_files), then registers the index under the
+        key get_or_build(upload.code_content, ...) will look up. A
+        re-upload into a session that already has an index is read in
+        full first and re-indexed incrementally instead.
+        """
+        fingerprint = key_fingerprint(api_key)
+        if session_id and self._session_entry(session_id, fingerprint) is not None:
+            await asyncio.to_thread(upload.read_all)
+            return await self.aget_or_build(api_key, upload.code_content, session_id, upload.filename)
+
+        store = VectorStore(api_key)
+        await store.abuild_files(upload)
+        if not upload.code_content:
+            return store  # nothing readable; not worth registering
+        key = (session_id or "", code_hash(upload.code_content, upload.filename))
+        store = await self._apersist(api_key, store, index_key(upload.code_content, upload.filename))
+
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = _Entry(store, fingerprint)
+            self._entries.move_to_end(key)
+            self._evict()
+        self._schedule_retry(key, store, upload.code_content, upload.filename)
+        return store
+
+    def _schedule_retry(self, key: tuple, store: VectorStore, code_content: str, filename: Optional[str]):
+        """
+        Re-embeds an index's failed chunks in the background, at most once
+        per EMBEDDING_RETRY_FAILED_SECONDS; the repaired store replaces the
+        entry (and is persisted) when done. Callers keep the current store.
+        """
+        if not store.failed.any():
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now < self._retry_at.get(key, 0.0):
+                return
+            self._retry_at[key] = now + EMBEDDING_RETRY_FAILED_SECONDS
+        task = asyncio.ensure_future(self._aretry_failed(key, store, code_content, filename))
+        self._retry_tasks.add(task)
+        task.add_done_callback(self._retry_tasks.discard)
+
+    async def _aretry_failed(self, key: tuple, store: VectorStore, code_content: str, filename: Optional[str]):
+        try:
+            repaired = await store.aretry_failed()
+        except Exception:
+            logger.exception("retrying failed embeddings for %s", key[1][:12])
+            return
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.store is not store:
+                return  # evicted or re-indexed meanwhile
+            entry.store = repaired
+            if not repaired.failed.any():
+                self._retry_at.pop(key, None)
+        logger.info("retried failed embeddings for %s: %d left", key[1][:12], int(repaired.failed.sum()))
+        await asyncio.to_thread(save_index, repaired, index_key(code_content, filename))
+
+    async def _aload_or_build(self, api_key: str, code_content: str, filename: Optional[str]) -> VectorStore:
+        """
+        Maps a persisted index for this code if one exists (shared with
+        other sessions and across restarts), otherwise builds and saves it.
+        """
+        store = VectorStore(api_key)
+        disk_key = index_key(code_content, filename)
+        if await asyncio.to_thread(load_index, store, disk_key):
+            await store.abuild_indexes()
+            return store
+
+        await store.abuild(code_content, filename)
+        return await self._apersist(api_key, store, disk_key)
+
+    async def _apersist(self, api_key: str, store: VectorStore, disk_key: str) -> VectorStore:
+        """
+        Saves a freshly built index and returns the saved copy mapped back
+        from disk in place of the built one, so a new index is served the
+        same way as one loaded after a restart: the float32 matrix (and
+        with quantization on, the rows rescoring reads) stays in the page
+        cache, not on the heap. Stores that could not be saved (failed
+        rows still to retry) are returned as built.
+        """
+        await asyncio.to_thread(save_index, store, disk_key)
+
+        mapped = VectorStore(api_key)
+        if await asyncio.to_thread(load_index, mapped, disk_key):
+            await mapped.abuild_indexes()
+            return mapped
+        return store
+
+    def _session_entry(self, session_id: str, fingerprint: str) -> Optional[Tuple[tuple, VectorStore]]:
+        """
+        The most recently used (key, store) held for a session, if any.
+        """
+        with self._lock:
+            for key in reversed(self._entries):
+                entry = self._entries[key]
+                if key[0] == session_id and entry.key_fingerprint == fingerprint:
+                    return key, entry.store
+        return None
+
+    def _lookup(self, key: tuple, fingerprint: str, count: bool = True) -> Optional[VectorStore]:
+        with self._lock:
+            self._evict_idle()
+            entry = self._entries.get(key)
+            if entry is None or entry.key_fingerprint != fingerprint:
+                return None
+            entry.last_used = time.monotonic()
+            self._entries.move_to_end(key)
+            if count:
+                self.hits += 1
+            return entry.store
+
+    def invalidate(self, session_id: str):
+        """
+        Drops every index held for a session (e.g. when it is deleted).
+        """
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == session_id]:
+                self._drop(key)
+            self.last_reindex.pop(session_id, None)
+
+    def _drop(self, key: tuple):
+        """
+        Removes an entry with its retry deadline, and the session's
+        reindex stats once it holds no other index. Caller must hold the
+        lock.
+        """
+        self._entries.pop(key, None)
+        self._retry_at.pop(key, None)
+        if key[0] and not any(k[0] == key[0] for k in self._entries):
+            self.last_reindex.pop(key[0], None)
+
+    def _evict_idle(self):
+        cutoff = time.monotonic() - self.idle_seconds
+        for key in [k for k, e in self._entries.items() if e.last_used < cutoff]:
+            self._drop(key)
+
+    def _evict(self):
+        """
+        Evicts least-recently-used indexes until both the count and the
+        total-chunk bounds hold. The newest entry is always kept.
+        Caller must hold the lock.
+        """
+        self._evict_idle()
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_indexes or self._total_chunks() > self.max_chunks
+        ):
+            self._drop(next(iter(self._entries)))
+
+    def _total_chunks(self) -> int:
+        return sum(len(e.store.chunks) for e in self._entries.values())
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "indexes": len(self._entries),
+                "chunks": self._total_chunks(),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_shared_registry = None
+_shared_lock = threading.Lock()
+
+
+def get_index_registry() -> IndexRegistry:
+    """
+    Process-wide shared registry used by all services.
+    """
+    global _shared_registry
+    with _shared_lock:
+        if _shared_registry is None:
+            _shared_registry = IndexRegistry()
+        return _shared_registry
+
+
+async def aretrieve_context(api_key: str, code_content: str, query: str, session_id: Optional[str] = None, filename: Optional[str] = None) -> ContextResult:
+    """
+    Token-budgeted RAG context for a query. The query embedding is
+    computed concurrently with the (possibly cached) index build.
+    """
+    store, query_vector = await asyncio.gather(
+        get_index_registry().aget_or_build(api_key, code_content, session_id, filename),
+        aembed_query(api_key, query),
+    )
+    return store.context_for_vector(query_vector, query=query)
\ No newline at end of file
@@ -0,0 +1,238 @@
+"""
+Memory-mapped on-disk storage for built VectorStore indexes.
+
+Each index is a directory under INDEX_STORE_DIR, named by a hash of the
+code, the embedding model and the chunking settings:
+
+    vectors.bin   L2-normalized embedding matrix (INDEX_STORE_DTYPE), row-major
+    texts.bin     UTF-8 chunk texts, concatenated
+    offsets.npy   int64 byte offsets into texts.bin (one per chunk, plus end)
+    rows.npy      int32 (path id, language id, start line, end line) per chunk
+    keys.npy      content hash per chunk (for incremental re-indexing)
+    meta.json     format version, shape, dtype, paths, languages, file stats
+
+float32 vectors and chunk texts are opened with np.memmap, so loading is
+zero-copy: sessions on the same code share the same page-cache pages, and
+indexes survive restarts. float16 halves disk use but is widened to
+float32 in memory on load. Directories are written atomically and pruned
+least-recently-loaded beyond INDEX_STORE_MAX_BYTES.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections.abc import Sequence
+from typing import Dict, List
+
+import numpy as np
+
+from config import (
+    EMBEDDING_MODEL,
+    EMBEDDING_DIMENSIONS,
+    CHUNK_MAX_TOKENS,
+    CHUNK_MIN_TOKENS,
+    CHUNK_OVERLAP_LINES,
+    INDEX_STORE_DIR,
+    INDEX_STORE_DTYPE,
+    INDEX_STORE_MAX_BYTES,
+)
+from services.chunker import Chunk, MERGE_ANCHOR_PERIOD
+
+FORMAT_VERSION = 1
+
+_prune_lock = threading.Lock()
+
+
+def index_key(code_content: str, filename: str = None) -> str:
+    """
+    Identifies an index by everything that determines its contents,
+    including the upload's filename (it decides a single file's language).
+    """
+    settings = f"{FORMAT_VERSION}|{EMBEDDING_MODEL}|{EMBEDDING_DIMENSIONS}|" \
+               f"{CHUNK_MAX_TOKENS}|{CHUNK_MIN_TOKENS}|{CHUNK_OVERLAP_LINES}|{MERGE_ANCHOR_PERIOD}"
+    digest = hashlib.sha256(settings.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update((filename or "").encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(code_content.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ChunkTable(Sequence):
+    """
+    Read-only sequence of Chunks backed by the on-disk text and row
+    tables. Chunks are materialized on access, never all at once.
+    """
+
+    def __init__(self, texts: np.ndarray, offsets: np.ndarray, rows: np.ndarray, paths: List[str], languages: List[str]):
+        self._texts = texts
+        self._offsets = offsets
+        self._rows = rows
+        self._paths = paths
+        self._languages = languages
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        start, end = int(self._offsets[index]), int(self._offsets[index + 1])
+        path_id, language_id, start_line, end_line = (int(v) for v in self._rows[index])
+        return Chunk(
+            bytes(self._texts[start:end]).decode("utf-8"),
+            self._paths[path_id],
+            self._languages[language_id],
+            start_line,
+            end_line,
+        )
+
+
+def _index_dir(key: str) -> str:
+    return os.path.join(INDEX_STORE_DIR, key[:2], key)
+
+
+def save_index(store, key: str, dtype: str = INDEX_STORE_DTYPE):
+    """
+    Writes a built store to disk (live rows only). No-op if an index
+    with this key already exists, or if some rows failed to embed (they
+    would otherwise be served from disk without ever being retried).
+    """
+    final = _index_dir(key)
+    if os.path.exists(final) or store.failed[store.live].any():
+        return
+
+    rows_kept = np.flatnonzero(store.live)
+    chunks = [store.chunks[row] for row in rows_kept]
+    keys = [store.chunk_keys[row] for row in rows_kept]
+
+    paths, languages = {}, {}
+    row_table = np.zeros((len(chunks), 4), dtype=np.int32)
+    offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+    encoded = []
+    for i, chunk in enumerate(chunks):
+        data = chunk.text.encode("utf-8")
+        encoded.append(data)
+        offsets[i + 1] = offsets[i] + len(data)
+        row_table[i] = (
+            paths.setdefault(chunk.path, len(paths)),
+            languages.setdefault(chunk.language, len(languages)),
+            chunk.start_line,
+            chunk.end_line,
+        )
+
+    os.makedirs(os.path.dirname(final), exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=f".{key}.", dir=os.path.dirname(final))
+    try:
+        np.ascontiguousarray(store.matrix[rows_kept], dtype=dtype).tofile(os.path.join(tmp, "vectors.bin"))
+        with open(os.path.join(tmp, "texts.bin"), "wb") as f:
+            for data in encoded:
+                f.write(data)
+        np.save(os.path.join(tmp, "offsets.npy"), offsets)
+        np.save(os.path.join(tmp, "rows.npy"), row_table)
+        np.save(os.path.join(tmp, "keys.npy"), np.array(keys, dtype="S64"))
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "version": FORMAT_VERSION,
+                "model": EMBEDDING_MODEL,
+                "count": len(chunks),
+                "dimensions": int(store.matrix.shape[1]),
+                "dtype": dtype,
+                "paths": list(paths),
+                "languages": list(languages),
+                "file_stats": store.file_stats,
+            }, f)
+        os.replace(tmp, final)
+    except OSError:
+        # Another process won the race (or the disk is full); keep theirs
+        shutil.rmtree(tmp, ignore_errors=True)
+        return
+
+    prune()
+
+
+def load_index(store, key: str) -> bool:
+    """
+    Fills an empty VectorStore from disk. Returns False if no usable
+    index with this key exists.
+    """
+    directory = _index_dir(key)
+    try:
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if meta.get("version") != FORMAT_VERSION:
+        return False
+
+    count, dims = meta["count"], meta["dimensions"]
+    if count:
+        matrix = np.memmap(os.path.join(directory, "vectors.bin"), dtype=meta["dtype"], mode="r", shape=(count, dims))
+        texts = np.memmap(os.path.join(directory, "texts.bin"), dtype=np.uint8, mode="r")
+    else:
+        # np.memmap cannot map empty files
+        matrix = np.zeros((0, dims), dtype=np.float32)
+        texts = np.zeros(0, dtype=np.uint8)
+    if matrix.dtype != np.float32:
+        matrix = np.asarray(matrix, dtype=np.float32)
+
+    offsets = np.load(os.path.join(directory, "offsets.npy"), mmap_mode="r")
+    rows = np.load(os.path.join(directory, "rows.npy"), mmap_mode="r")
+    keys = np.load(os.path.join(directory, "keys.npy"))
+
+    store.chunks = ChunkTable(texts, offsets, rows, meta["paths"], meta["languages"])
+    store.chunk_keys = [k.decode("ascii") for k in keys]
+    store.file_stats = meta["file_stats"]
+    store.matrix = matrix
+    store.live = np.ones(count, dtype=bool)
+    store.failed = np.zeros(count, dtype=bool)
+
+    # Recency for pruning
+    os.utime(os.path.join(directory, "meta.json"))
+    return True
+
+
+def prune(max_bytes: int = INDEX_STORE_MAX_BYTES):
+    """
+    Deletes least-recently-loaded indexes until the store fits max_bytes.
+    """
+    with _prune_lock:
+        entries = []
+        for shard in os.scandir(INDEX_STORE_DIR) if os.path.isdir(INDEX_STORE_DIR) else []:
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                meta = os.path.join(entry.path, "meta.json")
+                if entry.name.startswith(".") or not os.path.exists(meta):
+                    continue
+                size = sum(f.stat().st_size for f in os.scandir(entry.path))
+                entries.append((os.stat(meta).st_mtime, size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            # Already-mapped files stay readable until unmapped (POSIX)
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+
+def stats() -> Dict:
+    indexes, total = 0, 0
+    if os.path.isdir(INDEX_STORE_DIR):
+        for shard in os.scandir(INDEX_STORE_DIR):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.startswith("."):
+                    continue
+                indexes += 1
+                total += sum(f.stat().st_size for f in os.scandir(entry.path))
+    return {"indexes": indexes, "bytes": total}
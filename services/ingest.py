@@ -0,0 +1,198 @@
+"""
+Streaming ingestion of uploads (single files and ZIP archives).
+
+Archive members are read one at a time through `zipfile`'s streaming
+readers, never extracted to disk or loaded as a whole. Binaries are
+skipped by sniffing their first bytes, and per-file and total size caps
+bound how much text is ever held, regardless of the archive's size.
+Each accepted file is yielded as (path, text), ready for the chunker.
+StreamedUpload feeds them to VectorStore.abuild_files as they are read,
+so chunking and embedding overlap the read, while assembling the
+FILE_HEADER-joined code_content the rest of the app works with;
+`ingest_upload` only assembles it.
+"""
+
+import codecs
+import zipfile
+from dataclasses import dataclass, field
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+from config import (
+    INGEST_MAX_FILE_BYTES,
+    INGEST_MAX_TOTAL_BYTES,
+    INGEST_MAX_FILES,
+    INGEST_SNIFF_BYTES,
+)
+from services.chunker import FILE_HEADER, split_files
+
+# Archive noise that is never source code
+SKIPPED_PREFIXES = ("__MACOSX/", ".git/", "node_modules/", "__pycache__/", ".venv/", "venv/")
+
+READ_BLOCK = 64 * 1024
+
+
+@dataclass
+class IngestReport:
+    files: int = 0
+    bytes: int = 0
+    skipped: List[Tuple[str, str]] = field(default_factory=list)  # (path, reason)
+    truncated: bool = False  # total cap reached; later members were not read
+
+
+def looks_binary(sample: bytes) -> bool:
+    """
+    NUL bytes never occur in text files; a high share of control
+    characters suggests an unknown binary format.
+    """
+    if not sample:
+        return False
+    if b"\0" in sample:
+        return True
+    control = sum(1 for byte in sample if byte < 32 and byte not in (9, 10, 12, 13))
+    return control / len(sample) > 0.3
+
+
+def _read_text(stream: BinaryIO, max_bytes: int) -> Tuple[str, int, str]:
+    """
+    Reads and decodes a stream incrementally. Returns (text, bytes, "")
+    with line endings normalized to "\n", or ("", 0, reason) when the
+    stream is binary, not UTF-8, or too large.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    parts = []
+    size = 0
+    first = True
+    while True:
+        block = stream.read(INGEST_SNIFF_BYTES if first else READ_BLOCK)
+        if first and looks_binary(block):
+            return "", 0, "binary"
+        first = False
+        if not block:
+            break
+        size += len(block)
+        if size > max_bytes:
+            return "", 0, f"larger than {max_bytes // 1024} KB"
+        try:
+            parts.append(decoder.decode(block))
+        except UnicodeDecodeError:
+            return "", 0, "not UTF-8 text"
+    try:
+        parts.append(decoder.decode(b"", final=True))
+    except UnicodeDecodeError:
+        return "", 0, "not UTF-8 text"
+    # Joined first: a "\r\n" can straddle two blocks
+    text = "".join(parts).replace("\r\n", "\n").replace("\r", "\n")
+    return text, size, ""
+
+
+def iter_zip_files(fileobj: BinaryIO, report: IngestReport) -> Iterator[Tuple[str, str]]:
+    """
+    Lazily yields (path, text) for each text member of a ZIP archive,
+    recording skipped members and stopping at the total size cap.
+    """
+    with zipfile.ZipFile(fileobj) as archive:
+        for info in archive.infolist():
+            path = info.filename
+            if info.is_dir():
+                continue
+            if path.startswith(SKIPPED_PREFIXES) or "/." in f"/{path}":
+                continue
+            if report.files >= INGEST_MAX_FILES:
+                report.truncated = True
+                return
+            # Declared sizes can lie, so the read below enforces the cap too
+            if info.file_size > INGEST_MAX_FILE_BYTES:
+                report.skipped.append((path, f"larger than {INGEST_MAX_FILE_BYTES // 1024} KB"))
+                continue
+            if report.bytes + info.file_size > INGEST_MAX_TOTAL_BYTES:
+                report.truncated = True
+                return
+
+            with archive.open(info) as member:
+                text, size, reason = _read_text(member, INGEST_MAX_FILE_BYTES)
+            if reason:
+                report.skipped.append((path, reason))
+                continue
+
+            report.files += 1
+            report.bytes += size
+            yield path, text
+
+
+class StreamedUpload:
+    """
+    Iterates an upload's files as (path, text), each exactly as
+    split_files(code_content, filename) will later cut it from the joined
+    upload, so an index built while reading matches one rebuilt from
+    code_content. code_content is complete once iteration has finished;
+    an upload can be iterated only once.
+    """
+
+    def __init__(self, filename: str, fileobj: BinaryIO):
+        self.filename = filename
+        self.report = IngestReport()
+        self._fileobj = fileobj
+        self._parts: List[str] = []
+        self._consumed = False
+        self._complete = False
+
+    @property
+    def is_zip(self) -> bool:
+        return self.filename.lower().endswith(".zip")
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        if self._consumed:
+            raise RuntimeError("upload already read")
+        self._consumed = True
+
+        if not self.is_zip:
+            text, size, reason = _read_text(self._fileobj, INGEST_MAX_TOTAL_BYTES)
+            if reason:
+                self.report.skipped.append((self.filename, reason))
+                self._complete = True
+                return
+            self.report.files = 1
+            self.report.bytes = size
+            self._parts.append(text)
+            if text:
+                yield from split_files(text, self.filename)
+            self._complete = True
+            return
+
+        # split_files strips a member's leading newlines, including the
+        # newline that joins it to the next header when the member is
+        # only newlines, so hold one file back
+        previous: Optional[Tuple[str, str]] = None
+        for path, text in iter_zip_files(self._fileobj, self.report):
+            self._parts.append(f"{FILE_HEADER.format(path=path)}\n{text}")
+            if previous is not None:
+                yield previous[0], (previous[1] + "\n").lstrip("\r\n")
+            previous = (path, text)
+        if previous is not None:
+            yield previous[0], previous[1].lstrip("\r\n")
+        self._complete = True
+
+    def read_all(self) -> str:
+        """
+        Reads the rest of the upload without indexing it.
+        """
+        for _ in self:
+            pass
+        return self.code_content
+
+    @property
+    def code_content(self) -> str:
+        if not self._complete:
+            raise RuntimeError("upload not fully read yet")
+        return "\n".join(self._parts)
+
+
+def ingest_upload(filename: str, fileobj: BinaryIO) -> Tuple[str, IngestReport]:
+    """
+    Reads an upload into code_content. ZIP archives become one
+    FILE_HEADER-separated document; other uploads are read as a single
+    text file. A rejected single file yields "" with the reason in
+    report.skipped.
+    """
+    upload = StreamedUpload(filename, fileobj)
+    return upload.read_all(), upload.report
@@ -0,0 +1,101 @@
+"""
+Lexical (BM25) retrieval over code chunks.
+
+Embeddings retrieve exact identifiers such as `save_code_content` or
+`ensureHeader` poorly, so VectorStore keeps a small in-process inverted
+index next to its vector index and fuses the two rankings. The lexical
+side needs no network, so it also serves as the retriever of last resort
+when the query cannot be embedded.
+"""
+
+import math
+import re
+from collections import Counter
+from typing import List, Sequence
+
+import numpy as np
+
+from config import BM25_K1, BM25_B, HYBRID_RRF_K
+from services.ann_index import select_top_k
+
+_WORD = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+# Sub-words of snake_case, camelCase and ACRONYMCase identifiers
+_PART = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Identifier-aware tokens: every identifier is kept whole (lowercased)
+    so exact names match strongly, followed by its sub-words so that
+    "code content" still finds `save_code_content`.
+    """
+    tokens = []
+    for word in _WORD.findall(text):
+        tokens.append(word.lower())
+        parts = _PART.findall(word)
+        if len(parts) > 1:
+            tokens.extend(part.lower() for part in parts)
+    return tokens
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a fixed list of documents. Postings are stored as
+    numpy arrays per term, so a query touches only the documents that
+    contain its terms.
+    """
+
+    def __init__(self, texts: Sequence[str], k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.n_docs = len(texts)
+
+        postings = {}
+        lengths = np.zeros(self.n_docs, dtype=np.float32)
+        for doc, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            lengths[doc] = sum(counts.values())
+            for term, tf in counts.items():
+                entry = postings.get(term)
+                if entry is None:
+                    postings[term] = entry = ([], [])
+                entry[0].append(doc)
+                entry[1].append(tf)
+
+        self.postings = {
+            term: (np.asarray(docs, dtype=np.int64), np.asarray(tfs, dtype=np.float32))
+            for term, (docs, tfs) in postings.items()
+        }
+        average = float(lengths.mean()) if self.n_docs else 0.0
+        # Per-document length normalization, k1 * (1 - b + b * len / avg)
+        self.norms = k1 * (1 - b + b * lengths / (average or 1.0))
+
+    def search(self, query: str, top_k: int) -> list:
+        """
+        Returns [(score, doc_index), ...] for documents matching at least
+        one query term, best first.
+        """
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        for term in set(tokenize(query)):
+            entry = self.postings.get(term)
+            if entry is None:
+                continue
+            docs, tfs = entry
+            idf = math.log(1 + (self.n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + self.norms[docs])
+
+        matched = np.flatnonzero(scores)
+        return select_top_k(scores[matched], top_k, matched)
+
+
+def fuse_rankings(rankings: List[list], top_k: int, k: int = HYBRID_RRF_K) -> list:
+    """
+    Reciprocal rank fusion: each ranking contributes 1 / (k + rank) per
+    document, so rankings with incomparable score scales (cosine, BM25)
+    combine without calibration. Returns [(fused_score, index), ...].
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, (_, idx) in enumerate(ranking, start=1):
+            fused[idx] = fused.get(idx, 0.0) + 1.0 / (k + rank)
+    ordered = sorted(fused.items(), key=lambda item: (-item[1], item[0]))
+    return [(score, idx) for idx, score in ordered[:top_k]]
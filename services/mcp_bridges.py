@@ -6,10 +6,16 @@ When the AI decides to search past conversations, it calls these
 tools — the same tools exposed by the MCP server.
 """
 
+import asyncio
 import json
 from typing import Dict, Any
-from openai import OpenAI
 from services.session_store import SessionStore
+from services.message_writer import FLUSH_TIMEOUT_SECONDS, get_message_writer
+from services.session_catalog import get_session_catalog
+from services.index_registry import aretrieve_context
+from services.context_builder import log_context_usage
+from services.async_runtime import run_sync
+from services.openai_clients import openai_client, async_openai_client
 
 
 # ── MCP Tool Schemas (OpenAI function-calling format) ──────────
@@ -97,7 +103,10 @@ def execute_mcp_tool(tool_name: str, arguments: Dict[str, Any]) -> str:
         return json.dumps(messages, indent=2)
 
     elif tool_name == "list_all_sessions":
-        sessions = store.list_sessions()
+        # The catalogue answers without scanning every stored message
+        catalog = get_session_catalog()
+        catalog.seed_from(store)
+        sessions = catalog.list_sessions()
         if not sessions:
             return "No past sessions found."
         return json.dumps(sessions, indent=2)
@@ -105,36 +114,19 @@ def execute_mcp_tool(tool_name: str, arguments: Dict[str, Any]) -> str:
     return f"Unknown tool: {tool_name}"
 
 
-# ── Main Chat Function (with MCP context) ──────────────────────
+# ── Shared prompt assembly ─────────────────────────────────
 
-def chat_with_session_context(
-    code_content: str,
-    question: str,
-    session_id: str,
-    api_key: str,
-    model: str = "gpt-4o-mini",
-) -> str:
+async def _abuild_messages(code_content: str, question: str, session_id: str, api_key: str, store: SessionStore, filename: str = None) -> list:
     """
-    Enhanced chat with session logging + MCP tool access.
-
-    Flow:
-    1. Build code context via RAG
-    2. Load recent session context
-    3. Call OpenAI with MCP tools available
-    4. If AI calls a tool → execute & continue
-    5. Log the conversation turn
+    RAG code context + recent session context + the user question.
+    Index build, query embedding and session lookup run concurrently.
     """
-    client = OpenAI(api_key=api_key)
-    store = SessionStore()
-
-    # ── RAG context from code ──
-    from services.vector_store import VectorStore
-    vs = VectorStore(api_key)
-    vs.build(code_content)
-    code_context = vs.retrieve(question)
-
-    # ── Recent session context ──
-    recent_context = store.get_recent_context(session_id, n_messages=4)
+    result, recent_context = await asyncio.gather(
+        aretrieve_context(api_key, code_content, question, session_id, filename),
+        asyncio.to_thread(_recent_context, store, session_id),
+    )
+    log_context_usage("chat", result)
+    code_context = result.text
 
     # ── Build messages ──
     messages = [
@@ -158,44 +150,180 @@ def chat_with_session_context(
         "role": "user",
         "content": f"CODE CONTEXT:\n{code_context}\n\nQUESTION:\n{question}",
     })
+    return messages
 
-    # ── First OpenAI call (with MCP tools) ──
-    response = client.chat.completions.create(
-        model=model,
-        messages=messages,
-        tools=MCP_TOOL_DEFINITIONS,
-        tool_choice="auto",
-        temperature=0,
-    )
 
-    message = response.choices[0].message
+def _recent_context(store: SessionStore, session_id: str) -> str:
+    # The previous turn may still be queued for writing; while the store
+    # is failing, answer from what is saved rather than wait on it
+    writer = get_message_writer()
+    if not writer.backing_off:
+        writer.flush(session_id, timeout=FLUSH_TIMEOUT_SECONDS)
+    return store.get_recent_context(session_id, n_messages=4)
 
-    # ── Handle tool calls ──
-    if message.tool_calls:
-        messages.append(message)
 
-        for tool_call in message.tool_calls:
-            fn_name = tool_call.function.name
-            fn_args = json.loads(tool_call.function.arguments)
-            tool_result = execute_mcp_tool(fn_name, fn_args)
+def _append_tool_results(messages: list, tool_calls: list):
+    """
+    Executes each requested MCP tool and appends its result message.
+    """
+    for tool_call in tool_calls:
+        fn_name = tool_call["function"]["name"]
+        fn_args = json.loads(tool_call["function"]["arguments"] or "{}")
+        tool_result = execute_mcp_tool(fn_name, fn_args)
+
+        messages.append({
+            "role": "tool",
+            "tool_call_id": tool_call["id"],
+            "content": tool_result,
+        })
+
+
+# ── Main Chat Function (with MCP context) ──────────────────────
+
+def chat_with_session_context(
+    code_content: str,
+    question: str,
+    session_id: str,
+    api_key: str,
+    model: str = "gpt-4o-mini",
+    filename: str = None,
+) -> str:
+    """
+    Enhanced chat with session logging + MCP tool access.
+    Sync wrapper around achat_with_session_context.
+
+    Flow:
+    1. Build code context via RAG
+    2. Load recent session context
+    3. Call OpenAI with MCP tools available
+    4. If AI calls a tool → execute & continue
+    5. Queue the conversation turn for the background writer
+    """
+    return run_sync(achat_with_session_context(code_content, question, session_id, api_key, model, filename))
 
-            messages.append({
-                "role": "tool",
-                "tool_call_id": tool_call.id,
-                "content": tool_result,
-            })
 
-        # ── Second call with tool results ──
-        response = client.chat.completions.create(
+async def achat_with_session_context(
+    code_content: str,
+    question: str,
+    session_id: str,
+    api_key: str,
+    model: str = "gpt-4o-mini",
+    filename: str = None,
+) -> str:
+    store = SessionStore()
+    messages = await _abuild_messages(code_content, question, session_id, api_key, store, filename)
+
+    async with async_openai_client(api_key) as client:
+        # ── First OpenAI call (with MCP tools) ──
+        response = await client.chat.completions.create(
             model=model,
             messages=messages,
+            tools=MCP_TOOL_DEFINITIONS,
+            tool_choice="auto",
             temperature=0,
         )
+
         message = response.choices[0].message
 
+        # ── Handle tool calls ──
+        if message.tool_calls:
+            messages.append(message)
+            await asyncio.to_thread(
+                _append_tool_results, messages, [tool_call.model_dump() for tool_call in message.tool_calls]
+            )
+
+            # ── Second call with tool results ──
+            response = await client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=0,
+            )
+            message = response.choices[0].message
+
     answer = message.content
 
-    # ── Save conversation turn ──
-    store.save_conversation_turn(session_id, question, answer)
+    # ── Queue conversation turn (saved in the background) ──
+    await asyncio.to_thread(get_message_writer().submit, session_id, question, answer)
+
+    return answer
+
+
+# ── Streaming Chat Function (with MCP context) ─────────────────
+
+def stream_chat_with_session_context(
+    code_content: str,
+    question: str,
+    session_id: str,
+    api_key: str,
+    model: str = "gpt-4o-mini",
+    filename: str = None,
+):
+    """
+    Streaming variant of chat_with_session_context.
+
+    Yields answer tokens as they arrive. If the first streamed response
+    requests tools, their calls are reassembled from the deltas, executed,
+    and the follow-up response is streamed too. The turn is queued for
+    the background writer once the stream completes.
+    """
+    store = SessionStore()
+    messages = run_sync(_abuild_messages(code_content, question, session_id, api_key, store, filename))
+
+    answer_parts = []
+
+    with openai_client(api_key) as client:
+        # ── First OpenAI call (with MCP tools), streamed ──
+        stream = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            tools=MCP_TOOL_DEFINITIONS,
+            tool_choice="auto",
+            temperature=0,
+            stream=True,
+        )
+
+        tool_calls = {}
+        for event in stream:
+            if not event.choices:
+                continue
+            delta = event.choices[0].delta
+            if delta.content:
+                answer_parts.append(delta.content)
+                yield delta.content
+            for tc in delta.tool_calls or []:
+                call = tool_calls.setdefault(tc.index, {
+                    "id": "",
+                    "type": "function",
+                    "function": {"name": "", "arguments": ""},
+                })
+                if tc.id:
+                    call["id"] = tc.id
+                if tc.function and tc.function.name:
+                    call["function"]["name"] += tc.function.name
+                if tc.function and tc.function.arguments:
+                    call["function"]["arguments"] += tc.function.arguments
+
+        # ── Handle tool calls, then stream the final answer ──
+        if tool_calls:
+            ordered_calls = [tool_calls[i] for i in sorted(tool_calls)]
+            messages.append({
+                "role": "assistant",
+                "content": "".join(answer_parts) or None,
+                "tool_calls": ordered_calls,
+            })
+            _append_tool_results(messages, ordered_calls)
+
+            stream = client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=0,
+                stream=True,
+            )
+            for event in stream:
+                if event.choices and event.choices[0].delta.content:
+                    token = event.choices[0].delta.content
+                    answer_parts.append(token)
+                    yield token
 
-    return answer
\ No newline at end of file
+    # ── Queue conversation turn once the stream is complete ──
+    get_message_writer().submit(session_id, question, "".join(answer_parts))
\ No newline at end of file
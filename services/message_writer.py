@@ -0,0 +1,359 @@
+"""
+Write-behind persistence for chat turns.
+
+SessionStore.save_conversation_turn embeds both messages and upserts
+them into Chroma, which used to happen before the answer was returned.
+MessageWriter acknowledges a turn as soon as it is appended to a small
+JSONL journal and hands it to a background thread, which saves turns in
+batches of up to MESSAGE_WRITE_BATCH_SIZE, never holding one longer than
+MESSAGE_WRITE_MAX_DELAY seconds. Saved turns are marked done in the
+journal, which is truncated whenever the queue drains.
+
+On startup the journal is replayed, so turns acknowledged but not yet
+saved when the process died are saved then. Delivery is at-least-once:
+a crash between saving a batch and marking it done saves it again.
+"""
+
+import atexit
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Callable, Deque, Dict, List, Optional
+
+from config import (
+    MESSAGE_JOURNAL_PATH,
+    MESSAGE_JOURNAL_FSYNC,
+    MESSAGE_WRITE_BATCH_SIZE,
+    MESSAGE_WRITE_MAX_DELAY,
+)
+from services.session_catalog import SessionCatalog, get_session_catalog
+
+logger = logging.getLogger(__name__)
+
+# Longest pause between attempts while the store keeps failing
+MAX_RETRY_SECONDS = 30.0
+# How long readers and shutdown wait for queued turns to be saved
+FLUSH_TIMEOUT_SECONDS = 5.0
+
+
+class _Turn:
+    __slots__ = ("id", "seq", "session_id", "question", "answer", "timestamp")
+
+    def __init__(self, id: str, seq: int, session_id: str, question: str, answer: str, timestamp: str):
+        self.id = id
+        self.seq = seq
+        self.session_id = session_id
+        self.question = question
+        self.answer = answer
+        self.timestamp = timestamp
+
+    def record(self) -> Dict:
+        return {
+            "id": self.id,
+            "session_id": self.session_id,
+            "question": self.question,
+            "answer": self.answer,
+            "timestamp": self.timestamp,
+        }
+
+
+class MessageWriter:
+    """
+    Journaled queue of conversation turns in front of a store with
+    save_conversation_turn(session_id, question, answer). If the store
+    also has save_conversation_turns(turns), taking a list of
+    (session_id, question, answer), each batch is saved in one call.
+    Either method is passed the time the turn was submitted as
+    `timestamp=` if it accepts that keyword (a list, one per turn, for
+    save_conversation_turns). Saved turns are counted in `catalog` (a
+    SessionCatalog), if given.
+    """
+
+    def __init__(
+        self,
+        store_factory: Callable[[], object],
+        journal_path: str = MESSAGE_JOURNAL_PATH,
+        batch_size: int = MESSAGE_WRITE_BATCH_SIZE,
+        max_delay: float = MESSAGE_WRITE_MAX_DELAY,
+        fsync: bool = MESSAGE_JOURNAL_FSYNC,
+        catalog: Optional[SessionCatalog] = None,
+    ):
+        self.journal_path = journal_path
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.fsync = fsync
+        self.submitted = 0
+        self.saved = 0
+        self.batches = 0
+        self.failures = 0
+        self.replayed = 0
+        self.last_error: Optional[str] = None
+        self._store_factory = store_factory
+        self._catalog = catalog
+        self._store = None
+        self._queue: Deque[_Turn] = deque()
+        self._seq = 0
+        self._saved_seq = 0
+        self._session_seq: Dict[str, int] = {}
+        self._urgent = False
+        self._closed = False
+        self._backoff_until = 0.0
+        self._cond = threading.Condition()
+
+        directory = os.path.dirname(journal_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._replay()
+        self._journal = open(journal_path, "a", encoding="utf-8")
+
+        self._thread = threading.Thread(target=self._run, name="message-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, session_id: str, question: str, answer: str):
+        """
+        Journals the turn and queues it for saving. Returns without
+        touching the store.
+        """
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("MessageWriter is closed")
+            turn = self._enqueue(uuid.uuid4().hex, session_id, question, answer, datetime.now().isoformat())
+            self._append({"turn": turn.record()})
+            self.submitted += 1
+            self._cond.notify_all()
+
+    def flush(self, session_id: Optional[str] = None, timeout: Optional[float] = None) -> bool:
+        """
+        Saves queued turns now instead of at the end of the batch window
+        and waits until they are in the store: every turn submitted so
+        far, or only those for `session_id`. False if `timeout` ran out.
+        """
+        with self._cond:
+            target = self._seq if session_id is None else self._session_seq.get(session_id, 0)
+            if self._saved_seq >= target:
+                return True
+            self._urgent = True
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: self._saved_seq >= target, timeout)
+
+    def close(self, timeout: Optional[float] = None):
+        """
+        Flushes what it can within `timeout` and stops the worker. Turns
+        still queued stay in the journal for the next start.
+        """
+        self.flush(timeout=timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        with self._cond:
+            self._journal.close()
+
+    @property
+    def backing_off(self) -> bool:
+        """
+        True while the worker waits to retry a failed save: a flush now
+        would only run out its timeout.
+        """
+        with self._cond:
+            return time.monotonic() < self._backoff_until
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                "queued": len(self._queue),
+                "submitted": self.submitted,
+                "saved": self.saved,
+                "batches": self.batches,
+                "replayed": self.replayed,
+                "failures": self.failures,
+                "last_error": self.last_error,
+            }
+
+    def _enqueue(self, id: str, session_id: str, question: str, answer: str, timestamp: str) -> _Turn:
+        # Caller must hold the lock (or be the constructor)
+        self._seq += 1
+        turn = _Turn(id, self._seq, session_id, question, answer, timestamp)
+        self._queue.append(turn)
+        self._session_seq[session_id] = self._seq
+        return turn
+
+    def _append(self, record: Dict):
+        """
+        Appends one journal line. Caller must hold the lock.
+        """
+        self._journal.write(json.dumps(record) + "\n")
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+
+    def _replay(self):
+        """
+        Queues the journal's unsaved turns and rewrites the journal to
+        hold only those.
+        """
+        if not os.path.exists(self.journal_path):
+            return
+
+        turns, done = {}, set()
+        with open(self.journal_path, encoding="utf-8") as journal:
+            for line in journal:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn final line from a crash mid-write
+                if "turn" in record:
+                    turns[record["turn"]["id"]] = record["turn"]
+                else:
+                    done.update(record.get("done", ()))
+
+        pending = [turn for id, turn in turns.items() if id not in done]
+        for turn in pending:
+            self._enqueue(turn["id"], turn["session_id"], turn["question"], turn["answer"], turn["timestamp"])
+        self.replayed = len(pending)
+        if pending:
+            logger.info("replaying %d unsaved chat turns from %s", len(pending), self.journal_path)
+
+        temporary = f"{self.journal_path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as journal:
+            for turn in pending:
+                journal.write(json.dumps({"turn": turn}) + "\n")
+            journal.flush()
+            os.fsync(journal.fileno())
+        os.replace(temporary, self.journal_path)
+
+    def _run(self):
+        attempt = 0
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                self._save(batch)
+            except Exception as exc:
+                attempt += 1
+                delay = min(MAX_RETRY_SECONDS, self.max_delay * 2 ** attempt)
+                logger.warning("saving %d chat turns failed, retrying in %.1fs: %s", len(batch), delay, exc)
+                with self._cond:
+                    self.failures += 1
+                    self.last_error = f"{type(exc).__name__}: {exc}"[:200]
+                    self._backoff_until = time.monotonic() + delay
+                    # The batch stays at the head of the queue
+                    self._cond.wait_for(lambda: self._closed, delay)
+                    self._backoff_until = 0.0
+                continue
+            attempt = 0
+            self._record(batch)
+            self._mark_saved(batch)
+
+    def _next_batch(self) -> Optional[List[_Turn]]:
+        """
+        Waits for a full batch, for the oldest queued turn to reach
+        max_delay, or for a flush. None once closed.
+        """
+        with self._cond:
+            while not self._queue:
+                if self._closed:
+                    return None
+                self._cond.wait()
+
+            deadline = time.monotonic() + self.max_delay
+            while len(self._queue) < self.batch_size and not self._urgent and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            if self._closed:
+                return None
+            return [self._queue[i] for i in range(min(self.batch_size, len(self._queue)))]
+
+    def _save(self, batch: List[_Turn]):
+        if self._store is None:
+            self._store = self._store_factory()
+        save_many = getattr(self._store, "save_conversation_turns", None)
+        if save_many is not None:
+            turns = [(turn.session_id, turn.question, turn.answer) for turn in batch]
+            if _accepts_timestamp(save_many):
+                save_many(turns, timestamp=[turn.timestamp for turn in batch])
+            else:
+                save_many(turns)
+        else:
+            save_one = self._store.save_conversation_turn
+            with_timestamp = _accepts_timestamp(save_one)
+            for turn in batch:
+                if with_timestamp:
+                    save_one(turn.session_id, turn.question, turn.answer, timestamp=turn.timestamp)
+                else:
+                    save_one(turn.session_id, turn.question, turn.answer)
+
+    def _record(self, batch: List[_Turn]):
+        """
+        Counts a saved batch in the session catalogue. The turns are in
+        the store already, so a failure here is logged, not retried.
+        """
+        if self._catalog is None:
+            return
+        try:
+            for turn in batch:
+                # A turn is the user's question plus the assistant's answer
+                self._catalog.record_messages(turn.session_id, 2, turn.timestamp)
+        except Exception:
+            logger.exception("recording %d chat turns in the session catalogue", len(batch))
+
+    def _mark_saved(self, batch: List[_Turn]):
+        with self._cond:
+            for _ in batch:
+                self._queue.popleft()
+            self._saved_seq = batch[-1].seq
+            self.saved += len(batch)
+            self.batches += 1
+            if self._journal.closed:
+                pass  # closed while this batch was being saved
+            elif self._queue:
+                self._append({"done": [turn.id for turn in batch]})
+            else:
+                # Everything journaled is saved; start the journal afresh
+                self._journal.seek(0)
+                self._journal.truncate()
+                self._urgent = False
+            self._cond.notify_all()
+
+
+def _accepts_timestamp(method) -> bool:
+    """
+    Whether a store's save method takes the turn's original time, so a
+    replayed or batched turn keeps the time it was asked, not saved.
+    """
+    try:
+        parameters = inspect.signature(method).parameters
+    except (TypeError, ValueError):
+        return False
+    return "timestamp" in parameters or any(
+        parameter.kind is inspect.Parameter.VAR_KEYWORD for parameter in parameters.values()
+    )
+
+
+_shared_writer: Optional[MessageWriter] = None
+_shared_lock = threading.Lock()
+
+
+def get_message_writer() -> MessageWriter:
+    """
+    Process-wide writer in front of SessionStore. Created on first use,
+    which replays any turns a previous run left unsaved.
+    """
+    global _shared_writer
+    with _shared_lock:
+        if _shared_writer is None:
+            from services.session_store import SessionStore
+
+            _shared_writer = MessageWriter(SessionStore, catalog=get_session_catalog())
+            atexit.register(_shared_writer.close, FLUSH_TIMEOUT_SECONDS)
+        return _shared_writer
@@ -0,0 +1,258 @@
+"""
+Pooled, long-lived OpenAI clients.
+
+Every OpenAI client owns its own httpx connection pool, so building one
+per call pays TCP/TLS setup on every request. ClientPool keeps one sync
+and one async client per API key (keyed by a hash, never the raw key)
+and lends them out; keep-alive connections are reused across calls.
+Clients are evicted by count and idle time, and an evicted client is
+only closed once the last caller holding it has released it.
+
+Each request is traced through httpx's `trace` extension and counted as
+having opened a new connection or reused a pooled one (see stats()), and
+is admitted by the shared rate limiter before it is sent.
+"""
+
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Optional
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+
+from config import (
+    OPENAI_CLIENT_POOL_SIZE,
+    OPENAI_CLIENT_IDLE_SECONDS,
+    OPENAI_MAX_CONNECTIONS,
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+    OPENAI_KEEPALIVE_EXPIRY,
+)
+from services.async_runtime import get_loop
+from services.rate_limiter import get_request_scheduler, request_cost, retry_after_seconds
+
+logger = logging.getLogger(__name__)
+
+# httpcore reports this once for every newly established TCP connection
+CONNECT_EVENT = "connection.connect_tcp.complete"
+
+
+def key_fingerprint(api_key: str) -> str:
+    # Never keep raw API keys around as dictionary keys
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+class _ConnectionTrace:
+    """
+    `trace` extension callback noting whether a request had to open a
+    new connection.
+    """
+
+    def __init__(self):
+        self.opened = False
+
+    def __call__(self, name: str, info: dict):
+        if name == CONNECT_EVENT:
+            self.opened = True
+
+
+class _AsyncConnectionTrace(_ConnectionTrace):
+    # httpcore awaits the callback on async transports
+    async def __call__(self, name: str, info: dict):
+        super().__call__(name, info)
+
+
+class _Entry:
+    __slots__ = ("client", "leases", "last_used", "retired")
+
+    def __init__(self, client):
+        self.client = client
+        self.leases = 0
+        self.last_used = time.monotonic()
+        self.retired = False
+
+
+class ClientPool:
+    """
+    Thread-safe LRU of OpenAI / AsyncOpenAI clients keyed by API key hash.
+    Async clients are bound to the shared async runtime loop and must
+    only be used from coroutines running on it.
+    """
+
+    def __init__(
+        self,
+        max_clients: int = OPENAI_CLIENT_POOL_SIZE,
+        idle_seconds: float = OPENAI_CLIENT_IDLE_SECONDS,
+    ):
+        self.max_clients = max_clients
+        self.idle_seconds = idle_seconds
+        self.clients_created = 0
+        self.connections_opened = 0
+        self.connections_reused = 0
+        self._entries: "OrderedDict[tuple, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def client(self, api_key: str):
+        """
+        Lends the pooled sync client for this API key.
+        """
+        entry = self._acquire(api_key, is_async=False)
+        try:
+            yield entry.client
+        finally:
+            self._release(entry)
+
+    @asynccontextmanager
+    async def aclient(self, api_key: str):
+        """
+        Lends the pooled async client for this API key.
+        """
+        entry = self._acquire(api_key, is_async=True)
+        try:
+            yield entry.client
+        finally:
+            self._release(entry)
+
+    def _acquire(self, api_key: str, is_async: bool) -> _Entry:
+        key = ("async" if is_async else "sync", key_fingerprint(api_key))
+        with self._lock:
+            self._evict_idle()
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _Entry(self._create(api_key, is_async))
+                self._entries[key] = entry
+                self.clients_created += 1
+            entry.leases += 1
+            entry.last_used = time.monotonic()
+            self._entries.move_to_end(key)
+            self._evict()
+            return entry
+
+    def _release(self, entry: _Entry):
+        with self._lock:
+            entry.leases -= 1
+            entry.last_used = time.monotonic()
+            if entry.retired and entry.leases == 0:
+                self._close(entry)
+
+    def _create(self, api_key: str, is_async: bool):
+        limits = httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+        )
+        fingerprint = key_fingerprint(api_key)
+        scheduler = get_request_scheduler()
+        if is_async:
+            async def on_request(request: httpx.Request):
+                request.extensions["trace"] = _AsyncConnectionTrace()
+                await scheduler.acquire(fingerprint, *request_cost(request))
+
+            async def on_response(response: httpx.Response):
+                self._record(response, fingerprint)
+
+            http_client = DefaultAsyncHttpxClient(
+                limits=limits,
+                event_hooks={"request": [on_request], "response": [on_response]},
+            )
+            return AsyncOpenAI(api_key=api_key, http_client=http_client)
+
+        def on_request(request: httpx.Request):
+            request.extensions["trace"] = _ConnectionTrace()
+            scheduler.acquire_sync(fingerprint, *request_cost(request))
+
+        def on_response(response: httpx.Response):
+            self._record(response, fingerprint)
+
+        http_client = DefaultHttpxClient(
+            limits=limits,
+            event_hooks={"request": [on_request], "response": [on_response]},
+        )
+        return OpenAI(api_key=api_key, http_client=http_client)
+
+    def _record(self, response: httpx.Response, fingerprint: str):
+        request = response.request
+        if response.status_code == 429:
+            # Hold back everyone on this key, not just the caller that hit it
+            get_request_scheduler().pause(fingerprint, request_cost(request)[0], retry_after_seconds(response.headers) or 1.0)
+
+        trace = request.extensions.get("trace")
+        opened = trace is not None and trace.opened
+        with self._lock:
+            if opened:
+                self.connections_opened += 1
+            else:
+                self.connections_reused += 1
+        logger.debug(
+            "%s %s: %s connection",
+            request.method, request.url.path, "opened" if opened else "reused",
+        )
+
+    def _evict_idle(self):
+        cutoff = time.monotonic() - self.idle_seconds
+        for key in [k for k, e in self._entries.items() if e.last_used < cutoff and e.leases == 0]:
+            self._retire(key)
+
+    def _evict(self):
+        while len(self._entries) > self.max_clients:
+            self._retire(next(iter(self._entries)))
+
+    def _retire(self, key: tuple):
+        # Clients still lent out are closed when their last lease ends
+        entry = self._entries.pop(key)
+        entry.retired = True
+        if entry.leases == 0:
+            self._close(entry)
+
+    @staticmethod
+    def _close(entry: _Entry):
+        if isinstance(entry.client, AsyncOpenAI):
+            asyncio.run_coroutine_threadsafe(entry.client.close(), get_loop())
+        else:
+            entry.client.close()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            requests = self.connections_opened + self.connections_reused
+            return {
+                "clients": len(self._entries),
+                "clients_created": self.clients_created,
+                "requests": requests,
+                "connections_opened": self.connections_opened,
+                "connections_reused": self.connections_reused,
+                "reuse_rate": self.connections_reused / requests if requests else 0.0,
+            }
+
+
+_shared_pool: Optional[ClientPool] = None
+_shared_lock = threading.Lock()
+
+
+def get_client_pool() -> ClientPool:
+    """
+    Process-wide shared client pool used by all services.
+    """
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is None:
+            _shared_pool = ClientPool()
+        return _shared_pool
+
+
+def openai_client(api_key: str):
+    """
+    `with openai_client(api_key) as client:` - the pooled sync client.
+    """
+    return get_client_pool().client(api_key)
+
+
+def async_openai_client(api_key: str):
+    """
+    `async with async_openai_client(api_key) as client:` - the pooled async client.
+    """
+    return get_client_pool().aclient(api_key)
@@ -1,36 +1,91 @@
-from openai import OpenAI
 from config import OPENAI_MODEL
-from services.vector_store import VectorStore
+from services.index_registry import aretrieve_context
+from services.context_builder import log_context_usage
+from services.async_runtime import run_sync
+from services.openai_clients import openai_client, async_openai_client
+from services.completion_cache import CompletionCache, acached_completion, get_completion_cache
 from services.session_store import SessionStore
-from services.mcp_bridges import chat_with_session_context
+from services.mcp_bridges import achat_with_session_context, stream_chat_with_session_context
 
 
-def get_answer(code_content: str, question: str, api_key: str, session_id: str = None):
+def get_answer(code_content: str, question: str, api_key: str, session_id: str = None, use_cache: bool = True, filename: str = None):
     """
     Get answer with session logging + MCP context.
-    Falls back to original simple mode if no session_id.
+    Falls back to original simple mode if no session_id; only that mode
+    is answered from the completion cache (session chat depends on live
+    session history). Sync wrapper around aget_answer.
     """
+    return run_sync(aget_answer(code_content, question, api_key, session_id, use_cache, filename))
+
+
+async def aget_answer(code_content: str, question: str, api_key: str, session_id: str = None, use_cache: bool = True, filename: str = None):
     if session_id:
-        return chat_with_session_context(
+        return await achat_with_session_context(
             code_content=code_content,
             question=question,
             session_id=session_id,
             api_key=api_key,
             model=OPENAI_MODEL,
+            filename=filename,
         )
     else:
         # Original mode (backward compatible)
-        client = OpenAI(api_key=api_key)
-        vs = VectorStore(api_key)
-        vs.build(code_content)
-        context = vs.retrieve(question)
+        result = await aretrieve_context(api_key, code_content, question, filename=filename)
+        log_context_usage("chat", result)
+        context = result.text
+
+        async with async_openai_client(api_key) as client:
+            return await acached_completion(client, _messages(context, question), use_cache)
+
+
+def stream_answer(code_content: str, question: str, api_key: str, session_id: str = None, use_cache: bool = True, filename: str = None):
+    """
+    Streaming variant of get_answer: yields answer tokens as they arrive.
+    With a session_id the turn is logged after the stream completes;
+    without one, answers go through the completion cache.
+    """
+    if session_id:
+        yield from stream_chat_with_session_context(
+            code_content=code_content,
+            question=question,
+            session_id=session_id,
+            api_key=api_key,
+            model=OPENAI_MODEL,
+            filename=filename,
+        )
+        return
 
-        response = client.chat.completions.create(
+    result = run_sync(aretrieve_context(api_key, code_content, question, filename=filename))
+    log_context_usage("chat", result)
+    messages = _messages(result.text, question)
+
+    # A cached answer is yielded whole; a fresh one is cached once complete
+    cache = get_completion_cache()
+    key = CompletionCache.make_key(OPENAI_MODEL, messages)
+    if not use_cache:
+        cache.record_bypass()
+    elif (cached := cache.get(key)) is not None:
+        yield cached
+        return
+
+    parts = []
+    with openai_client(api_key) as client:
+        stream = client.chat.completions.create(
             model=OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": "You are a code analysis assistant."},
-                {"role": "user", "content": f"CONTEXT:\n{context}\n\nQUESTION:\n{question}"},
-            ],
+            messages=messages,
             temperature=0,
+            stream=True,
         )
-        return response.choices[0].message.content
\ No newline at end of file
+        for event in stream:
+            if event.choices and event.choices[0].delta.content:
+                parts.append(event.choices[0].delta.content)
+                yield event.choices[0].delta.content
+    if parts:
+        cache.put(key, "".join(parts))
+
+
+def _messages(context: str, question: str) -> list:
+    return [
+        {"role": "system", "content": "You are a code analysis assistant."},
+        {"role": "user", "content": f"CONTEXT:\n{context}\n\nQUESTION:\n{question}"},
+    ]
\ No newline at end of file
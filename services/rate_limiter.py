@@ -0,0 +1,283 @@
+"""
+Process-wide request scheduler for OpenAI calls.
+
+Every pooled client (see openai_clients) admits its requests here before
+sending them. Each API key gets a requests-per-minute and a
+tokens-per-minute bucket per endpoint kind (chat, embeddings), sized by
+RATE_LIMITS, so many sessions sharing the default key queue instead of
+all tripping 429s together. Queued requests are granted in priority
+order: interactive work first, bulk documentation and diagram jobs last
+(see request_priority). A 429 from the server pauses that key's buckets
+for its Retry-After.
+"""
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+from config import RATE_LIMITS, RATE_LIMIT_BURST_SECONDS, RATE_LIMIT_COMPLETION_TOKENS
+from services.tokens import CHARS_PER_TOKEN
+
+INTERACTIVE = 0  # chat answers a user is waiting on
+BULK = 1         # documentation, diagrams
+
+_priority = contextvars.ContextVar("openai_request_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def request_priority(priority: int):
+    """
+    `with request_priority(BULK):` - OpenAI requests made inside the block
+    (including tasks it starts) yield to interactive ones.
+    """
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def retry_after_seconds(headers) -> Optional[float]:
+    """
+    Seconds the server asked us to wait (retry-after-ms / retry-after),
+    if it said.
+    """
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        pass  # HTTP-date form
+    return None
+
+
+def request_cost(request: httpx.Request) -> Tuple[str, int]:
+    """
+    (kind, estimated tokens) for an outgoing API request. The JSON body
+    stands in for the prompt; chat calls also reserve room for the answer.
+    """
+    if request.url.path.endswith("/embeddings"):
+        return "embeddings", len(request.content) // CHARS_PER_TOKEN
+    return "chat", len(request.content) // CHARS_PER_TOKEN + RATE_LIMIT_COMPLETION_TOKENS
+
+
+class TokenBucket:
+    """
+    Refills at per_minute / 60 per second, holding at most burst_seconds
+    worth. Requests larger than the bucket are charged its full size.
+    """
+
+    def __init__(self, per_minute: float, burst_seconds: float = RATE_LIMIT_BURST_SECONDS):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def delay(self, amount: float, now: float) -> float:
+        """
+        Seconds until `amount` can be taken (0 = now).
+        """
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        if now < self.paused_until:
+            return self.paused_until - now
+        return max(0.0, (min(amount, self.capacity) - self.level) / self.rate)
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "cost", "enqueued", "grant", "cancelled")
+
+    def __init__(self, priority: int, seq: int, cost: int, grant):
+        self.priority = priority
+        self.seq = seq
+        self.cost = cost
+        self.enqueued = time.monotonic()
+        self.grant = grant
+        self.cancelled = False
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class _Limiter:
+    """
+    Buckets and wait queue for one (API key, kind).
+    """
+
+    def __init__(self, limits: Dict, burst_seconds: float):
+        self.requests = TokenBucket(limits["rpm"], burst_seconds)
+        self.tokens = TokenBucket(limits["tpm"], burst_seconds)
+        self.waiters = []
+
+    def delay(self, cost: int, now: float) -> float:
+        return max(self.requests.delay(1, now), self.tokens.delay(cost, now))
+
+    def take(self, cost: int):
+        self.requests.take(1)
+        self.tokens.take(cost)
+
+
+class RequestScheduler:
+    """
+    Token-bucket admission for OpenAI requests, shared by sync and async
+    callers. Requests that fit go straight through; the rest wait in a
+    priority queue served by one dispatcher thread.
+    """
+
+    def __init__(self, limits: Dict = RATE_LIMITS, burst_seconds: float = RATE_LIMIT_BURST_SECONDS):
+        self.limits = limits
+        self.burst_seconds = burst_seconds
+        self.granted = 0
+        self.delayed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.pauses = 0
+        self._limiters: Dict[tuple, _Limiter] = {}
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._thread = None
+
+    async def acquire(self, fingerprint: str, kind: str, cost: int):
+        """
+        Waits (without blocking the loop) until the request may be sent.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiter = self._enqueue(fingerprint, kind, cost, lambda: loop.call_soon_threadsafe(_resolve, future))
+        if waiter is None:
+            return
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._cond:
+                waiter.cancelled = True
+            raise
+
+    def acquire_sync(self, fingerprint: str, kind: str, cost: int):
+        """
+        Blocks the calling thread until the request may be sent.
+        """
+        event = threading.Event()
+        if self._enqueue(fingerprint, kind, cost, event.set) is not None:
+            event.wait()
+
+    def pause(self, fingerprint: str, kind: str, seconds: float):
+        """
+        Holds back every request for this key and kind for `seconds`.
+        """
+        with self._cond:
+            limiter = self._limiter(fingerprint, kind)
+            until = time.monotonic() + seconds
+            for bucket in (limiter.requests, limiter.tokens):
+                bucket.paused_until = max(bucket.paused_until, until)
+            self.pauses += 1
+
+    def _enqueue(self, fingerprint: str, kind: str, cost: int, grant) -> Optional[_Waiter]:
+        """
+        Admits the request at once if nothing is queued ahead of it and
+        the buckets allow (returns None), otherwise queues it.
+        """
+        with self._cond:
+            limiter = self._limiter(fingerprint, kind)
+            if not limiter.waiters and limiter.delay(cost, time.monotonic()) == 0:
+                limiter.take(cost)
+                self.granted += 1
+                return None
+
+            waiter = _Waiter(_priority.get(), next(self._seq), cost, grant)
+            heapq.heappush(limiter.waiters, waiter)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="openai-scheduler", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+            return waiter
+
+    def _limiter(self, fingerprint: str, kind: str) -> _Limiter:
+        key = (fingerprint, kind)
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            limiter = self._limiters[key] = _Limiter(self.limits[kind], self.burst_seconds)
+        return limiter
+
+    def _run(self):
+        with self._cond:
+            while True:
+                self._cond.wait(timeout=self._dispatch())
+
+    def _dispatch(self) -> Optional[float]:
+        """
+        Grants every queued request that fits now, best priority first.
+        Returns the seconds until the next one could fit (None = idle).
+        Caller must hold the lock.
+        """
+        now = time.monotonic()
+        next_delay = None
+        for limiter in self._limiters.values():
+            while limiter.waiters:
+                waiter = limiter.waiters[0]
+                if waiter.cancelled:
+                    heapq.heappop(limiter.waiters)
+                    continue
+                delay = limiter.delay(waiter.cost, now)
+                if delay > 0:
+                    next_delay = delay if next_delay is None else min(next_delay, delay)
+                    break
+                heapq.heappop(limiter.waiters)
+                limiter.take(waiter.cost)
+                waited = now - waiter.enqueued
+                self.granted += 1
+                self.delayed += 1
+                self.total_wait += waited
+                self.max_wait = max(self.max_wait, waited)
+                waiter.grant()
+        return next_delay
+
+    def stats(self) -> Dict:
+        with self._cond:
+            queued = {INTERACTIVE: 0, BULK: 0}
+            for limiter in self._limiters.values():
+                for waiter in limiter.waiters:
+                    if not waiter.cancelled:
+                        queued[waiter.priority] = queued.get(waiter.priority, 0) + 1
+            return {
+                "queued": sum(queued.values()),
+                "queued_interactive": queued[INTERACTIVE],
+                "queued_bulk": queued[BULK],
+                "requests": self.granted,
+                "delayed": self.delayed,
+                "mean_wait_ms": 1000 * self.total_wait / self.delayed if self.delayed else 0.0,
+                "max_wait_ms": 1000 * self.max_wait,
+                "pauses": self.pauses,
+            }
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+_shared_scheduler: Optional[RequestScheduler] = None
+_shared_lock = threading.Lock()
+
+
+def get_request_scheduler() -> RequestScheduler:
+    """
+    Process-wide shared scheduler used by every pooled client.
+    """
+    global _shared_scheduler
+    with _shared_lock:
+        if _shared_scheduler is None:
+            _shared_scheduler = RequestScheduler()
+        return _shared_scheduler
@@ -0,0 +1,208 @@
+"""
+SQLite catalogue of chat sessions.
+
+One row per session holding its message count, creation and last-active
+times and uploaded filename, kept current as messages are saved and
+sessions are deleted. Listing sessions and computing totals read this
+table instead of pulling every document and metadata row out of the
+Chroma session_logs collection, so the sidebar's cost follows the number
+of sessions shown rather than the total history size.
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import SESSION_CATALOG_PATH
+
+
+class SessionCatalog:
+    """
+    Per-session counters in SQLite, next to the Chroma store.
+    Safe to share between Streamlit script threads.
+    """
+
+    def __init__(self, path: str = SESSION_CATALOG_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                created TEXT NOT NULL,
+                last_active TEXT NOT NULL,
+                message_count INTEGER NOT NULL DEFAULT 0,
+                filename TEXT
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_sessions_last_active ON sessions(last_active)"
+        )
+        self._conn.commit()
+
+    def record_messages(self, session_id: str, count: int = 1, timestamp: Optional[str] = None):
+        """
+        Counts `count` new chat messages for the session and bumps its
+        last-active time. Creates the row on first use; count=0 just
+        registers (or touches) the session.
+        """
+        timestamp = timestamp or datetime.now().isoformat()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO sessions (session_id, created, last_active, message_count)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(session_id) DO UPDATE SET
+                    last_active = MAX(last_active, excluded.last_active),
+                    message_count = message_count + excluded.message_count
+                """,
+                (session_id, timestamp, timestamp, count),
+            )
+            self._conn.commit()
+
+    def set_filename(self, session_id: str, filename: str):
+        """
+        Records the session's uploaded filename (the system_filename entry).
+        """
+        timestamp = datetime.now().isoformat()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO sessions (session_id, created, last_active, filename)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(session_id) DO UPDATE SET filename = excluded.filename
+                """,
+                (session_id, timestamp, timestamp, filename),
+            )
+            self._conn.commit()
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            deleted = self._conn.execute(
+                "DELETE FROM sessions WHERE session_id = ?", (session_id,)
+            ).rowcount
+            self._conn.commit()
+        return deleted > 0
+
+    def list_sessions(self, limit: Optional[int] = None, offset: int = 0) -> List[Dict]:
+        """
+        Sessions with at least one message, most recently active first.
+        Pass limit/offset to page through them.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT session_id, created, last_active, message_count, filename
+                FROM sessions WHERE message_count > 0
+                ORDER BY last_active DESC LIMIT ? OFFSET ?
+                """,
+                (-1 if limit is None else limit, offset),
+            ).fetchall()
+        return [
+            {
+                "session_id": session_id,
+                "created": created,
+                "last_active": last_active,
+                "message_count": message_count,
+                "filename": filename,
+            }
+            for session_id, created, last_active, message_count, filename in rows
+        ]
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            sessions, messages = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(message_count), 0) FROM sessions WHERE message_count > 0"
+            ).fetchone()
+        return {"total_sessions": sessions, "total_messages": messages}
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM sessions LIMIT 1").fetchone() is None
+
+    def rebuild(self, messages: Iterable[Tuple[str, str, str]], filenames: Dict[str, str] = None):
+        """
+        Replaces the catalogue from existing (session_id, role, timestamp)
+        records, e.g. one pass over the Chroma metadata when the catalogue
+        is first created for an existing store.
+        """
+        sessions = {}
+        for session_id, role, timestamp in messages:
+            row = sessions.setdefault(session_id, [timestamp, timestamp, 0])
+            row[0] = min(row[0], timestamp)
+            row[1] = max(row[1], timestamp)
+            if role in ("user", "assistant"):
+                row[2] += 1
+
+        filenames = filenames or {}
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions")
+            self._conn.executemany(
+                "INSERT INTO sessions (session_id, created, last_active, message_count, filename) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (session_id, created, last_active, count, filenames.get(session_id))
+                    for session_id, (created, last_active, count) in sessions.items()
+                ],
+            )
+            self._conn.commit()
+
+    def import_sessions(self, sessions: Iterable[Dict]):
+        """
+        Adds rows shaped like list_sessions() output (e.g. a one-off
+        SessionStore.list_sessions() when the catalogue is new), keeping
+        any counts already recorded.
+        """
+        with self._lock:
+            self._conn.executemany(
+                """
+                INSERT INTO sessions (session_id, created, last_active, message_count, filename)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(session_id) DO NOTHING
+                """,
+                [
+                    (
+                        session["session_id"],
+                        session.get("created") or session["last_active"],
+                        session["last_active"],
+                        session.get("message_count", 0),
+                        session.get("filename"),
+                    )
+                    for session in sessions
+                ],
+            )
+            self._conn.commit()
+
+    def seed_from(self, store):
+        """
+        Imports store.list_sessions() if the catalogue is empty: the first
+        run against an existing SessionStore pays one full listing, later
+        ones none.
+        """
+        if self.is_empty():
+            self.import_sessions(store.list_sessions())
+
+
+_shared_catalog = None
+_shared_lock = threading.Lock()
+
+
+def get_session_catalog() -> SessionCatalog:
+    """
+    Process-wide shared catalogue instance.
+    """
+    global _shared_catalog
+    with _shared_lock:
+        if _shared_catalog is None:
+            _shared_catalog = SessionCatalog()
+        return _shared_catalog
@@ -0,0 +1,163 @@
+"""
+Embedding functions for the session_logs search collection.
+
+Left to itself, Chroma gives every collection handle its own default
+embedding function, which loads an ONNX model on first use, so each
+SessionStore (and the MCP server) paid that load separately. Three
+backends are available:
+
+- "local":   the same all-MiniLM-L6-v2 ONNX model as Chroma's default,
+             loaded on the first message or search and shared by every
+             store in the process. Vectors match the existing collection.
+- "openai":  text-embedding-3-small through the code RAG path, so
+             messages share the persistent embedding cache, batching and
+             retries used for code chunks.
+- "hashing": a signed feature-hashing vectorizer over identifier-aware
+             tokens. No model, no network, microseconds per message;
+             matches shared words and identifiers rather than meaning.
+
+Each backend writes to its own collection (see session_collection_name)
+because vectors from different backends are not comparable. The caller
+that creates the collection picks the backend; there is deliberately no
+config setting until SessionStore does so.
+"""
+
+import threading
+import zlib
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import EMBEDDING_MODEL, SESSION_HASHING_DIMENSIONS
+from services.async_runtime import run_sync
+from services.lexical_index import tokenize
+
+BACKENDS = ("local", "openai", "hashing")
+COLLECTION_NAME = "session_logs"
+
+
+def session_collection_name(backend: str) -> str:
+    """
+    Chroma collection for a backend. "local" keeps the original name, as
+    its vectors are the ones Chroma's default function produced.
+    """
+    return COLLECTION_NAME if backend == "local" else f"{COLLECTION_NAME}_{backend}"
+
+
+class HashingEmbeddingFunction:
+    """
+    Stateless feature hashing: each token (and each pair of adjacent
+    tokens) is hashed with crc32, which is stable across processes, to
+    a signed bucket. Term counts are damped with 1 + log(tf) and rows are
+    L2-normalized, so Chroma's distances behave like cosine.
+    """
+
+    def __init__(self, dimensions: int = SESSION_HASHING_DIMENSIONS):
+        self.dimensions = dimensions
+
+    @staticmethod
+    def name() -> str:
+        return "aureliascript-hashing"
+
+    def __call__(self, input: List[str]) -> List[np.ndarray]:
+        return list(self.embed(input))
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+            if not features:
+                continue
+            hashes, counts = np.unique(
+                np.fromiter((zlib.crc32(f.encode("utf-8")) for f in features), dtype=np.uint32, count=len(features)),
+                return_counts=True,
+            )
+            # Low bits pick the bucket, the top bit the sign
+            signs = np.where(hashes >> 31, -1.0, 1.0)
+            np.add.at(matrix[row], hashes % self.dimensions, signs * (1.0 + np.log(counts)))
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+
+_local_models: Dict[str, object] = {}
+_local_lock = threading.Lock()
+
+
+class LocalModelEmbeddingFunction:
+    """
+    Chroma's bundled all-MiniLM-L6-v2 ONNX model, created on the first
+    call and shared process-wide, so constructing stores stays free and
+    the model is loaded at most once.
+    """
+
+    @staticmethod
+    def name() -> str:
+        return "aureliascript-local"
+
+    def __call__(self, input: List[str]) -> List[np.ndarray]:
+        return list(np.asarray(self.model()(input), dtype=np.float32))
+
+    @staticmethod
+    def model():
+        with _local_lock:
+            if "onnx" not in _local_models:
+                from chromadb.utils.embedding_functions import ONNXMiniLM_L6_V2
+
+                _local_models["onnx"] = ONNXMiniLM_L6_V2()
+            return _local_models["onnx"]
+
+
+class OpenAIEmbeddingFunction:
+    """
+    EMBEDDING_MODEL vectors resolved through the persistent embedding
+    cache, embedding only the misses. Raises if any message could not be
+    embedded, so the write is retried rather than stored with a fake
+    vector.
+    """
+
+    def __init__(self, api_key: str):
+        # Imported here: vector_store pulls in the whole RAG stack
+        from services.vector_store import VectorStore
+
+        self._embedder = VectorStore(api_key)
+
+    @staticmethod
+    def name() -> str:
+        return "aureliascript-openai"
+
+    def __call__(self, input: List[str]) -> List[np.ndarray]:
+        embeddings = run_sync(self._embedder._aembed_with_cache(list(input)))
+        failed = sum(embedding is None for embedding in embeddings)
+        if failed:
+            raise RuntimeError(f"{failed} of {len(embeddings)} messages could not be embedded with {EMBEDDING_MODEL}")
+        return [np.asarray(embedding, dtype=np.float32) for embedding in embeddings]
+
+
+_shared_functions: Dict[tuple, object] = {}
+_shared_lock = threading.Lock()
+
+
+def get_session_embedding_function(backend: str, api_key: Optional[str] = None):
+    """
+    Process-wide embedding function for the session_logs collection,
+    e.g. get_or_create_collection(session_collection_name(backend),
+    embedding_function=get_session_embedding_function(backend, api_key)).
+    "openai" needs the user's API key and is shared per key.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"session embedding backend must be one of {BACKENDS}, not {backend!r}")
+    if backend == "openai" and not api_key:
+        raise ValueError("the openai session embedding backend needs an API key")
+    key = (backend, api_key if backend == "openai" else None)
+    with _shared_lock:
+        if key not in _shared_functions:
+            if backend == "local":
+                _shared_functions[key] = LocalModelEmbeddingFunction()
+            elif backend == "openai":
+                _shared_functions[key] = OpenAIEmbeddingFunction(api_key)
+            else:
+                _shared_functions[key] = HashingEmbeddingFunction()
+        return _shared_functions[key]
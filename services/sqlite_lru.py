@@ -0,0 +1,158 @@
+"""
+Shared storage for the SQLite-backed LRU caches.
+
+EmbeddingCache and CompletionCache keep values in one SQLite table each,
+keyed by a content hash, with every row's byte size and last access time
+so the cache can be trimmed least-recently-used once it outgrows its
+budget. SQLiteLRUCache owns that table, the running byte total and the
+eviction; subclasses derive keys and encode and decode values.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Tuple
+
+# Stay well under SQLite's bound-parameter limit
+_BATCH = 500
+
+
+class SQLiteLRUCache:
+    """
+    A `table` of key, value (`value_column`, declared `value_type`), size,
+    any `extra_columns` ((name, declaration) pairs) and last_access.
+    Methods starting with an underscore expect the caller to hold
+    self._lock and to commit. Safe to share between Streamlit script
+    threads.
+    """
+
+    table = ""
+    value_column = "value"
+    value_type = "BLOB"
+    extra_columns: Tuple[Tuple[str, str], ...] = ()
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        columns = [
+            "key TEXT PRIMARY KEY",
+            f"{self.value_column} {self.value_type} NOT NULL",
+            "size INTEGER NOT NULL",
+            *(f"{name} {declaration}" for name, declaration in self.extra_columns),
+            "last_access REAL NOT NULL",
+        ]
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(f"CREATE TABLE IF NOT EXISTS {self.table} ({', '.join(columns)})")
+        self._conn.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{self.table}_last_access ON {self.table}(last_access)"
+        )
+        self._conn.commit()
+        self._total_bytes = self._stored_bytes()
+
+    def _select(self, keys: List[str], columns: Iterable[str]) -> Dict[str, tuple]:
+        """
+        {key: (column values...)} for the keys present.
+        """
+        selected = ", ".join(columns)
+        found = {}
+        for start in range(0, len(keys), _BATCH):
+            batch = keys[start:start + _BATCH]
+            placeholders = ",".join("?" * len(batch))
+            for row in self._conn.execute(
+                f"SELECT key, {selected} FROM {self.table} WHERE key IN ({placeholders})", batch
+            ):
+                found[row[0]] = row[1:]
+        return found
+
+    def _touch(self, keys: Iterable[str]):
+        now = time.time()
+        self._conn.executemany(
+            f"UPDATE {self.table} SET last_access = ? WHERE key = ?", [(now, key) for key in keys]
+        )
+
+    def _insert(self, rows: List[tuple]):
+        """
+        Stores (key, value, size, *extra column values) rows, replacing
+        existing keys, then evicts if the cache has outgrown max_bytes.
+        """
+        now = time.time()
+        names = ["key", self.value_column, "size", *(name for name, _ in self.extra_columns), "last_access"]
+        insert = (
+            f"INSERT OR REPLACE INTO {self.table} ({', '.join(names)}) "
+            f"VALUES ({', '.join('?' * len(names))})"
+        )
+        for start in range(0, len(rows), _BATCH):
+            batch = rows[start:start + _BATCH]
+            placeholders = ",".join("?" * len(batch))
+            replaced = self._conn.execute(
+                f"SELECT COALESCE(SUM(size), 0) FROM {self.table} WHERE key IN ({placeholders})",
+                [row[0] for row in batch],
+            ).fetchone()[0]
+            self._conn.executemany(insert, [(*row, now) for row in batch])
+            self._total_bytes += sum(row[2] for row in batch) - replaced
+        self._evict()
+
+    def _delete(self, key: str):
+        row = self._conn.execute(f"SELECT size FROM {self.table} WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self._total_bytes -= row[0]
+
+    def _expire(self):
+        """
+        Hook run before LRU eviction, e.g. to drop expired rows first.
+        """
+
+    def _evict(self):
+        """
+        Drops least-recently-used entries until the cache is 90% of its
+        byte budget.
+        """
+        if self._total_bytes <= self.max_bytes:
+            return
+
+        self._expire()
+        target = int(self.max_bytes * 0.9)
+        while self._total_bytes > target:
+            rows = self._conn.execute(
+                f"SELECT key, size FROM {self.table} ORDER BY last_access LIMIT 256"
+            ).fetchall()
+            if not rows:
+                self._total_bytes = 0
+                break
+            freed_keys = []
+            for key, size in rows:
+                freed_keys.append((key,))
+                self._total_bytes -= size
+                if self._total_bytes <= target:
+                    break
+            self._conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", freed_keys)
+
+    def _stored_bytes(self) -> int:
+        return self._conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+
+    def stats(self) -> Dict:
+        """
+        Hit/miss counters for this process plus current cache size.
+        """
+        with self._lock:
+            entries = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "entries": entries,
+                "bytes": self._total_bytes,
+            }
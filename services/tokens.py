@@ -0,0 +1,28 @@
+"""
+Lightweight token estimation for prompt and embedding budgets.
+
+OpenAI tokenizers average roughly 4 characters per token on prose and
+closer to 3 on source code, so the conservative code ratio is used to
+stay under hard API limits without pulling in a tokenizer dependency.
+"""
+
+import math
+
+CHARS_PER_TOKEN = 3
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Returns a conservative token estimate for the given text.
+    """
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Truncates text so that its estimated token count fits max_tokens.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    return text if len(text) <= max_chars else text[:max_chars]
@@ -1,106 +1,434 @@
-from openai import OpenAI
+import asyncio
+from collections import deque
+from typing import Iterable, Tuple
+import numpy as np
+from config import (
+    CONTEXT_CANDIDATES,
+    VECTOR_INDEX_BACKEND,
+    EMBEDDING_MODEL,
+    EMBEDDING_DIMENSIONS,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_BATCH_MAX_TOKENS,
+    EMBEDDING_MAX_INPUT_TOKENS,
+    EMBEDDING_CONCURRENCY,
+    REINDEX_COMPACT_RATIO,
+    HYBRID_SEARCH,
+    RRF_CANDIDATE_FACTOR,
+)
+from services.tokens import estimate_tokens, truncate_to_tokens
+from services.embedding_cache import EmbeddingCache, get_embedding_cache
+from services.ann_index import ExactIndex, build_index
+from services.lexical_index import BM25Index, fuse_rankings
+from services.chunker import chunk_code, chunk_file, split_files, file_stats as chunk_file_stats
+from services.context_builder import ContextResult, build_context, context_budget
+from services.async_runtime import run_sync
+from services.openai_clients import async_openai_client
+from services.embedding_client import aembed_batch, get_embedding_metrics
+
+
+async def aembed_query(api_key: str, text: str) -> np.ndarray:
+    """
+    Embeds a query and returns it L2-normalized. Independent of any
+    index, so it can run concurrently with the index build.
+    """
+    async with async_openai_client(api_key) as client:
+        [embedding] = await aembed_batch(client.with_options(max_retries=0), [text], max_retries=1)
+    # A zero vector (embedding failed) makes search_hybrid fall back to BM25
+    return VectorStore._to_matrix([embedding])[0]
 
 
 class VectorStore:
     """
     Simple vector store for RAG (Retrieval-Augmented Generation).
     Uses OpenAI embeddings to store and retrieve relevant code chunks.
+    Chunk embeddings are looked up in the persistent embedding cache
+    first, so only new or changed chunks hit the API. Chunks whose
+    embedding failed are flagged in `failed` (never stored as fake
+    vectors) and left out of vector search until aretry_failed succeeds.
+
+    Embeddings are held as one contiguous, L2-normalized float32 matrix
+    (one row per chunk), so cosine scoring is a single mat-vec product.
+    Large indexes can use an approximate backend (see ann_index). A BM25
+    index over the same chunks catches exact identifiers and answers on
+    its own when the query cannot be embedded (see lexical_index).
+
+    The async methods (abuild, asearch, aretrieve_context) are the
+    implementation; the sync methods are wrappers kept for existing
+    callers and run on the shared async runtime.
     """
 
-    def __init__(self, api_key: str):
-        self.client = OpenAI(api_key=api_key)
+    def __init__(self, api_key: str, use_cache: bool = True, index_backend: str = VECTOR_INDEX_BACKEND):
+        self.api_key = api_key
+        self.cache = get_embedding_cache() if use_cache else None
+        self.index_backend = index_backend
         self.chunks = []
-        self.embeddings = []
+        self.file_stats = []
+        self.matrix = np.zeros((0, EMBEDDING_DIMENSIONS), dtype=np.float32)
+        self.index = ExactIndex(self.matrix)
+        self.lexical = BM25Index([])
+        # Per-row content hash and liveness; removed chunks are tombstoned
+        # (live=False) by areindex until the next compaction
+        self.chunk_keys = []
+        self.live = np.zeros(0, dtype=bool)
+        self.failed = np.zeros(0, dtype=bool)
+        self.reindex_stats = None
+
+    # ── Sync wrappers ──────────────────────────────────────────
 
-    def build(self, code_content: str):
+    def build(self, code_content: str, filename: str = None):
         """
         Splits code into chunks and generates embeddings for each chunk.
+        Per-file chunk and token counts are kept in self.file_stats.
         """
-        # Split code into logical chunks (functions, classes, etc.)
-        self.chunks = self._split_code(code_content)
-
-        # Generate embeddings for each chunk
-        for chunk in self.chunks:
-            embedding = self._get_embedding(chunk)
-            self.embeddings.append(embedding)
+        run_sync(self.abuild(code_content, filename))
 
     def retrieve(self, query: str, top_k: int = 3) -> str:
         """
         Retrieves the most relevant chunks based on the query.
         Returns concatenated context from top-k chunks.
         """
-        if not self.chunks:
-            return ""
+        results = self.search(query, top_k)
+
+        # Concatenate relevant chunks
+        context = "\n\n".join([self.chunks[idx].text for _, idx in results])
+        return context
 
-        # Get query embedding
-        query_embedding = self._get_embedding(query)
+    def retrieve_context(self, query: str, budget_tokens: int = None, candidates: int = CONTEXT_CANDIDATES) -> ContextResult:
+        """
+        Retrieves the best chunks for the query and packs them into a
+        prompt context of at most budget_tokens (default: the budget for
+        OPENAI_MODEL), deduplicating overlaps and truncating cleanly.
+        """
+        return run_sync(self.aretrieve_context(query, budget_tokens, candidates))
 
-        # Calculate similarity scores
-        similarities = []
-        for i, chunk_embedding in enumerate(self.embeddings):
-            similarity = self._cosine_similarity(query_embedding, chunk_embedding)
-            similarities.append((similarity, i))
+    def search(self, query: str, top_k: int = 3) -> list:
+        """
+        Returns [(score, chunk_index), ...] for the top-k chunks, best
+        first, fusing cosine similarity with BM25 (see search_hybrid).
+        """
+        return run_sync(self.asearch(query, top_k))
 
-        # Sort by similarity and get top-k
-        similarities.sort(reverse=True)
-        top_indices = [idx for _, idx in similarities[:top_k]]
+    def reindex(self, code_content: str, filename: str = None) -> "VectorStore":
+        """
+        Returns a new VectorStore for an edited version of the code that
+        reuses this store's vectors for unchanged chunks.
+        """
+        return run_sync(self.areindex(code_content, filename))
 
-        # Concatenate relevant chunks
-        context = "\n\n".join([self.chunks[idx] for idx in top_indices])
-        return context
+    # ── Async implementation ───────────────────────────────────
 
-    def _split_code(self, code_content: str) -> list:
+    async def abuild(self, code_content: str, filename: str = None):
+        await self.abuild_files(split_files(code_content, filename or "source"))
+
+    async def abuild_files(self, files: Iterable[Tuple[str, str]]):
+        """
+        Streaming build from (path, text) pairs, e.g. straight from
+        ingest.iter_zip_files. Each file is chunked as it arrives and
+        embedding batches are dispatched while later files are still
+        being read; at most EMBEDDING_CONCURRENCY batches are in flight.
+        """
+        chunks, file_stats = [], []
+        embeddings, pending, in_flight = [], [], deque()
+
+        async def drain(limit: int):
+            while len(in_flight) > limit:
+                embeddings.extend(await in_flight.popleft())
+
+        def dispatch(texts: list):
+            # Reuse cached embeddings; embed the misses
+            in_flight.append(asyncio.ensure_future(self._aembed_with_cache(texts)))
+
+        try:
+            # Reading (possibly from an archive) and chunking are blocking; keep them off the loop
+            iterator = iter(files)
+            while (item := await asyncio.to_thread(next, iterator, None)) is not None:
+                path, text = item
+                file_chunks = await asyncio.to_thread(chunk_file, path, text)
+                chunks.extend(file_chunks)
+                file_stats.append(chunk_file_stats(path, file_chunks))
+
+                pending.extend(chunk.text for chunk in file_chunks)
+                while len(pending) >= EMBEDDING_BATCH_SIZE:
+                    dispatch(pending[:EMBEDDING_BATCH_SIZE])
+                    del pending[:EMBEDDING_BATCH_SIZE]
+                    await drain(EMBEDDING_CONCURRENCY)
+            if pending:
+                dispatch(pending)
+            await drain(0)
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+        self.chunks, self.file_stats = chunks, file_stats
+        self.matrix = self._to_matrix(embeddings)
+        self.failed = np.array([embedding is None for embedding in embeddings], dtype=bool)
+        self.chunk_keys = [EmbeddingCache.make_key(chunk.text, EMBEDDING_MODEL) for chunk in self.chunks]
+        self.live = np.ones(len(self.chunks), dtype=bool)
+        await self.abuild_indexes()
+
+    async def areindex(self, code_content: str, filename: str = None) -> "VectorStore":
         """
-        Splits code into chunks based on function/class definitions.
-        Falls back to paragraph-based splitting if no definitions found.
+        Diffs the new chunk set against this store by content hash.
+        Unchanged chunks keep their rows and vectors (with refreshed line
+        numbers), added or changed chunks are embedded and appended, and
+        rows whose chunk disappeared are tombstoned. Tombstones are
+        compacted away once they exceed REINDEX_COMPACT_RATIO of the rows.
+
+        This store is left untouched, so concurrent readers stay
+        consistent; counts are in the new store's reindex_stats.
         """
-        # Try to split by class/function definitions
-        chunks = []
-        lines = code_content.split("\n")
-        current_chunk = []
+        chunks, file_stats = await asyncio.to_thread(chunk_code, code_content, filename)
+        keys = [EmbeddingCache.make_key(chunk.text, EMBEDDING_MODEL) for chunk in chunks]
+
+        # Live rows per content hash, matched to new chunks in order
+        live_rows = {}
+        for row, key in enumerate(self.chunk_keys):
+            if self.live[row]:
+                live_rows.setdefault(key, []).append(row)
 
-        for line in lines:
-            if (line.strip().startswith("class ") or line.strip().startswith("def ")) and current_chunk:
-                chunks.append("\n".join(current_chunk))
-                current_chunk = [line]
+        new_chunks = list(self.chunks)
+        appended = []
+        for chunk, key in zip(chunks, keys):
+            rows = live_rows.get(key)
+            if rows:
+                new_chunks[rows.pop(0)] = chunk
             else:
-                current_chunk.append(line)
+                appended.append((chunk, key))
+        removed = [row for rows in live_rows.values() for row in rows]
+
+        # Vectors for appended chunks: any existing, successfully embedded
+        # row with the same text (even a tombstoned one), otherwise a fresh
+        # embedding
+        known = {key: row for row, key in enumerate(self.chunk_keys) if not self.failed[row]}
+        to_embed = {}
+        for chunk, key in appended:
+            if key not in known and key not in to_embed:
+                to_embed[key] = chunk.text
+        fresh = {}
+        if to_embed:
+            embeddings = await self._aembed_with_cache(list(to_embed.values()))
+            fresh = {key: (self._to_matrix([emb])[0], emb is None) for key, emb in zip(to_embed, embeddings)}
 
-        if current_chunk:
-            chunks.append("\n".join(current_chunk))
+        store = VectorStore(self.api_key, use_cache=self.cache is not None, index_backend=self.index_backend)
+        store.file_stats = file_stats
+        store.chunks = new_chunks + [chunk for chunk, _ in appended]
+        store.chunk_keys = list(self.chunk_keys) + [key for _, key in appended]
+        store.live = np.concatenate([self.live, np.ones(len(appended), dtype=bool)])
+        store.live[removed] = False
+        appended_rows = [(self.matrix[known[key]], False) if key in known else fresh[key] for _, key in appended]
+        store.matrix = np.vstack([self.matrix] + ([np.asarray([row for row, _ in appended_rows], dtype=np.float32)] if appended else []))
+        store.failed = np.concatenate([self.failed, np.array([failed for _, failed in appended_rows], dtype=bool)])
 
-        # Fallback: if no chunks found, split by paragraphs
-        if not chunks:
-            chunks = [paragraph.strip() for paragraph in code_content.split("\n\n") if paragraph.strip()]
+        dead = int(len(store.live) - store.live.sum())
+        if dead and dead > REINDEX_COMPACT_RATIO * len(store.live):
+            store._compact()
+            dead = 0
 
-        return chunks if chunks else [code_content]
+        await store.abuild_indexes()
+        store.reindex_stats = {
+            "chunks": len(chunks),
+            "unchanged": len(chunks) - len(appended),
+            "added": len(appended),
+            "reembedded": len(to_embed),
+            "removed": len(removed),
+            "tombstones": dead,
+            "failed": int((store.failed & store.live).sum()),
+        }
+        return store
 
-    def _get_embedding(self, text: str) -> list:
+    async def aretry_failed(self) -> "VectorStore":
         """
-        Gets embeddings from OpenAI API.
+        Re-embeds the rows whose embedding failed. Returns a new store
+        with every recovered row filled in (or this store if there was
+        nothing to retry); this store is left untouched, like areindex.
         """
-        try:
-            response = self.client.embeddings.create(
-                input=text,
-                model="text-embedding-3-small"
+        rows = np.flatnonzero(self.failed & self.live)
+        if not rows.size:
+            return self
+        embeddings = await self._aembed_with_cache([self.chunks[row].text for row in rows])
+
+        store = VectorStore(self.api_key, use_cache=self.cache is not None, index_backend=self.index_backend)
+        store.chunks, store.file_stats, store.chunk_keys = self.chunks, self.file_stats, self.chunk_keys
+        store.live, store.reindex_stats = self.live, self.reindex_stats
+        store.matrix, store.failed = np.array(self.matrix), self.failed.copy()
+        recovered = [(row, emb) for row, emb in zip(rows, embeddings) if emb is not None]
+        for row, embedding in recovered:
+            store.matrix[row] = self._to_matrix([embedding])[0]
+            store.failed[row] = False
+        get_embedding_metrics().add("recovered_inputs", len(recovered))
+
+        await store.abuild_indexes()
+        return store
+
+    async def abuild_indexes(self):
+        """
+        (Re)builds the vector and BM25 indexes over the current rows.
+        """
+        documents = [f"{chunk.path}\n{chunk.text}" for chunk in self.chunks]
+        self.index, self.lexical = await asyncio.gather(
+            asyncio.to_thread(build_index, self.matrix, self.index_backend),
+            asyncio.to_thread(BM25Index, documents),
+        )
+
+    async def asearch(self, query: str, top_k: int = 3) -> list:
+        if not self.chunks:
+            return []
+        return self.search_hybrid(query, await aembed_query(self.api_key, query), top_k)
+
+    async def aretrieve_context(self, query: str, budget_tokens: int = None, candidates: int = CONTEXT_CANDIDATES) -> ContextResult:
+        if not self.chunks:
+            return build_context([], budget_tokens or context_budget())
+        return self.context_for_vector(await aembed_query(self.api_key, query), budget_tokens, candidates, query)
+
+    # ── Scoring (no I/O) ───────────────────────────────────────
+
+    def search_vector(self, query_vector: np.ndarray, top_k: int = 3) -> list:
+        """
+        search() for an already embedded, normalized query vector.
+        """
+        if not self.chunks:
+            return []
+        return self._live_results(self.index.search, query_vector, top_k, self.live & ~self.failed)
+
+    def search_hybrid(self, query: str, query_vector: np.ndarray, top_k: int = 3) -> list:
+        """
+        Fuses the cosine ranking with the BM25 ranking for the query text,
+        each RRF_CANDIDATE_FACTOR times deeper than top_k so chunks ranked
+        just below top_k by both still compete. A zero query vector (the
+        embedding call failed) falls back to the lexical ranking alone.
+        Scores are fused ranks, not cosines.
+        """
+        if not self.chunks:
+            return []
+        if not np.any(query_vector):
+            return self._live_results(self.lexical.search, query, top_k, self.live)
+        if not HYBRID_SEARCH:
+            return self.search_vector(query_vector, top_k)
+        depth = top_k * RRF_CANDIDATE_FACTOR
+        semantic = self.search_vector(query_vector, depth)
+        lexical = self._live_results(self.lexical.search, query, depth, self.live)
+        return fuse_rankings([semantic, lexical], top_k)
+
+    def context_for_vector(self, query_vector: np.ndarray, budget_tokens: int = None, candidates: int = CONTEXT_CANDIDATES, query: str = None) -> ContextResult:
+        """
+        retrieve_context() for an already embedded, normalized query
+        vector; passing the query text enables hybrid retrieval.
+        """
+        if query is None:
+            results = self.search_vector(query_vector, candidates)
+        else:
+            results = self.search_hybrid(query, query_vector, candidates)
+        scored = [(score, self.chunks[idx]) for score, idx in results]
+        return build_context(scored, budget_tokens or context_budget())
+
+    def _live_results(self, search, query, top_k: int, usable: np.ndarray) -> list:
+        """
+        Runs an index search and keeps only `usable` rows (e.g. not
+        tombstoned), over-fetching so that top_k results remain.
+        """
+        excluded = len(usable) - int(usable.sum())
+        if not excluded:
+            return search(query, top_k)
+        results = search(query, top_k + excluded)
+        return [(score, idx) for score, idx in results if usable[idx]][:top_k]
+
+    def _compact(self):
+        """
+        Drops tombstoned rows from the chunk list, keys and matrix.
+        """
+        rows = np.flatnonzero(self.live)
+        self.chunks = [self.chunks[row] for row in rows]
+        self.chunk_keys = [self.chunk_keys[row] for row in rows]
+        self.matrix = np.ascontiguousarray(self.matrix[rows])
+        self.failed = self.failed[rows]
+        self.live = np.ones(len(rows), dtype=bool)
+
+    @staticmethod
+    def _to_matrix(embeddings: list) -> np.ndarray:
+        """
+        Normalized matrix for embeddings as returned by _aembed_with_cache;
+        failed (None) entries become zero rows.
+        """
+        rows = [np.zeros(EMBEDDING_DIMENSIONS) if emb is None else emb for emb in embeddings]
+        return VectorStore._normalize(np.asarray(rows, dtype=np.float32).reshape(-1, EMBEDDING_DIMENSIONS))
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        """
+        L2-normalizes each row. Zero rows stay zero and therefore
+        score 0 against any query.
+        """
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return np.ascontiguousarray(matrix / norms, dtype=np.float32)
+
+    # ── Embedding ──────────────────────────────────────────────
+
+    async def _aembed_with_cache(self, texts: list) -> list:
+        """
+        Resolves embeddings from the cache and embeds only the misses.
+        Returns one embedding per text, in input order; None where the
+        embedding failed.
+        """
+        if self.cache is None:
+            return await self._aembed_batched(texts)
+
+        keys = [EmbeddingCache.make_key(text, EMBEDDING_MODEL) for text in texts]
+        found = await asyncio.to_thread(self.cache.get_many, keys)
+
+        # Embed each distinct missing text once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+
+        if missing:
+            fresh = dict(zip(missing, await self._aembed_batched(list(missing.values()))))
+            # Failed inputs are not cached, so they are retried next time
+            await asyncio.to_thread(
+                self.cache.put_many, {key: emb for key, emb in fresh.items() if emb is not None}
             )
-            return response.data[0].embedding
-        except Exception:
-            # Fallback: return a zero vector if API call fails
-            return [0.0] * 1536
+            found.update(fresh)
+
+        return [found[key] for key in keys]
 
-    def _cosine_similarity(self, vec1: list, vec2: list) -> float:
+    async def _aembed_batched(self, texts: list) -> list:
         """
-        Calculates cosine similarity between two vectors.
+        Embeds texts with as few embeddings.create calls as possible,
+        running up to EMBEDDING_CONCURRENCY batches at once.
+        Returns one embedding (or None) per text, in input order.
         """
-        if not vec1 or not vec2:
-            return 0.0
+        limiter = asyncio.Semaphore(EMBEDDING_CONCURRENCY)
 
-        dot_product = sum(a * b for a, b in zip(vec1, vec2))
-        magnitude1 = (sum(a ** 2 for a in vec1)) ** 0.5
-        magnitude2 = (sum(b ** 2 for b in vec2)) ** 0.5
+        async def run(client, batch):
+            async with limiter:
+                return await aembed_batch(client, batch)
+
+        async with async_openai_client(self.api_key) as client:
+            # Backoff is handled by aembed_batch, not the SDK
+            client = client.with_options(max_retries=0)
+            results = await asyncio.gather(*(run(client, batch) for batch in self._make_batches(texts)))
+        return [embedding for batch in results for embedding in batch]
+
+    def _make_batches(self, texts: list) -> list:
+        """
+        Packs texts into consecutive batches that respect both the
+        per-request item limit and the per-request token limit.
+        """
+        batches = []
+        current, current_tokens = [], 0
 
-        if magnitude1 == 0 or magnitude2 == 0:
-            return 0.0
+        for text in texts:
+            text = truncate_to_tokens(text, EMBEDDING_MAX_INPUT_TOKENS)
+            tokens = estimate_tokens(text)
+            full = len(current) >= EMBEDDING_BATCH_SIZE
+            too_big = current_tokens + tokens > EMBEDDING_BATCH_MAX_TOKENS
+            if current and (full or too_big):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(text)
+            current_tokens += tokens
 
-        return dot_product / (magnitude1 * magnitude2)
+        if current:
+            batches.append(current)
+        return batches
@@ -0,0 +1,98 @@
+"""
+Vector search backends: exact top-k selection, and the recall of the
+approximate backends against it.
+"""
+
+import numpy as np
+import pytest
+
+from services.ann_index import ExactIndex, IVFIndex, QuantizedIndex, build_index, select_top_k
+
+
+def normalized(rows: np.ndarray) -> np.ndarray:
+    return (rows / np.linalg.norm(rows, axis=1, keepdims=True)).astype(np.float32)
+
+
+def clustered_vectors(n: int, dims: int = 64, clusters: int = 40, seed: int = 0) -> np.ndarray:
+    """
+    Embedding-like data: points scattered around a few dozen directions.
+    """
+    rng = np.random.default_rng(seed)
+    centers = normalized(rng.normal(size=(clusters, dims)))
+    return normalized(centers[rng.integers(clusters, size=n)] + 0.2 * rng.normal(size=(n, dims)))
+
+
+def recall_at_10(index, matrix: np.ndarray, n_queries: int = 50) -> float:
+    """
+    Mean overlap of the index's top 10 with the exact top 10, for
+    queries near stored vectors.
+    """
+    rng = np.random.default_rng(1)
+    queries = normalized(matrix[rng.integers(len(matrix), size=n_queries)] + 0.05 * rng.normal(size=(n_queries, matrix.shape[1])))
+    exact = ExactIndex(matrix)
+    hits = 0
+    for query in queries:
+        expected = {idx for _, idx in exact.search(query, 10)}
+        hits += len(expected & {idx for _, idx in index.search(query, 10)})
+    return hits / (10 * n_queries)
+
+
+def test_exact_index_matches_a_full_sort():
+    matrix = clustered_vectors(2000)
+    query = matrix[17]
+
+    expected = sorted(range(len(matrix)), key=lambda i: -float(matrix[i] @ query))[:10]
+
+    assert [idx for _, idx in ExactIndex(matrix).search(query, 10)] == expected
+
+
+def test_top_k_breaks_ties_by_lower_index_and_caps_k():
+    scores = np.array([0.5, 0.75, 0.5, 0.75, 0.25], dtype=np.float32)
+
+    assert select_top_k(scores, 3) == [(0.75, 1), (0.75, 3), (0.5, 0)]
+    assert len(select_top_k(scores, 50)) == 5
+    assert select_top_k(scores[:0], 3) == []
+
+
+def test_ivf_recall_grows_with_probes():
+    matrix = clustered_vectors(5000)
+
+    recalls = [recall_at_10(IVFIndex(matrix, n_probe=n_probe), matrix) for n_probe in (1, 8)]
+
+    assert recalls[0] < recalls[1]
+    assert recalls[1] >= 0.85
+
+
+def test_ivf_probing_every_list_is_exact():
+    matrix = clustered_vectors(2000)
+    index = IVFIndex(matrix, n_lists=16, n_probe=16)
+
+    assert recall_at_10(index, matrix) == 1.0
+
+
+def test_small_indexes_use_exact_search():
+    matrix = clustered_vectors(100)
+
+    assert isinstance(build_index(matrix, "ivf", min_chunks=1000, quantization="none"), ExactIndex)
+    assert isinstance(build_index(matrix, "ivf", min_chunks=50, quantization="none"), IVFIndex)
+
+
+def test_quantized_scans_keep_recall_and_return_exact_scores():
+    matrix = clustered_vectors(3000)
+    query = matrix[42]
+    exact = dict((idx, score) for score, idx in ExactIndex(matrix).search(query, 10))
+
+    for precision in ("int8", "float16"):
+        index = QuantizedIndex(matrix, precision)
+        assert recall_at_10(index, matrix) >= 0.95
+        for score, idx in index.search(query, 10):
+            if idx in exact:
+                assert score == pytest.approx(exact[idx], abs=1e-6)  # rescored at full precision
+
+
+def test_quantized_codes_are_smaller():
+    matrix = clustered_vectors(1000)
+
+    assert QuantizedIndex(matrix, "int8").memory_bytes <= matrix.nbytes // 4 + 4 * len(matrix)
+    assert QuantizedIndex(matrix, "float16").memory_bytes == matrix.nbytes // 2
+    assert isinstance(build_index(matrix, "exact", quantization="int8"), QuantizedIndex)
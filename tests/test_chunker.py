@@ -0,0 +1,56 @@
+"""
+Size bounds of the language-aware chunker.
+"""
+
+from config import CHUNK_MAX_TOKENS, CHUNK_MIN_TOKENS
+from services.chunker import FILE_HEADER, chunk_code, chunk_file
+from services.tokens import estimate_tokens
+
+
+def java_class(n_methods: int) -> str:
+    methods = "\n".join(
+        f"    public int get{i}() {{\n        return value{i} + {i};\n    }}\n"
+        for i in range(n_methods)
+    )
+    return f"public class Big {{\n{methods}}}\n"
+
+
+def test_small_nested_methods_are_merged():
+    chunks = chunk_file("Big.java", java_class(80))
+
+    sizes = [estimate_tokens(chunk.text) for chunk in chunks]
+    assert min(sizes) >= CHUNK_MIN_TOKENS
+    assert not [chunk for chunk in chunks if chunk.text.strip() == "}"]
+
+
+def test_chunks_stay_within_budget_and_cover_every_line():
+    source = java_class(200)
+    chunks = chunk_file("Big.java", source)
+
+    assert all(estimate_tokens(chunk.text) <= CHUNK_MAX_TOKENS for chunk in chunks)
+    covered = set()
+    for chunk in chunks:
+        covered.update(range(chunk.start_line, chunk.end_line + 1))
+    code_lines = {i + 1 for i, line in enumerate(source.split("\n")) if line.strip()}
+    assert code_lines <= covered
+
+
+def test_filename_selects_language():
+    chunks, stats = chunk_code("SELECT 1;\n\nSELECT 2;\n", "schema.sql")
+
+    assert stats[0]["language"] == "sql"
+    assert all(chunk.language == "sql" for chunk in chunks)
+
+
+def test_empty_files_have_no_chunks():
+    archive = "\n".join([
+        FILE_HEADER.format(path="empty.txt"),
+        "",
+        FILE_HEADER.format(path="app.py"),
+        "def main():\n    return 1\n",
+    ])
+    chunks, stats = chunk_code(archive, "upload.zip")
+
+    assert chunk_file("blank.py", " \n\n\t\n") == []
+    assert [chunk.path for chunk in chunks] == ["app.py"]
+    assert [(s["path"], s["chunks"]) for s in stats] == [("empty.txt", 0), ("app.py", 1)]
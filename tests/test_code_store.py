@@ -0,0 +1,66 @@
+"""
+Round-trip, deduplication and cleanup of the content-addressed code store.
+"""
+
+import time
+
+import pytest
+
+from services import code_store
+from services.code_store import CodeStore, IncompleteCodeError
+
+
+def test_code_round_trips_across_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(code_store, "CODE_STORE_CHUNK_BYTES", 16)
+    store = CodeStore(str(tmp_path / "code.sqlite3"))
+    code = "".join(f"def f{i}():\n    return 'é{i}'\n" for i in range(50))
+
+    store.save_code("s1", code, "app.py")
+
+    assert store.get_code("s1") == code
+    assert "".join(store.iter_code("s1")) == code
+    assert store.get_filename("s1") == "app.py"
+    assert store.get_code("missing") == ""
+
+
+def test_identical_code_is_stored_once(tmp_path):
+    store = CodeStore(str(tmp_path / "code.sqlite3"))
+
+    first = store.save_code("s1", "print('hello')\n" * 100)
+    second = store.save_code("s2", ["print('hello')\n"] * 100)
+
+    assert first == second
+    assert store.stats()["blobs"] == 1
+    assert store.delete_session("s1")
+    assert store.get_code("s2") == "print('hello')\n" * 100
+    assert store.delete_session("s2")
+    assert store.stats() == {"sessions": 0, "blobs": 0, "raw_bytes": 0, "stored_bytes": 0}
+
+
+def test_reading_a_replaced_blob_raises(tmp_path, monkeypatch):
+    monkeypatch.setattr(code_store, "CODE_STORE_CHUNK_BYTES", 4)
+    store = CodeStore(str(tmp_path / "code.sqlite3"))
+    store.save_code("s1", "abcdefghijkl")
+
+    chunks = store.iter_code("s1")
+    assert next(chunks) == "abcd"
+    store.save_code("s1", "something else")
+    with pytest.raises(IncompleteCodeError):
+        list(chunks)
+
+
+def test_crashed_saves_are_collected_on_open(tmp_path):
+    path = str(tmp_path / "code.sqlite3")
+    store = CodeStore(path)
+    store.save_code("s1", "kept")
+    stale = f"pending-{int(time.time()) - 2 * code_store.PENDING_MAX_AGE_SECONDS}-dead"
+    recent = f"pending-{int(time.time())}-live"
+    store._write_chunk(stale, 0, b"orphan")
+    store._write_chunk(recent, 0, b"in flight")
+
+    reopened = CodeStore(path)
+
+    digests = {row[0] for row in reopened._conn.execute("SELECT digest FROM blob_chunks")}
+    assert stale not in digests
+    assert recent in digests
+    assert reopened.get_code("s1") == "kept"
@@ -0,0 +1,96 @@
+"""
+Hits, expiry and LRU eviction of the persistent completion cache.
+"""
+
+import time
+
+from services.completion_cache import CompletionCache
+from services.embedding_cache import EmbeddingCache
+
+
+def make_cache(tmp_path, **kwargs) -> CompletionCache:
+    options = {"max_bytes": 10 ** 6, "ttl_seconds": 3600}
+    options.update(kwargs)
+    return CompletionCache(str(tmp_path / "completions.sqlite3"), **options)
+
+
+def test_identical_prompts_hit():
+    messages = [{"role": "system", "content": "Document this."}, {"role": "user", "content": "def f(): pass"}]
+    key = CompletionCache.make_key("gpt-4o", messages)
+
+    assert key == CompletionCache.make_key("gpt-4o", [dict(message) for message in messages])
+    assert key != CompletionCache.make_key("gpt-4o-mini", messages)
+    assert key != CompletionCache.make_key("gpt-4o", messages[:1] + [{"role": "user", "content": "def g(): pass"}])
+
+
+def test_get_returns_stored_completion(tmp_path):
+    cache = make_cache(tmp_path)
+
+    assert cache.get("missing") is None
+    cache.put("key", "An answer")
+
+    assert cache.get("key") == "An answer"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    assert stats["bytes"] == len("An answer")
+
+
+def test_completions_survive_reopening(tmp_path):
+    make_cache(tmp_path).put("key", "An answer")
+
+    cache = make_cache(tmp_path)
+    assert cache.get("key") == "An answer"
+    assert cache.stats()["bytes"] == len("An answer")
+
+
+def test_expired_completions_are_misses(tmp_path):
+    cache = make_cache(tmp_path, ttl_seconds=0.05)
+    cache.put("key", "An answer")
+    time.sleep(0.1)
+
+    assert cache.get("key") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_completions_are_evicted(tmp_path):
+    cache = make_cache(tmp_path, max_bytes=350)
+    for name in ("a", "b", "c"):
+        cache.put(name, name * 100)
+        time.sleep(0.01)
+    # Reading "a" makes "b" the least recently used
+    assert cache.get("a") == "a" * 100
+    time.sleep(0.01)
+
+    cache.put("d", "d" * 100)
+
+    assert cache.get("b") is None
+    assert [cache.get(name) is not None for name in ("a", "c", "d")] == [True, True, True]
+    assert cache.stats()["bytes"] == 300
+
+
+def test_replacing_a_completion_does_not_double_count(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put("key", "x" * 100)
+    cache.put("key", "y" * 40)
+
+    assert cache.stats()["bytes"] == 40
+
+
+def test_embedding_cache_evicts_through_the_shared_lru(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite3"), max_bytes=10 ** 6)
+    cache.put_many({"a": [0.5] * 8})
+    time.sleep(0.01)
+    cache.put_many({"b": [0.25] * 8})
+    entry_bytes = cache.stats()["bytes"] // 2
+
+    assert cache.get("a").tolist() == [0.5] * 8
+    assert set(cache.get_many(["a", "b", "c"])) == {"a", "b"}
+
+    time.sleep(0.01)
+    cache.get("b")
+    # Room for two and a half vectors: adding a third drops "a", now the oldest
+    cache.max_bytes = entry_bytes * 5 // 2
+    time.sleep(0.01)
+    cache.put_many({"c": [1.0] * 8})
+
+    assert set(cache.get_many(["a", "b", "c"])) == {"b", "c"}
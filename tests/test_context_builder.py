@@ -0,0 +1,49 @@
+"""
+Packing retrieved chunks into a token-budgeted prompt context.
+"""
+
+from services.chunker import Chunk
+from services.context_builder import TRUNCATION_MARKER, build_context
+from services.tokens import estimate_tokens
+
+
+def numbered_lines(start: int, end: int) -> str:
+    return "\n".join(f"value_{i} = compute({i});" for i in range(start, end + 1))
+
+
+def chunk(start: int, end: int, path: str = "app.js") -> Chunk:
+    return Chunk(numbered_lines(start, end), path, "javascript", start, end)
+
+
+def test_exact_duplicates_are_dropped():
+    # The same text in another file (e.g. a vendored copy) adds nothing either
+    scored = [(0.9, chunk(1, 10)), (0.8, chunk(1, 10)), (0.7, chunk(1, 10, "vendor.js")), (0.6, chunk(11, 12))]
+
+    result = build_context(scored, 10_000)
+
+    assert result.chunks == 2
+    assert result.text.count("value_1 = ") == 1
+    assert "vendor.js" not in result.text
+    assert "# app.js (lines 11-12)" in result.text
+
+
+def test_overlapping_chunks_are_trimmed_to_new_lines():
+    result = build_context([(0.9, chunk(1, 20)), (0.8, chunk(15, 30)), (0.7, chunk(5, 12))], 10_000)
+
+    assert result.chunks == 2
+    assert "# app.js (lines 21-30)" in result.text
+    for i in range(1, 31):
+        assert result.text.count(f"value_{i} = ") == 1
+
+
+def test_context_stays_within_budget_and_truncates_at_a_boundary():
+    big = chunk(1, 400)
+    budget = estimate_tokens(big.text) // 3
+
+    result = build_context([(0.9, big)], budget)
+
+    assert result.tokens <= budget
+    assert result.chunks == 1
+    assert result.text.endswith(TRUNCATION_MARKER)
+    last_line = result.text.split("\n")[-2]
+    assert last_line.endswith(";")
@@ -0,0 +1,54 @@
+"""
+VectorStore.build embeds chunks in as few requests as the limits allow.
+"""
+
+import math
+
+import pytest
+
+from benchmarks.fake_openai_server import FakeOpenAIServer
+from config import EMBEDDING_BATCH_MAX_TOKENS, EMBEDDING_BATCH_SIZE
+from services import embedding_cache
+from services.embedding_cache import EmbeddingCache
+from services.tokens import estimate_tokens
+from services.vector_store import VectorStore
+
+
+def make_code(n_functions: int) -> str:
+    return "\n".join(f"def function_{i}(value):\n    return value * {i}\n" for i in range(n_functions))
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "_shared_cache", EmbeddingCache(str(tmp_path / "cache.sqlite3")))
+    with FakeOpenAIServer(latency=0) as server:
+        monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+        yield server
+
+
+def test_chunks_are_embedded_in_full_batches(server):
+    store = VectorStore("sk-test", index_backend="exact")
+    store.build(make_code(2000), "app.py")
+
+    assert len(store.chunks) > EMBEDDING_BATCH_SIZE
+    assert server.request_count == math.ceil(len(store.chunks) / EMBEDDING_BATCH_SIZE)
+    assert store.matrix.shape[0] == len(store.chunks)
+
+
+def test_cached_chunks_are_not_embedded_again(server):
+    VectorStore("sk-test", index_backend="exact").build(make_code(500), "app.py")
+    requests = server.request_count
+
+    VectorStore("sk-test", index_backend="exact").build(make_code(500), "app.py")
+    assert server.request_count == requests
+
+    VectorStore("sk-test", use_cache=False, index_backend="exact").build(make_code(500), "app.py")
+    assert server.request_count == 2 * requests
+
+
+def test_batches_respect_the_token_limit():
+    text = "word " * 2000
+    per_batch = EMBEDDING_BATCH_MAX_TOKENS // estimate_tokens(text)
+    batches = VectorStore("sk-test")._make_batches([text] * (per_batch * 3))
+
+    assert [len(batch) for batch in batches] == [per_batch] * 3
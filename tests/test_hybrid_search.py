@@ -0,0 +1,73 @@
+"""
+BM25 retrieval, reciprocal rank fusion and VectorStore.search_hybrid.
+"""
+
+import asyncio
+
+import numpy as np
+
+from services import vector_store
+from services.chunker import Chunk
+from services.lexical_index import BM25Index, fuse_rankings, tokenize
+from services.vector_store import VectorStore
+
+DOCS = [
+    "def save_code_content(session_id, code):\n    store.put(session_id, code)",
+    "def load_session(session_id):\n    return store.get(session_id)",
+    "function ensureHeader(request) {\n  request.headers.set('x', 1);\n}",
+    "def delete_session(session_id):\n    store.delete(session_id)",
+]
+
+
+def make_store(vectors: np.ndarray) -> VectorStore:
+    store = VectorStore("sk-test")
+    store.chunks = [Chunk(text, f"file{i}.py", "python", 1, 2) for i, text in enumerate(DOCS)]
+    store.chunk_keys = [str(i) for i in range(len(DOCS))]
+    store.matrix = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    store.failed = np.zeros(len(DOCS), dtype=bool)
+    store.live = np.ones(len(DOCS), dtype=bool)
+    asyncio.run(store.abuild_indexes())
+    return store
+
+
+def test_identifiers_are_split_into_sub_words():
+    assert tokenize("save_code_content ensureHeader") == [
+        "save_code_content", "save", "code", "content", "ensureheader", "ensure", "header",
+    ]
+
+
+def test_bm25_ranks_the_exact_identifier_first():
+    index = BM25Index(DOCS)
+
+    assert index.search("ensureHeader", 2)[0][1] == 2
+    assert index.search("code content", 2)[0][1] == 0
+    assert index.search("nonexistent", 3) == []
+
+
+def test_rank_fusion_prefers_documents_ranked_high_in_both():
+    fused = fuse_rankings([[(0.9, 1), (0.8, 2), (0.7, 3)], [(9.0, 2), (5.0, 0), (1.0, 1)]], 3, k=60)
+
+    assert [idx for _, idx in fused] == [2, 1, 0]
+
+
+def test_zero_query_vector_falls_back_to_bm25():
+    store = make_store(np.eye(4, dtype=np.float32))
+
+    results = store.search_hybrid("ensureHeader", np.zeros(4, dtype=np.float32), 2)
+
+    assert results == store.lexical.search("ensureHeader", 2)
+
+
+def test_hybrid_fuses_and_plain_vector_search_skips_bm25(monkeypatch):
+    store = make_store(np.eye(4, dtype=np.float32))
+    query_vector = np.array([0.0, 1.0, 0.0, 0.0], dtype=np.float32)
+
+    fused = store.search_hybrid("ensureHeader", query_vector, 2)
+    assert {idx for _, idx in fused} == {1, 2}
+
+    def no_bm25(query, top_k):
+        raise AssertionError("BM25 queried with hybrid search off")
+
+    monkeypatch.setattr(vector_store, "HYBRID_SEARCH", False)
+    monkeypatch.setattr(store.lexical, "search", no_bm25)
+    assert [idx for _, idx in store.search_hybrid("ensureHeader", query_vector, 1)] == [1]
@@ -0,0 +1,65 @@
+"""
+Re-uploading a session's code re-embeds only the chunks that changed.
+"""
+
+import numpy as np
+import pytest
+
+from benchmarks.fake_openai_server import FakeOpenAIServer
+from services import embedding_cache, index_store
+from services.chunker import chunk_file
+from services.embedding_cache import EmbeddingCache
+from services.index_registry import IndexRegistry
+
+
+def make_code(n_functions: int, changed: int = -1) -> str:
+    return "\n".join(
+        f"def function_{i}(value):\n    return value * {i * 10 if i == changed else i}\n"
+        for i in range(n_functions)
+    )
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(index_store, "INDEX_STORE_DIR", str(tmp_path / "indexes"))
+    monkeypatch.setattr(embedding_cache, "_shared_cache", EmbeddingCache(str(tmp_path / "cache.sqlite3")))
+    with FakeOpenAIServer(latency=0) as server:
+        monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+        yield IndexRegistry()
+
+
+def test_unchanged_chunks_keep_their_rows(registry):
+    old_code, new_code = make_code(300), make_code(300, changed=150)
+    before = registry.get_or_build("sk-test", old_code, "s1", "app.py")
+    after = registry.get_or_build("sk-test", new_code, "s1", "app.py")
+
+    old_texts = {chunk.text for chunk in chunk_file("app.py", old_code)}
+    changed = [chunk for chunk in chunk_file("app.py", new_code) if chunk.text not in old_texts]
+    stats = registry.last_reindex["s1"]
+    assert 0 < stats["reembedded"] == len(changed) < stats["chunks"] // 10
+    assert stats["unchanged"] == stats["chunks"] - len(changed)
+    assert registry.stats()["indexes"] == 1
+
+    rows = {key: before.matrix[row] for row, key in enumerate(before.chunk_keys) if before.live[row]}
+    reused = [key for row, key in enumerate(after.chunk_keys) if after.live[row] and key in rows]
+    assert len(reused) == stats["unchanged"]
+    for key in reused:
+        assert np.array_equal(after.matrix[after.chunk_keys.index(key)], rows[key])
+
+
+def test_reupload_of_identical_code_is_a_cache_hit(registry):
+    first = registry.get_or_build("sk-test", make_code(50), "s1", "app.py")
+    second = registry.get_or_build("sk-test", make_code(50), "s1", "app.py")
+
+    assert second is first
+    assert registry.hits == 1
+    assert "s1" not in registry.last_reindex
+
+
+def test_built_and_reindexed_stores_are_memory_mapped(registry):
+    built = registry.get_or_build("sk-test", make_code(100), "s1", "app.py")
+    reindexed = registry.get_or_build("sk-test", make_code(100, changed=50), "s1", "app.py")
+
+    assert isinstance(built.matrix, np.memmap)
+    assert isinstance(reindexed.matrix, np.memmap)
+    assert registry.last_reindex["s1"]["reembedded"] >= 1
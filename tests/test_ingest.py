@@ -0,0 +1,66 @@
+"""
+Reading uploads: ZIP members, line endings and rejected files.
+"""
+
+import io
+import zipfile
+
+from services.chunker import chunk_code, split_files
+from services.ingest import StreamedUpload, ingest_upload
+
+
+def make_zip(files: dict) -> io.BytesIO:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for path, data in files.items():
+            archive.writestr(path, data)
+    buffer.seek(0)
+    return buffer
+
+
+def test_crlf_line_endings_are_normalized():
+    code, report = ingest_upload("app.py", io.BytesIO(b"def main():\r\n    return 1\r\n"))
+
+    assert code == "def main():\n    return 1\n"
+    assert report.files == 1
+    assert not any("\r" in chunk.text for chunk in chunk_code(code, "app.py")[0])
+
+
+def test_empty_members_add_no_chunks():
+    upload = make_zip({"empty.txt": b"", "app.py": b"def main():\r\n    return 1\r\n"})
+    code, report = ingest_upload("upload.zip", upload)
+
+    chunks, _ = chunk_code(code, "upload.zip")
+    assert report.files == 2
+    assert [chunk.path for chunk in chunks] == ["app.py"]
+    assert all(chunk.text.strip() for chunk in chunks)
+
+
+def test_binary_and_empty_single_files_are_reported():
+    _, binary = ingest_upload("image.png", io.BytesIO(b"\x89PNG\r\n\x1a\n\0\0\0"))
+    _, empty = ingest_upload("empty.py", io.BytesIO(b""))
+
+    assert binary.skipped == [("image.png", "binary")]
+    assert empty.skipped == [] and empty.bytes == 0
+
+
+def test_streamed_members_match_split_files():
+    upload = StreamedUpload("upload.zip", make_zip({
+        "src/a.py": b"\n\ndef a():\n    return 1\n",
+        "src/b.js": b"function b() {\n  return 2;\n}",
+        "logo.png": b"\x89PNG\0\0",
+        "notes/empty.txt": b"",
+        "src/c.go": b"package main\n\nfunc c() int { return 3 }\n",
+    }))
+
+    streamed = list(upload)
+
+    assert streamed == split_files(upload.code_content, "upload.zip")
+    assert [path for path, _ in streamed] == ["src/a.py", "src/b.js", "notes/empty.txt", "src/c.go"]
+    assert upload.report.skipped == [("logo.png", "binary")]
+
+
+def test_streamed_single_file_matches_split_files():
+    upload = StreamedUpload("main.rs", io.BytesIO(b"fn main() {\r\n    println!(\"hi\");\r\n}\r\n"))
+
+    assert list(upload) == split_files(upload.code_content, "main.rs")
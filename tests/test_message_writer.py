@@ -0,0 +1,71 @@
+"""
+Write-behind saving of chat turns and replay of the journal.
+"""
+
+import threading
+
+from services.message_writer import MessageWriter
+
+
+class RecordingStore:
+    def __init__(self):
+        self.turns = []
+        self.timestamps = []
+
+    def save_conversation_turns(self, turns, timestamp=None):
+        self.turns.extend(turns)
+        self.timestamps.extend(timestamp)
+
+
+class FailingStore:
+    def __init__(self):
+        self.attempts = threading.Event()
+
+    def save_conversation_turn(self, session_id, question, answer):
+        self.attempts.set()
+        raise ConnectionError("store is down")
+
+
+def test_turns_are_saved_in_batches_with_their_timestamps(tmp_path):
+    store = RecordingStore()
+    writer = MessageWriter(lambda: store, str(tmp_path / "journal.jsonl"), fsync=False)
+    for i in range(5):
+        writer.submit("s1", f"question {i}", f"answer {i}")
+
+    assert writer.flush(timeout=5)
+    writer.close(timeout=5)
+
+    assert store.turns == [("s1", f"question {i}", f"answer {i}") for i in range(5)]
+    assert len(store.timestamps) == 5 and all(store.timestamps)
+    assert (tmp_path / "journal.jsonl").read_text() == ""
+
+
+def test_unsaved_turns_are_replayed_on_the_next_start(tmp_path):
+    journal = str(tmp_path / "journal.jsonl")
+    failing = FailingStore()
+    crashed = MessageWriter(lambda: failing, journal, fsync=False, max_delay=0.01)
+    for i in range(3):
+        crashed.submit("s1", f"question {i}", f"answer {i}")
+    assert failing.attempts.wait(5)
+    assert not crashed.flush(timeout=0.1)
+    crashed.close(timeout=0.1)
+
+    store = RecordingStore()
+    writer = MessageWriter(lambda: store, journal, fsync=False)
+    assert writer.flush(timeout=5)
+    writer.close(timeout=5)
+
+    assert writer.replayed == 3
+    assert store.turns == [("s1", f"question {i}", f"answer {i}") for i in range(3)]
+
+
+def test_backing_off_while_the_store_fails(tmp_path):
+    failing = FailingStore()
+    writer = MessageWriter(lambda: failing, str(tmp_path / "journal.jsonl"), fsync=False, max_delay=0.5)
+    writer.submit("s1", "question", "answer")
+
+    assert failing.attempts.wait(5)
+    assert not writer.flush(timeout=0.2)
+    assert writer.backing_off
+    assert writer.stats()["failures"] >= 1
+    writer.close(timeout=0.1)
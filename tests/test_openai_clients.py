@@ -0,0 +1,51 @@
+"""
+Client and keep-alive connection reuse in the OpenAI client pool.
+"""
+
+import pytest
+
+from benchmarks.fake_openai_server import FakeOpenAIServer
+from services.openai_clients import ClientPool
+
+
+@pytest.fixture
+def server(monkeypatch):
+    with FakeOpenAIServer(latency=0) as server:
+        monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+        yield server
+
+
+def test_one_client_per_api_key(server):
+    pool = ClientPool()
+    with pool.client("sk-one") as first, pool.client("sk-one") as again:
+        assert again is first
+    with pool.client("sk-two") as other:
+        assert other is not first
+
+    assert pool.stats()["clients_created"] == 2
+
+
+def test_requests_reuse_keep_alive_connections(server):
+    pool = ClientPool()
+    for i in range(5):
+        with pool.client("sk-test") as client:
+            client.embeddings.create(model="text-embedding-3-small", input=[f"text {i}"])
+
+    stats = pool.stats()
+    assert server.request_count == 5
+    assert (stats["connections_opened"], stats["connections_reused"]) == (1, 4)
+    assert stats["reuse_rate"] == pytest.approx(0.8)
+
+
+def test_evicted_clients_close_once_released(server):
+    pool = ClientPool(max_clients=1)
+    with pool.client("sk-one") as first:
+        with pool.client("sk-two"):
+            pass
+        # Evicted while still lent out
+        assert not first.is_closed()
+    assert first.is_closed()
+
+    with pool.client("sk-one") as replacement:
+        assert replacement is not first
+    assert pool.stats()["clients"] == 1
@@ -0,0 +1,61 @@
+"""
+Admission order and pacing of the OpenAI request scheduler.
+"""
+
+import asyncio
+import time
+
+from services.rate_limiter import BULK, INTERACTIVE, RequestScheduler, request_priority
+
+LIMITS = {"chat": {"rpm": 1200, "tpm": 10 ** 9}, "embeddings": {"rpm": 1200, "tpm": 10 ** 9}}
+
+
+def test_interactive_requests_are_granted_before_queued_bulk_ones():
+    # One request per 50 ms, no burst
+    scheduler = RequestScheduler(LIMITS, burst_seconds=0.05)
+    granted = []
+
+    async def request(name: str, priority: int):
+        with request_priority(priority):
+            await scheduler.acquire("key", "chat", 10)
+        granted.append(name)
+
+    async def scenario():
+        await request("first", INTERACTIVE)
+        # Hold the queue until every request below is waiting
+        scheduler.pause("key", "chat", 0.2)
+        await asyncio.gather(
+            request("bulk-1", BULK),
+            request("bulk-2", BULK),
+            request("chat-1", INTERACTIVE),
+            request("bulk-3", BULK),
+            request("chat-2", INTERACTIVE),
+        )
+
+    asyncio.run(scenario())
+
+    assert granted == ["first", "chat-1", "chat-2", "bulk-1", "bulk-2", "bulk-3"]
+    assert scheduler.stats()["delayed"] == 5
+
+
+def test_requests_are_paced_to_the_rate_limit():
+    scheduler = RequestScheduler(LIMITS, burst_seconds=0.05)
+
+    start = time.monotonic()
+    for _ in range(5):
+        scheduler.acquire_sync("key", "embeddings", 10)
+    elapsed = time.monotonic() - start
+
+    # The first goes straight through, each later one waits ~50 ms
+    assert 0.15 <= elapsed < 1.0
+    assert scheduler.stats()["requests"] == 5
+
+
+def test_keys_have_separate_buckets():
+    scheduler = RequestScheduler(LIMITS, burst_seconds=0.05)
+    scheduler.pause("busy", "chat", 5)
+
+    start = time.monotonic()
+    scheduler.acquire_sync("idle", "chat", 10)
+
+    assert time.monotonic() - start < 0.05
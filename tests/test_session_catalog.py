@@ -0,0 +1,60 @@
+"""
+Paging and totals of the session catalogue.
+"""
+
+from services.session_catalog import SessionCatalog
+
+
+def test_sessions_page_most_recent_first(tmp_path):
+    catalog = SessionCatalog(str(tmp_path / "catalog.sqlite3"))
+    for i in range(25):
+        catalog.record_messages(f"s{i:02d}", 2, f"2026-01-01T00:00:{i:02d}")
+
+    pages = [catalog.list_sessions(limit=10, offset=offset) for offset in (0, 10, 20)]
+
+    assert [len(page) for page in pages] == [10, 10, 5]
+    ids = [session["session_id"] for page in pages for session in page]
+    assert ids == [f"s{i:02d}" for i in reversed(range(25))]
+    assert catalog.get_stats() == {"total_sessions": 25, "total_messages": 50}
+
+
+def test_counts_filenames_and_deletes(tmp_path):
+    catalog = SessionCatalog(str(tmp_path / "catalog.sqlite3"))
+    catalog.record_messages("uploaded", 0, "2026-01-01T08:00:00")
+    assert catalog.list_sessions() == []  # no messages yet
+
+    catalog.record_messages("uploaded", 2, "2026-01-01T10:00:00")
+    catalog.record_messages("uploaded", 2, "2026-01-01T09:00:00")
+    catalog.set_filename("uploaded", "app.py")
+    (session,) = catalog.list_sessions()
+    assert session["message_count"] == 4
+    assert session["filename"] == "app.py"
+    assert session["last_active"] == "2026-01-01T10:00:00"
+
+    assert catalog.delete("uploaded")
+    assert not catalog.delete("uploaded")
+    assert catalog.is_empty()
+
+
+class ListingStore:
+    def __init__(self, sessions):
+        self.sessions = sessions
+        self.listings = 0
+
+    def list_sessions(self):
+        self.listings += 1
+        return self.sessions
+
+
+def test_an_empty_catalogue_is_seeded_once(tmp_path):
+    catalog = SessionCatalog(str(tmp_path / "catalog.sqlite3"))
+    store = ListingStore([
+        {"session_id": "old", "last_active": "2025-12-31T00:00:00", "message_count": 6, "filename": "a.py"},
+    ])
+
+    catalog.seed_from(store)
+    catalog.seed_from(store)
+
+    assert store.listings == 1
+    assert catalog.list_sessions()[0]["message_count"] == 6
+    assert catalog.get_stats() == {"total_sessions": 1, "total_messages": 6}